@@ -3,11 +3,21 @@ Crowbank Intranet - Flask Application Factory
 """
 
 import os
-from datetime import datetime
-from flask import Flask, render_template
+import click
+from datetime import datetime, timezone
+from flask import Flask
+from werkzeug.local import LocalProxy
 
 from app.utils.yaml_config import load_config
-from app.extensions import db, migrate
+from app.utils.logging_config import init_logging
+from app.extensions import db, migrate, login_manager
+from app.utils.db_routing import configure_replica_bind, register_replica_monitor
+from app.utils.htmx import render_htmx
+from app.utils.assets import init_assets, build_all
+from app.utils.sessions import init_sessions
+from app.utils.change_feed import init_change_feed
+from app.services.auth import init_auth
+from app.services.webhooks import init_webhooks
 
 
 def create_app(test_config=None):
@@ -39,6 +49,9 @@ def create_app(test_config=None):
     if test_config:
         app.config.update(test_config)
     
+    # Route logging through a background listener before anything logs
+    init_logging(app)
+    
     # Ensure the instance folder exists
     try:
         os.makedirs(app.instance_path, exist_ok=True)
@@ -58,23 +71,33 @@ def create_app(test_config=None):
     _register_shell_context(app)
     
     # Register CLI commands
-    # _register_commands(app)
+    _register_commands(app)
     
     # Register template context
     _register_template_context(app)
     
+    # Register template bytecode cache and fingerprinted static assets
+    init_assets(app)
+    
     # Home route
     @app.route('/')
     def home():
-        return render_template('home.html')
+        return render_htmx('home.html')
     
     return app
 
 
 def _register_extensions(app):
     """Register Flask extensions."""
+    has_replica = configure_replica_bind(app)
     db.init_app(app)
+    if has_replica:
+        register_replica_monitor(app, db)
     migrate.init_app(app, db)
+    init_sessions(app, db)
+    init_auth(app, login_manager, db)
+    init_change_feed(app, db)
+    init_webhooks(app, db)
 
 
 def _register_blueprints(app):
@@ -108,11 +131,81 @@ def _register_commands(app):
     #     """Initialize the database."""
     #     db.create_all()
     #     click.echo("Initialized the database.")
-    pass
+    
+    @app.cli.command("build-assets")
+    def build_assets_command():
+        """Fingerprint and compress static assets and precompile templates."""
+        manifest = build_all(app)
+        click.echo(f"Built {len(manifest)} assets.")
+    
+    @app.cli.command("purge-sessions")
+    def purge_sessions_command():
+        """Delete expired server-side sessions."""
+        backend = app.extensions.get('session_backend')
+        if backend is None:
+            click.echo("Server-side sessions are not enabled.")
+            return
+        count = backend.purge_expired(app.config['CONFIG'].get('session', {}).get('purge_batch_size', 1000))
+        click.echo(f"Purged {count} expired sessions.")
+    
+    @app.cli.command("check-migrations")
+    def check_migrations_command():
+        """Flag migration operations that would block a populated table."""
+        from app.utils.online_migrations import check_migrations, describe
+        found = check_migrations(os.path.join(os.path.dirname(app.root_path), 'migrations'))
+        for operation in found:
+            click.echo(describe(operation))
+        if found:
+            raise SystemExit(1)
+        click.echo("No blocking operations found.")
+    
+    @app.cli.command("find-duplicates")
+    @click.option("--contacts", is_flag=True, help="Find duplicate contacts rather than households.")
+    @click.option("--threshold", default=0.8, show_default=True, help="Minimum match score.")
+    @click.option("--workers", type=int, default=None, help="Scoring processes (default: all CPUs).")
+    def find_duplicates_command(contacts, threshold, workers):
+        """List likely duplicate households or contacts for review."""
+        from app.services import dedup
+        find = dedup.find_duplicate_contacts if contacts else dedup.find_duplicate_customers
+        matches = find(db.session, threshold=threshold, workers=workers)
+        for match in matches:
+            click.echo(f"{match.keep_id}\t{match.merge_id}\t{match.score:.3f}\t{','.join(match.reasons)}")
+        click.echo(f"{len(matches)} likely duplicates.", err=True)
+    
+    @app.cli.command("process-webhooks")
+    @click.option("--loop", is_flag=True, help="Keep polling for new events.")
+    @click.option("--batch-size", type=int, default=None, help="Events per batch (default: webhooks.batch_size).")
+    def process_webhooks_command(loop, batch_size):
+        """Match queued webhook events to customers and run their handlers."""
+        import time
+        from app.services.webhooks import process_pending
+        settings = app.config['CONFIG'].get('webhooks', {})
+        while True:
+            summaries = process_pending(db.session, settings, batch_size)
+            if summaries:
+                click.echo(f"Processed {sum(s.claimed for s in summaries)} webhook events.")
+            if not loop:
+                break
+            time.sleep(settings.get('poll_interval', 5))
+    
+    @app.cli.command("replay-webhooks")
+    @click.option("--id", "ids", type=int, multiple=True, help="Replay this event (repeatable).")
+    @click.option("--source", type=click.Choice(["gravity_forms", "stripe"]), default=None)
+    @click.option("--since", type=click.DateTime(), default=None, help="Only events received since then.")
+    @click.option("--failed-only", is_flag=True, help="Skip events that matched no customer.")
+    def replay_webhooks_command(ids, source, since, failed_only):
+        """Queue failed (and unmatched) webhook events to be processed again."""
+        from app.models.webhook import WebhookSource, WebhookStatus
+        from app.services.webhooks import replay
+        statuses = [WebhookStatus.FAILED] + ([] if failed_only else [WebhookStatus.UNMATCHED])
+        count = replay(db.session, ids, WebhookSource(source) if source else None,
+                       since.replace(tzinfo=timezone.utc) if since else None, statuses)
+        db.session.commit()
+        click.echo(f"Queued {count} webhook events.")
 
 
 def _register_template_context(app):
     """Register template context processors."""
-    @app.context_processor
-    def inject_now():
-        return {'now': datetime.utcnow()}
+    # Registered as a global rather than a context processor so nothing runs
+    # per render; the proxy only reads the clock when a template uses `now`.
+    app.jinja_env.globals['now'] = LocalProxy(lambda: datetime.now(timezone.utc))
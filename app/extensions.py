@@ -7,16 +7,18 @@ Extensions are initialized in app/__init__.py using init_app().
 
 # Database and ORM
 from flask_sqlalchemy import SQLAlchemy
-db = SQLAlchemy()
+from app.utils.db_routing import FlaskRoutingSession
+db = SQLAlchemy(session_options={'class_': FlaskRoutingSession})
 
 # Migrations
 from flask_migrate import Migrate
 migrate = Migrate()
 
+# Authentication
+from flask_login import LoginManager
+login_manager = LoginManager()
+
 # Blueprints and extension instances will be added as needed:
-# from flask_login import LoginManager
-# login_manager = LoginManager()
-#
 # from flask_mail import Mail
 # mail = Mail()
 # 
@@ -7,16 +7,30 @@ This package contains SQLAlchemy model definitions for the application.
 from app.models.base import Base
 
 # Import models to make them available when importing the package
-# from app.models.customer import Customer, Contact, CustomerContact
-# from app.models.pet import Pet
-# from app.models.vet import Vet
-# from app.models.booking import Booking
+from app.models.customer import Customer, Contact, CustomerContact
+from app.models.pet import Pet, Vaccination, VaccinationAlert
+from app.models.vet import Vet
+from app.models.run import Run, RunAllocation
+from app.models.booking import Booking, BookingPet
+from app.models.pricing import Season, Rate, MultiPetDiscount
+from app.models.job import JobRun
+from app.models.session import ServerSession
+from app.models.user import User, Role, Permission
+from app.models.staff import Employee, EmployeeSkill, ShiftType, EmployeeAvailability, LeaveRequest, ShiftAssignment
+from app.models.webhook import WebhookEvent
 
 # Export models
 __all__ = [
     'Base',
-    # 'Customer', 'Contact', 'CustomerContact',
-    # 'Pet',
-    # 'Vet',
-    # 'Booking',
+    'Customer', 'Contact', 'CustomerContact',
+    'Pet', 'Vaccination', 'VaccinationAlert',
+    'Vet',
+    'Run', 'RunAllocation',
+    'Booking', 'BookingPet',
+    'Season', 'Rate', 'MultiPetDiscount',
+    'JobRun',
+    'ServerSession',
+    'User', 'Role', 'Permission',
+    'Employee', 'EmployeeSkill', 'ShiftType', 'EmployeeAvailability', 'LeaveRequest', 'ShiftAssignment',
+    'WebhookEvent',
 ]
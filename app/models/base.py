@@ -4,15 +4,137 @@ Base model class and mixins for Crowbank Intranet.
 All models should inherit from the Base class defined here.
 """
 
-from datetime import datetime
 from typing import Dict, Any, Optional
 
-from sqlalchemy import Column, DateTime, Integer
+from sqlalchemy import Column, DateTime, Integer, DDL, event, func
 from sqlalchemy.ext.declarative import declarative_base
 
 # Create a base class for declarative models
 Base = declarative_base()
 
+# Name of the PL/pgSQL function that keeps updated_at current on every UPDATE,
+# including bulk and COPY-style writes that bypass the ORM.
+UPDATED_AT_FUNCTION = 'set_updated_at'
+
+CREATE_UPDATED_AT_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION {UPDATED_AT_FUNCTION}() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at = now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+DROP_UPDATED_AT_FUNCTION_SQL = f"DROP FUNCTION IF EXISTS {UPDATED_AT_FUNCTION}()"
+
+
+def create_updated_at_trigger_sql(table_name: str) -> str:
+    """
+    Build the statement attaching the updated_at trigger to a table.
+    
+    Shared by the metadata create hook and Alembic migrations so both
+    produce identically named triggers.
+    
+    Args:
+        table_name: Name of the table with an updated_at column
+        
+    Returns:
+        CREATE TRIGGER statement
+    """
+    return (
+        f"CREATE TRIGGER {table_name}_updated_at "
+        f"BEFORE UPDATE ON {table_name} "
+        f"FOR EACH ROW EXECUTE FUNCTION {UPDATED_AT_FUNCTION}()"
+    )
+
+
+def drop_updated_at_trigger_sql(table_name: str) -> str:
+    """
+    Build the statement removing the updated_at trigger from a table.
+    
+    Args:
+        table_name: Name of the table with an updated_at column
+        
+    Returns:
+        DROP TRIGGER statement
+    """
+    return f"DROP TRIGGER IF EXISTS {table_name}_updated_at ON {table_name}"
+
+
+# Full-text search over `notes` columns: a trigger keeps a tsvector column
+# in step, recomputing it only when the notes themselves change
+SEARCH_CONFIG = 'english'
+NOTES_SEARCH_FUNCTION = 'set_notes_tsv'
+NOTES_SEARCH_COLUMN = 'notes_tsv'
+
+CREATE_NOTES_SEARCH_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION {NOTES_SEARCH_FUNCTION}() RETURNS trigger AS $$
+BEGIN
+    NEW.{NOTES_SEARCH_COLUMN} = to_tsvector('{SEARCH_CONFIG}', NEW.notes);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+DROP_NOTES_SEARCH_FUNCTION_SQL = f"DROP FUNCTION IF EXISTS {NOTES_SEARCH_FUNCTION}()"
+
+
+def create_notes_search_trigger_sql(table_name: str) -> str:
+    """
+    Build the statement attaching the notes search trigger to a table.
+
+    Args:
+        table_name: Name of a table with `notes` and `notes_tsv` columns
+
+    Returns:
+        CREATE TRIGGER statement
+    """
+    return (
+        f"CREATE TRIGGER {table_name}_notes_tsv "
+        f"BEFORE INSERT OR UPDATE OF notes ON {table_name} "
+        f"FOR EACH ROW EXECUTE FUNCTION {NOTES_SEARCH_FUNCTION}()"
+    )
+
+
+def drop_notes_search_trigger_sql(table_name: str) -> str:
+    """
+    Build the statement removing the notes search trigger from a table.
+
+    Args:
+        table_name: Name of a table with a notes search trigger
+
+    Returns:
+        DROP TRIGGER statement
+    """
+    return f"DROP TRIGGER IF EXISTS {table_name}_notes_tsv ON {table_name}"
+
+
+event.listen(
+    Base.metadata,
+    'before_create',
+    DDL(CREATE_UPDATED_AT_FUNCTION_SQL).execute_if(dialect='postgresql'),
+)
+
+event.listen(
+    Base.metadata,
+    'before_create',
+    DDL(CREATE_NOTES_SEARCH_FUNCTION_SQL).execute_if(dialect='postgresql'),
+)
+
+
+@event.listens_for(Base.metadata, 'after_create')
+def _create_updated_at_triggers(target, connection, **kw):
+    """Attach the updated_at and notes search triggers to every table created via metadata."""
+    if connection.dialect.name != 'postgresql':
+        return
+    for table in kw.get('tables') or target.sorted_tables:
+        if 'updated_at' in table.c:
+            connection.execute(DDL(drop_updated_at_trigger_sql(table.name)))
+            connection.execute(DDL(create_updated_at_trigger_sql(table.name)))
+        if NOTES_SEARCH_COLUMN in table.c:
+            connection.execute(DDL(drop_notes_search_trigger_sql(table.name)))
+            connection.execute(DDL(create_notes_search_trigger_sql(table.name)))
+
 
 class CrowbankBase:
     """
@@ -24,9 +146,16 @@ class CrowbankBase:
     # Primary key column using auto-increment
     id = Column(Integer, primary_key=True)
     
-    # Audit timestamps
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # Audit timestamps, generated by the database so bulk inserts and COPY
+    # get them for free. On PostgreSQL a trigger keeps updated_at current;
+    # onupdate covers SQLite (development and tests), which has no trigger
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+    )
     
     def to_dict(self) -> Dict[str, Any]:
         """
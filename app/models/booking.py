@@ -0,0 +1,67 @@
+"""
+Booking models for Crowbank Intranet.
+"""
+
+import enum
+from sqlalchemy import Column, Integer, Date, DateTime, Text, ForeignKey, Enum, Index, func
+from sqlalchemy.orm import relationship
+
+from .base import Base, CrowbankBase
+
+
+class BookingStatus(str, enum.Enum):
+    PROVISIONAL = "provisional"
+    CONFIRMED = "confirmed"
+    CHECKED_IN = "checked_in"
+    CHECKED_OUT = "checked_out"
+    CANCELLED = "cancelled"
+
+
+# Bookings that still expect the pets on site
+ACTIVE_BOOKING_STATUSES = (
+    BookingStatus.PROVISIONAL,
+    BookingStatus.CONFIRMED,
+    BookingStatus.CHECKED_IN,
+)
+
+
+# Association Table for Booking-Pet Many-to-Many
+class BookingPet(Base):
+    __tablename__ = 'booking_pets'
+
+    booking_id = Column(Integer, ForeignKey('bookings.id'), primary_key=True)
+    pet_id = Column(Integer, ForeignKey('pets.id'), primary_key=True, index=True)
+    # When the pet was added to the booking; the booking's updated_at does not change
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    booking = relationship("Booking", back_populates="pet_associations")
+    pet = relationship("Pet")
+
+
+class Booking(Base, CrowbankBase):
+    __tablename__ = 'bookings'
+
+    legacy_booking_no = Column(Integer, nullable=True, unique=True)
+    customer_id = Column(Integer, ForeignKey('customers.id'), nullable=False, index=True)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    status = Column(Enum(BookingStatus), nullable=False, default=BookingStatus.PROVISIONAL)
+    notes = Column(Text, nullable=True)
+
+    customer = relationship("Customer", back_populates="bookings")
+    pet_associations = relationship("BookingPet", back_populates="booking", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index('ix_bookings_dates', 'start_date', 'end_date'),
+    )
+
+    @property
+    def pets(self):
+        return [assoc.pet for assoc in self.pet_associations]
+
+    @property
+    def display_ref(self):
+        return f"#{self.legacy_booking_no}" if self.legacy_booking_no else f"N{self.id}"
+
+    def __repr__(self):
+        return f"<Booking(id={self.id}, ref='{self.display_ref}', {self.start_date} - {self.end_date})>"
@@ -1,11 +1,17 @@
 import enum
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Enum, Boolean, Numeric
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Enum, Boolean, Numeric, Index, false, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 
 from .base import Base
 from .vet import Vet
 from .mixins import AddressMixin
 
+# Search vector over `notes`, maintained by a database trigger (see
+# app.models.base) and never loaded; plain text outside PostgreSQL
+NotesVector = Text().with_variant(TSVECTOR(), 'postgresql')
+
+
 # Enum for Contact Roles
 class ContactRole(str, enum.Enum):
     PRIMARY = "primary"
@@ -33,9 +39,14 @@ class Contact(Base, AddressMixin):
     phone_number = Column(String(30), nullable=True)
     email_address = Column(String(255), nullable=True, unique=True)
     notes = Column(Text, nullable=True)
+    notes_tsv = deferred(Column(NotesVector, nullable=True))
 
     customer_associations = relationship("CustomerContact", back_populates="contact")
 
+    __table_args__ = (
+        Index('ix_contacts_notes_tsv', 'notes_tsv', postgresql_using='gin'),
+    )
+
     def __repr__(self):
         return f"<Contact(id={self.id}, first_name='{self.first_name}', last_name='{self.last_name}')>"
 
@@ -48,9 +59,10 @@ class Customer(Base, AddressMixin):
 
     # Updated fields
     notes = Column(Text, nullable=True)
-    banned = Column(Boolean, nullable=False, default=False)
-    opt_out = Column(Boolean, nullable=False, default=False)
-    discount = Column(Numeric(5, 2), nullable=False, default=0)
+    notes_tsv = deferred(Column(NotesVector, nullable=True))
+    banned = Column(Boolean, nullable=False, default=False, server_default=false())
+    opt_out = Column(Boolean, nullable=False, default=False, server_default=false())
+    discount = Column(Numeric(5, 2), nullable=False, default=0, server_default=text('0'))
 
     # Default Vet (FK - linking to Vet model)
     default_vet_id = Column(Integer, ForeignKey('vets.id'), nullable=True)
@@ -59,6 +71,17 @@ class Customer(Base, AddressMixin):
     # Relationship to the association table
     contact_associations = relationship("CustomerContact", back_populates="customer", cascade="all, delete-orphan")
 
+    pets = relationship("Pet", back_populates="customer")
+    bookings = relationship("Booking", back_populates="customer")
+
+    __table_args__ = (
+        Index('ix_customers_notes_tsv', 'notes_tsv', postgresql_using='gin'),
+    )
+
+    @property
+    def display_ref(self):
+        return f"#{self.legacy_cust_no}" if self.legacy_cust_no else f"N{self.id}"
+
     @property
     def primary_contacts(self):
         return [assoc.contact for assoc in self.contact_associations if assoc.role == ContactRole.PRIMARY]
@@ -0,0 +1,23 @@
+"""
+Background job bookkeeping for Crowbank Intranet.
+"""
+
+from sqlalchemy import Column, String, DateTime
+
+from .base import Base
+
+
+class JobRun(Base):
+    """
+    Watermark for an incremental background job.
+
+    Jobs record when they last ran so the next run only re-checks rows
+    touched since then.
+    """
+    __tablename__ = 'job_runs'
+
+    name = Column(String(50), primary_key=True)
+    last_run_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<JobRun(name='{self.name}', last_run_at={self.last_run_at})>"
@@ -0,0 +1,118 @@
+"""
+Pet and vaccination models for Crowbank Intranet.
+"""
+
+import enum
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, ForeignKey, Enum, Index, event, func, text, update
+from sqlalchemy.orm import relationship
+
+from .base import Base, CrowbankBase
+
+
+class Species(str, enum.Enum):
+    DOG = "dog"
+    CAT = "cat"
+
+
+class VaccineType(str, enum.Enum):
+    DHP = "dhp"                                    # Distemper, hepatitis, parvovirus
+    LEPTOSPIROSIS = "leptospirosis"
+    KENNEL_COUGH = "kennel_cough"
+    FELINE_FLU_ENTERITIS = "feline_flu_enteritis"
+
+
+class VaccinationIssue(str, enum.Enum):
+    MISSING = "missing"
+    EXPIRED = "expired"                  # Expired before the stay starts
+    EXPIRES_DURING_STAY = "expires_during_stay"
+
+
+# Vaccinations that must be valid for the whole of a stay
+REQUIRED_VACCINES = {
+    Species.DOG: (VaccineType.DHP, VaccineType.LEPTOSPIROSIS, VaccineType.KENNEL_COUGH),
+    Species.CAT: (VaccineType.FELINE_FLU_ENTERITIS,),
+}
+
+
+class Pet(Base, CrowbankBase):
+    __tablename__ = 'pets'
+
+    legacy_pet_no = Column(Integer, nullable=True, unique=True)
+    customer_id = Column(Integer, ForeignKey('customers.id'), nullable=False, index=True)
+    name = Column(String(50), nullable=False)
+    species = Column(Enum(Species), nullable=False)
+    breed = Column(String(100), nullable=True)
+    date_of_birth = Column(Date, nullable=True)
+    notes = Column(Text, nullable=True)
+
+    # Overrides the customer's default vet when set
+    vet_id = Column(Integer, ForeignKey('vets.id'), nullable=True)
+
+    customer = relationship("Customer", back_populates="pets")
+    vet = relationship("Vet", back_populates="pets")
+    vaccinations = relationship("Vaccination", back_populates="pet", cascade="all, delete-orphan")
+
+    @property
+    def effective_vet(self):
+        return self.vet or self.customer.default_vet
+
+    def __repr__(self):
+        return f"<Pet(id={self.id}, name='{self.name}', species={self.species})>"
+
+
+class Vaccination(Base, CrowbankBase):
+    __tablename__ = 'vaccinations'
+
+    pet_id = Column(Integer, ForeignKey('pets.id'), nullable=False)
+    vaccine_type = Column(Enum(VaccineType), nullable=False)
+    administered_on = Column(Date, nullable=True)
+    # Null when the certificate gives no expiry; such records never satisfy a stay
+    expires_on = Column(Date, nullable=True)
+
+    pet = relationship("Pet", back_populates="vaccinations")
+
+    __table_args__ = (
+        # Serves the latest-expiry lookup per pet and vaccine in the expiry scan
+        Index(
+            'ix_vaccinations_pet_type_expires_on',
+            'pet_id', 'vaccine_type', 'expires_on',
+            postgresql_where=text('expires_on IS NOT NULL'),
+        ),
+    )
+
+    def __repr__(self):
+        return f"<Vaccination(id={self.id}, pet_id={self.pet_id}, type={self.vaccine_type}, expires_on={self.expires_on})>"
+
+
+@event.listens_for(Vaccination, 'after_delete')
+def _touch_pet_of_deleted_vaccination(mapper, connection, target):
+    """
+    Mark the pet as changed when one of its vaccinations is deleted.
+
+    The row is gone, so the vaccination expiry scan could not otherwise
+    tell the pet needs re-checking.
+    """
+    pets = Pet.__table__
+    connection.execute(update(pets).where(pets.c.id == target.pet_id).values(updated_at=func.now()))
+
+
+class VaccinationAlert(Base):
+    """
+    A booked pet whose vaccination will not cover its stay.
+
+    Maintained by the vaccination expiry scan.
+    """
+    __tablename__ = 'vaccination_alerts'
+
+    booking_id = Column(Integer, ForeignKey('bookings.id', ondelete='CASCADE'), primary_key=True)
+    pet_id = Column(Integer, ForeignKey('pets.id', ondelete='CASCADE'), primary_key=True, index=True)
+    vaccine_type = Column(Enum(VaccineType), primary_key=True)
+    issue = Column(Enum(VaccinationIssue), nullable=False)
+    expires_on = Column(Date, nullable=True)
+    detected_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    booking = relationship("Booking")
+    pet = relationship("Pet")
+
+    def __repr__(self):
+        return f"<VaccinationAlert(booking_id={self.booking_id}, pet_id={self.pet_id}, type={self.vaccine_type}, issue={self.issue})>"
@@ -0,0 +1,55 @@
+"""
+Pricing models for Crowbank Intranet.
+
+Rate cards are stored as rows here and compiled into in-memory lookup
+tables by the pricing service.
+"""
+
+from sqlalchemy import Column, Integer, String, Date, Numeric, Enum, UniqueConstraint
+
+from .base import Base, CrowbankBase
+from .pet import Species
+from .run import RunType
+
+
+class Season(Base, CrowbankBase):
+    """A date range priced at a given band (e.g. peak, standard, low)."""
+    __tablename__ = 'seasons'
+
+    name = Column(String(50), nullable=False)
+    band = Column(String(20), nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)  # Inclusive
+    # Where seasons overlap (e.g. Christmas inside winter), the highest wins
+    priority = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<Season(name='{self.name}', band='{self.band}', {self.start_date} - {self.end_date})>"
+
+
+class Rate(Base, CrowbankBase):
+    """Nightly rate for one pet of a species in a run type during a band."""
+    __tablename__ = 'rates'
+
+    band = Column(String(20), nullable=False)
+    species = Column(Enum(Species), nullable=False)
+    run_type = Column(Enum(RunType), nullable=False)
+    nightly_rate = Column(Numeric(8, 2), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('band', 'species', 'run_type', name='uq_rates_band_species_run_type'),
+    )
+
+    def __repr__(self):
+        return f"<Rate(band='{self.band}', species={self.species}, run_type={self.run_type}, nightly_rate={self.nightly_rate})>"
+
+
+class MultiPetDiscount(Base, CrowbankBase):
+    """Percentage discount for booking at least `min_pets` pets together."""
+    __tablename__ = 'multi_pet_discounts'
+
+    min_pets = Column(Integer, nullable=False, unique=True)
+    percent = Column(Numeric(5, 2), nullable=False)
+
+    def __repr__(self):
+        return f"<MultiPetDiscount(min_pets={self.min_pets}, percent={self.percent})>"
@@ -0,0 +1,74 @@
+"""
+Accommodation models for Crowbank Intranet.
+"""
+
+import enum
+from sqlalchemy import Column, Integer, String, Boolean, Date, ForeignKey, Enum, Index
+from sqlalchemy.orm import relationship
+
+from .base import Base, CrowbankBase
+from .pet import Species
+
+
+class RunType(str, enum.Enum):
+    KENNEL = "kennel"
+    DELUXE_KENNEL = "deluxe_kennel"
+    CATTERY = "cattery"
+    CATTERY_SUITE = "cattery_suite"
+
+
+RUN_TYPE_SPECIES = {
+    RunType.KENNEL: Species.DOG,
+    RunType.DELUXE_KENNEL: Species.DOG,
+    RunType.CATTERY: Species.CAT,
+    RunType.CATTERY_SUITE: Species.CAT,
+}
+
+
+class Run(Base, CrowbankBase):
+    """A kennel or cattery run; `capacity` is how many pets of one household can share it."""
+    __tablename__ = 'runs'
+
+    code = Column(String(20), nullable=False, unique=True)
+    run_type = Column(Enum(RunType), nullable=False)
+    capacity = Column(Integer, nullable=False, default=1)
+    active = Column(Boolean, nullable=False, default=True)
+
+    allocations = relationship("RunAllocation", back_populates="run")
+
+    @property
+    def species(self):
+        return RUN_TYPE_SPECIES[self.run_type]
+
+    def __repr__(self):
+        return f"<Run(code='{self.code}', {self.run_type}, capacity={self.capacity})>"
+
+
+class RunAllocation(Base, CrowbankBase):
+    """
+    A pet in a run for part or all of its stay.
+
+    Like bookings, `end_date` is the day the pet leaves the run, which can
+    then be let again that day. A pet moved mid-stay has one allocation
+    per run. Locked allocations were set by hand and are never moved.
+    """
+    __tablename__ = 'run_allocations'
+
+    booking_id = Column(Integer, ForeignKey('bookings.id', ondelete='CASCADE'), nullable=False, index=True)
+    pet_id = Column(Integer, ForeignKey('pets.id'), nullable=False)
+    run_id = Column(Integer, ForeignKey('runs.id'), nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    locked = Column(Boolean, nullable=False, default=False)
+
+    booking = relationship("Booking")
+    pet = relationship("Pet")
+    run = relationship("Run", back_populates="allocations")
+
+    __table_args__ = (
+        Index('ix_run_allocations_run_dates', 'run_id', 'start_date', 'end_date'),
+    )
+
+    def __repr__(self):
+        return (f"<RunAllocation(booking_id={self.booking_id}, pet_id={self.pet_id}, run_id={self.run_id}, "
+                f"{self.start_date} - {self.end_date})>")
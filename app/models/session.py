@@ -0,0 +1,23 @@
+"""
+Server-side session storage for Crowbank Intranet.
+"""
+
+from sqlalchemy import Column, String, Text, DateTime
+
+from .base import Base
+
+
+class ServerSession(Base):
+    """
+    Serialized Flask session data keyed by the session cookie's id.
+
+    Expired rows are purged in batches using the index on expires_at.
+    """
+    __tablename__ = 'sessions'
+
+    id = Column(String(64), primary_key=True)
+    data = Column(Text, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<ServerSession(id='{self.id[:8]}...', expires_at={self.expires_at})>"
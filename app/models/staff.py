@@ -0,0 +1,137 @@
+"""
+Staff and scheduling models for Crowbank Intranet.
+"""
+
+import enum
+from sqlalchemy import (Column, Integer, String, Boolean, Date, Time, Numeric, ForeignKey, Enum,
+                        Index, UniqueConstraint)
+from sqlalchemy.orm import relationship
+
+from .base import Base, CrowbankBase
+
+
+class Skill(str, enum.Enum):
+    DOG_HANDLING = "dog_handling"
+    CAT_CARE = "cat_care"
+    MEDICATION = "medication"
+    RECEPTION = "reception"
+
+
+class LeaveStatus(str, enum.Enum):
+    REQUESTED = "requested"
+    APPROVED = "approved"
+    REJECTED = "rejected"
+
+
+class Employee(Base, CrowbankBase):
+    __tablename__ = 'employees'
+
+    first_name = Column(String(100), nullable=False)
+    last_name = Column(String(100), nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=True, unique=True)
+    max_hours_per_week = Column(Numeric(4, 1), nullable=False, default=40)
+    active = Column(Boolean, nullable=False, default=True)
+
+    skill_associations = relationship("EmployeeSkill", back_populates="employee", cascade="all, delete-orphan")
+    availability = relationship("EmployeeAvailability", back_populates="employee", cascade="all, delete-orphan")
+    leave_requests = relationship("LeaveRequest", back_populates="employee", cascade="all, delete-orphan")
+    shifts = relationship("ShiftAssignment", back_populates="employee")
+
+    @property
+    def skills(self):
+        return {assoc.skill for assoc in self.skill_associations}
+
+    @property
+    def full_name(self):
+        return f"{self.first_name} {self.last_name}"
+
+    def __repr__(self):
+        return f"<Employee(id={self.id}, name='{self.full_name}')>"
+
+
+class EmployeeSkill(Base):
+    __tablename__ = 'employee_skills'
+
+    employee_id = Column(Integer, ForeignKey('employees.id', ondelete='CASCADE'), primary_key=True)
+    skill = Column(Enum(Skill), primary_key=True)
+
+    employee = relationship("Employee", back_populates="skill_associations")
+
+
+class ShiftType(Base, CrowbankBase):
+    """
+    A recurring shift of the day, e.g. morning 07:30-13:00.
+
+    Staff needed on a shift is `load_factor` of the day's full staffing
+    (from occupancy), but never fewer than `min_staff`.
+    """
+    __tablename__ = 'shift_types'
+
+    name = Column(String(50), nullable=False, unique=True)
+    start_time = Column(Time, nullable=False)
+    end_time = Column(Time, nullable=False)
+    min_staff = Column(Integer, nullable=False, default=1)
+    load_factor = Column(Numeric(3, 2), nullable=False, default=1)
+
+    @property
+    def hours(self):
+        start = self.start_time.hour * 60 + self.start_time.minute
+        end = self.end_time.hour * 60 + self.end_time.minute
+        return (end - start) / 60
+
+    def __repr__(self):
+        return f"<ShiftType(name='{self.name}', {self.start_time}-{self.end_time})>"
+
+
+class EmployeeAvailability(Base):
+    """An employee can work a shift type on a weekday (0 = Monday)."""
+    __tablename__ = 'employee_availability'
+
+    employee_id = Column(Integer, ForeignKey('employees.id', ondelete='CASCADE'), primary_key=True)
+    weekday = Column(Integer, primary_key=True)
+    shift_type_id = Column(Integer, ForeignKey('shift_types.id', ondelete='CASCADE'), primary_key=True)
+
+    employee = relationship("Employee", back_populates="availability")
+    shift_type = relationship("ShiftType")
+
+
+class LeaveRequest(Base, CrowbankBase):
+    __tablename__ = 'leave_requests'
+
+    employee_id = Column(Integer, ForeignKey('employees.id', ondelete='CASCADE'), nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)  # Inclusive
+    status = Column(Enum(LeaveStatus), nullable=False, default=LeaveStatus.REQUESTED)
+
+    employee = relationship("Employee", back_populates="leave_requests")
+
+    __table_args__ = (
+        Index('ix_leave_requests_employee_dates', 'employee_id', 'start_date', 'end_date'),
+    )
+
+    def __repr__(self):
+        return f"<LeaveRequest(employee_id={self.employee_id}, {self.start_date} - {self.end_date}, {self.status})>"
+
+
+class ShiftAssignment(Base, CrowbankBase):
+    """
+    An employee rostered on a shift. Locked assignments were set by a
+    manager and are kept when the rota is re-solved.
+    """
+    __tablename__ = 'shift_assignments'
+
+    employee_id = Column(Integer, ForeignKey('employees.id'), nullable=False)
+    shift_type_id = Column(Integer, ForeignKey('shift_types.id'), nullable=False)
+    date = Column(Date, nullable=False)
+    locked = Column(Boolean, nullable=False, default=False)
+
+    employee = relationship("Employee", back_populates="shifts")
+    shift_type = relationship("ShiftType")
+
+    __table_args__ = (
+        UniqueConstraint('employee_id', 'date', 'shift_type_id', name='uq_shift_assignments_employee_date_shift'),
+        Index('ix_shift_assignments_date', 'date'),
+    )
+
+    def __repr__(self):
+        return f"<ShiftAssignment(employee_id={self.employee_id}, shift_type_id={self.shift_type_id}, date={self.date})>"
@@ -0,0 +1,117 @@
+"""
+User, role and permission models for Crowbank Intranet.
+
+Users get permissions only through roles. Each user carries a
+`permissions_version` that is bumped whenever anything feeding their
+effective permission set changes, so cached sets can be checked for
+staleness without touching the role tables.
+"""
+
+from flask_login import UserMixin
+from sqlalchemy import (Column, Integer, String, Boolean, DateTime, ForeignKey, Table,
+                        event, inspect, select, update)
+from sqlalchemy.orm import Session, relationship
+
+from .base import Base, CrowbankBase
+
+
+user_roles = Table(
+    'user_roles',
+    Base.metadata,
+    Column('user_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+    Column('role_id', Integer, ForeignKey('roles.id', ondelete='CASCADE'), primary_key=True, index=True),
+)
+
+role_permissions = Table(
+    'role_permissions',
+    Base.metadata,
+    Column('role_id', Integer, ForeignKey('roles.id', ondelete='CASCADE'), primary_key=True),
+    Column('permission_id', Integer, ForeignKey('permissions.id', ondelete='CASCADE'),
+           primary_key=True, index=True),
+)
+
+
+class User(Base, CrowbankBase, UserMixin):
+    __tablename__ = 'users'
+
+    username = Column(String(50), nullable=False, unique=True)
+    email = Column(String(120), nullable=True)
+    password_hash = Column(String(255), nullable=False)
+    active = Column(Boolean, nullable=False, default=True)
+    last_login_at = Column(DateTime(timezone=True), nullable=True)
+    permissions_version = Column(Integer, nullable=False, default=1)
+
+    roles = relationship("Role", secondary=user_roles, back_populates="users")
+
+    @property
+    def is_active(self):
+        return self.active
+
+    def __repr__(self):
+        return f"<User(id={self.id}, username='{self.username}')>"
+
+
+class Role(Base, CrowbankBase):
+    __tablename__ = 'roles'
+
+    name = Column(String(50), nullable=False, unique=True)
+    description = Column(String(255), nullable=True)
+
+    users = relationship("User", secondary=user_roles, back_populates="roles")
+    permissions = relationship("Permission", secondary=role_permissions, back_populates="roles")
+
+    def __repr__(self):
+        return f"<Role(name='{self.name}')>"
+
+
+class Permission(Base, CrowbankBase):
+    """A named capability, e.g. 'bookings.edit'."""
+    __tablename__ = 'permissions'
+
+    name = Column(String(100), nullable=False, unique=True)
+    description = Column(String(255), nullable=True)
+
+    roles = relationship("Role", secondary=role_permissions, back_populates="permissions")
+
+    def __repr__(self):
+        return f"<Permission(name='{self.name}')>"
+
+
+def _has_changes(obj, attribute: str) -> bool:
+    return inspect(obj).attrs[attribute].history.has_changes()
+
+
+@event.listens_for(Session, 'before_flush')
+def _bump_permissions_versions(session, flush_context, instances):
+    """
+    Invalidate cached permission sets affected by this flush.
+
+    Runs before the flush so members of deleted roles can still be found.
+    """
+    role_ids = set()
+    permission_ids = set()
+
+    for obj in session.new | session.dirty:
+        if isinstance(obj, User) and obj.id is not None and _has_changes(obj, 'roles'):
+            obj.permissions_version = (obj.permissions_version or 0) + 1
+        elif isinstance(obj, Role) and obj.id is not None and _has_changes(obj, 'permissions'):
+            role_ids.add(obj.id)
+        elif isinstance(obj, Permission) and obj.id is not None and _has_changes(obj, 'name'):
+            permission_ids.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, Role):
+            role_ids.add(obj.id)
+        elif isinstance(obj, Permission):
+            permission_ids.add(obj.id)
+
+    if permission_ids:
+        role_ids.update(session.connection().scalars(
+            select(role_permissions.c.role_id).where(role_permissions.c.permission_id.in_(permission_ids))
+        ))
+    if role_ids:
+        users = User.__table__
+        session.connection().execute(
+            update(users)
+            .where(users.c.id.in_(select(user_roles.c.user_id).where(user_roles.c.role_id.in_(role_ids))))
+            .values(permissions_version=users.c.permissions_version + 1)
+        )
@@ -0,0 +1,53 @@
+"""
+Inbound webhook models for Crowbank Intranet.
+"""
+
+import enum
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, Index, UniqueConstraint, text
+from sqlalchemy.orm import relationship
+
+from .base import Base, CrowbankBase
+
+
+class WebhookSource(str, enum.Enum):
+    GRAVITY_FORMS = "gravity_forms"
+    STRIPE = "stripe"
+
+
+class WebhookStatus(str, enum.Enum):
+    PENDING = "pending"
+    PROCESSED = "processed"
+    UNMATCHED = "unmatched"  # Processed, but no customer matched
+    FAILED = "failed"
+
+
+class WebhookEvent(Base, CrowbankBase):
+    """
+    A webhook delivery, stored as received and processed later.
+
+    The (source, idempotency_key) pair is unique, so a sender retrying a
+    delivery is acknowledged without storing it twice.
+    """
+    __tablename__ = 'webhook_events'
+
+    source = Column(Enum(WebhookSource), nullable=False)
+    idempotency_key = Column(String(255), nullable=False)
+    event_type = Column(String(100), nullable=True)
+    payload = Column(Text, nullable=False)  # Raw request body
+    status = Column(Enum(WebhookStatus), nullable=False, default=WebhookStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    customer_id = Column(Integer, ForeignKey('customers.id'), nullable=True)
+    error = Column(Text, nullable=True)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True)  # Not claimed before then; null = now
+
+    customer = relationship("Customer")
+
+    __table_args__ = (
+        UniqueConstraint('source', 'idempotency_key', name='uq_webhook_events_source_key'),
+        # The worker's queue: small however large the history grows
+        Index('ix_webhook_events_pending', 'id', postgresql_where=text("status = 'PENDING'")),
+    )
+
+    def __repr__(self):
+        return f"<WebhookEvent(id={self.id}, {self.source}, key='{self.idempotency_key}', {self.status})>"
@@ -0,0 +1,5 @@
+"""
+Service layer for the Crowbank Intranet.
+
+Business logic lives here, keeping Flask routes thin.
+"""
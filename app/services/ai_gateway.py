@@ -0,0 +1,475 @@
+"""
+Gateway for AI model calls (social captions, email drafts, vet assistance).
+
+Every model call goes through an `AIGateway`, which:
+
+- renders a registered `PromptTemplate` with the caller's inputs
+- serves repeated prompts from a content-addressed cache, keyed by a hash
+  of the template (its text and settings, so editing a template
+  invalidates its answers), the model and the inputs, with a TTL per
+  feature and eviction by entry count and total size
+- coalesces identical prompts already in flight, so a burst of clicks on
+  the same pet waits for one model call rather than making several
+- limits the calls in flight overall and per feature
+- keeps per-feature counts, token usage and latency (`metrics()`)
+
+Calls run on an event loop owned by the gateway, in a background thread,
+so Flask views can call `generate_sync` while async code awaits
+`generate`; both share the same cache, in-flight calls and limits.
+
+The ``local`` backend is a deterministic stand-in that makes no network
+calls, used in development and tests.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+class AIError(Exception):
+    """Raised when a prompt is unknown or the model call fails."""
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """A named prompt, filled in with `str.format` fields."""
+
+    name: str
+    feature: str  # Groups prompts for limits, cache TTL and metrics
+    template: str
+    system: Optional[str] = None
+    max_tokens: int = 300
+    temperature: float = 0.7
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash of everything about the template that affects its answers."""
+        parts = [self.template, self.system or '', str(self.max_tokens), str(self.temperature)]
+        return hashlib.sha256('\0'.join(parts).encode()).hexdigest()
+
+    def render(self, inputs: Dict[str, Any]) -> str:
+        try:
+            return self.template.format_map(inputs)
+        except KeyError as e:
+            raise AIError(f"Prompt {self.name} needs input {e}") from None
+
+
+class Completion(NamedTuple):
+    text: str
+    input_tokens: int
+    output_tokens: int
+    model: str
+    cached: bool = False
+
+
+class FeatureStats(NamedTuple):
+    requests: int
+    cache_hits: int
+    coalesced: int
+    model_calls: int
+    errors: int
+    input_tokens: int
+    output_tokens: int
+    latency_p50: Optional[float]  # Seconds per model call, over recent calls
+    latency_p95: Optional[float]
+
+
+class PromptRegistry:
+    """Registry of prompt templates, keyed by name."""
+
+    def __init__(self):
+        self._prompts: Dict[str, PromptTemplate] = {}
+
+    def register(self, prompt: PromptTemplate) -> PromptTemplate:
+        """
+        Add a prompt to the registry.
+
+        Args:
+            prompt: Prompt template
+
+        Returns:
+            The registered template
+        """
+        if prompt.name in self._prompts:
+            raise AIError(f"Prompt already registered: {prompt.name}")
+        self._prompts[prompt.name] = prompt
+        return prompt
+
+    def get(self, name: str) -> PromptTemplate:
+        """Look up a prompt by name."""
+        try:
+            return self._prompts[name]
+        except KeyError:
+            raise AIError(f"Unknown prompt: {name}") from None
+
+
+# Default registry used by the pre-defined prompts
+registry = PromptRegistry()
+
+
+def register_prompt(name: str, feature: str, template: str, system: Optional[str] = None,
+                    max_tokens: int = 300, temperature: float = 0.7) -> PromptTemplate:
+    """
+    Register a prompt with the default registry.
+
+    Args:
+        name: Unique prompt name
+        feature: Feature the prompt belongs to (e.g. 'captions')
+        template: Prompt text with ``{field}`` placeholders for the inputs
+        system: Optional system instructions
+        max_tokens: Longest answer requested
+        temperature: Sampling temperature
+
+    Returns:
+        The registered template
+    """
+    return registry.register(PromptTemplate(name, feature, template, system, max_tokens, temperature))
+
+
+def prompt_key(prompt: PromptTemplate, inputs: Dict[str, Any], model: str) -> str:
+    """
+    Content address of a prompt's answer.
+
+    Args:
+        prompt: Prompt template
+        inputs: Values the template is filled with
+        model: Model name
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    content = json.dumps([prompt.name, prompt.fingerprint, model, inputs],
+                         sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    LRU cache of completions with a TTL per entry, bounded by entry count
+    and total text size.
+    """
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 10 * 2**20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, Tuple[float, int, Completion]]' = OrderedDict()
+
+    def get(self, key: str) -> Optional[Completion]:
+        """Get a cached completion, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, size, completion = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self.size -= size
+                return None
+            self._entries.move_to_end(key)
+            return completion
+
+    def set(self, key: str, completion: Completion, ttl: float) -> None:
+        """Store a completion, evicting the least recently used entries."""
+        size = len(completion.text.encode())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._entries[key] = (time.monotonic() + ttl, size, completion)
+            self.size += size
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self.size -= evicted
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """Remove all cached completions."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class LocalBackend:
+    """
+    Deterministic stand-in for a model: the same prompt always gets the
+    same answer, with no network calls. Tokens are counted as words.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+
+    async def complete(self, prompt: str, model: str, max_tokens: int, temperature: float,
+                       system: Optional[str] = None) -> Completion:
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        digest = hashlib.sha256(f"{system}\0{prompt}".encode()).hexdigest()[:8]
+        words = f"[{digest}] {prompt.strip().splitlines()[-1] if prompt.strip() else ''}".split()[:max_tokens]
+        return Completion(' '.join(words), len(((system or '') + ' ' + prompt).split()), len(words), model)
+
+
+class OpenAIBackend:
+    """Chat completions over HTTP, from OpenAI or a compatible endpoint (e.g. Azure)."""
+
+    def __init__(self, api_key: str, base_url: str = 'https://api.openai.com/v1', timeout: float = 30):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    async def complete(self, prompt: str, model: str, max_tokens: int, temperature: float,
+                       system: Optional[str] = None) -> Completion:
+        return await asyncio.to_thread(self._post, prompt, model, max_tokens, temperature, system)
+
+    def _post(self, prompt, model, max_tokens, temperature, system) -> Completion:
+        messages = ([{'role': 'system', 'content': system}] if system else []) + [{'role': 'user', 'content': prompt}]
+        request = urllib.request.Request(
+            f"{self.base_url}/chat/completions",
+            data=json.dumps({'model': model, 'messages': messages, 'max_tokens': max_tokens,
+                             'temperature': temperature}).encode(),
+            headers={'Authorization': f"Bearer {self.api_key}", 'Content-Type': 'application/json'},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                data = json.load(response)
+        except urllib.error.HTTPError as e:
+            raise AIError(f"Model call failed with HTTP {e.code}") from e
+        except (urllib.error.URLError, TimeoutError) as e:
+            raise AIError(f"Model call failed: {e}") from e
+        usage = data.get('usage', {})
+        return Completion(data['choices'][0]['message']['content'], usage.get('prompt_tokens', 0),
+                          usage.get('completion_tokens', 0), data.get('model', model))
+
+
+class _FeatureMetrics:
+    def __init__(self):
+        self.counts = defaultdict(int)
+        self.latencies = deque(maxlen=500)
+
+    def snapshot(self) -> FeatureStats:
+        latencies = sorted(self.latencies)
+        p50 = p95 = None
+        if latencies:
+            p50 = statistics.median(latencies)
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        names = ('requests', 'cache_hits', 'coalesced', 'model_calls', 'errors', 'input_tokens', 'output_tokens')
+        return FeatureStats(*(self.counts[name] for name in names), p50, p95)
+
+
+class AIGateway:
+    """
+    Cached, coalescing, rate-limited access to a model backend.
+    """
+
+    def __init__(self, backend, registry: PromptRegistry = registry, cache: Optional[ResponseCache] = None,
+                 model: str = 'gpt-4o-mini', timeout: float = 30, max_concurrency: int = 4,
+                 cache_ttl: float = 86400, features: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.backend = backend
+        self.registry = registry
+        self.cache = cache or ResponseCache()
+        self.model = model
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.cache_ttl = cache_ttl
+        self.features = features or {}
+        self._metrics: Dict[str, _FeatureMetrics] = defaultdict(_FeatureMetrics)
+        self._metrics_lock = threading.Lock()
+        # Owned by the gateway's loop thread
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._limits: Dict[Optional[str], asyncio.Semaphore] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'AIGateway':
+        """
+        Create a gateway from the nested `ai` configuration.
+
+        Args:
+            config: Nested application configuration
+
+        Returns:
+            Configured gateway
+        """
+        ai_config = config.get('ai', {})
+        backend_type = ai_config.get('backend', 'local')
+        if backend_type == 'local':
+            backend = LocalBackend(ai_config.get('local_delay', 0.0))
+        elif backend_type == 'openai':
+            if not ai_config.get('api_key'):
+                raise AIError("The openai backend needs ai.api_key")
+            backend = OpenAIBackend(ai_config['api_key'], ai_config.get('base_url', 'https://api.openai.com/v1'),
+                                    ai_config.get('timeout', 30))
+        else:
+            raise AIError(f"Unknown AI backend: {backend_type}")
+        return cls(
+            backend,
+            cache=ResponseCache(ai_config.get('cache_max_entries', 1000), ai_config.get('cache_max_bytes', 10 * 2**20)),
+            model=ai_config.get('model', 'gpt-4o-mini'),
+            timeout=ai_config.get('timeout', 30),
+            max_concurrency=ai_config.get('max_concurrency', 4),
+            cache_ttl=ai_config.get('cache_ttl', 86400),
+            features=ai_config.get('features', {}),
+        )
+
+    def _count(self, feature: str, **counts: int) -> None:
+        with self._metrics_lock:
+            metrics = self._metrics[feature]
+            for name, value in counts.items():
+                metrics.counts[name] += value
+
+    def metrics(self) -> Dict[str, FeatureStats]:
+        """Get the counters and latency percentiles of each feature."""
+        with self._metrics_lock:
+            return {feature: metrics.snapshot() for feature, metrics in self._metrics.items()}
+
+    def _limit(self, feature: Optional[str]) -> asyncio.Semaphore:
+        if feature not in self._limits:
+            limit = self.max_concurrency if feature is None else \
+                self.features.get(feature, {}).get('max_concurrency', self.max_concurrency)
+            self._limits[feature] = asyncio.Semaphore(limit)
+        return self._limits[feature]
+
+    async def _call(self, prompt: PromptTemplate, text: str) -> Completion:
+        # Feature slot first, so a busy feature does not hold global slots while it waits
+        async with self._limit(prompt.feature), self._limit(None):
+            started = time.perf_counter()
+            try:
+                completion = await asyncio.wait_for(
+                    self.backend.complete(text, model=self.model, max_tokens=prompt.max_tokens,
+                                          temperature=prompt.temperature, system=prompt.system),
+                    self.timeout)
+            except asyncio.TimeoutError:
+                self._count(prompt.feature, errors=1)
+                raise AIError(f"Model call for {prompt.name} timed out after {self.timeout}s") from None
+            except AIError:
+                self._count(prompt.feature, errors=1)
+                raise
+            except Exception as e:
+                self._count(prompt.feature, errors=1)
+                raise AIError(f"Model call for {prompt.name} failed: {e}") from e
+            elapsed = time.perf_counter() - started
+
+        with self._metrics_lock:
+            metrics = self._metrics[prompt.feature]
+            metrics.latencies.append(elapsed)
+            metrics.counts['model_calls'] += 1
+            metrics.counts['input_tokens'] += completion.input_tokens
+            metrics.counts['output_tokens'] += completion.output_tokens
+        logger.debug(f"{prompt.name}: {elapsed:.2f}s, {completion.input_tokens}+{completion.output_tokens} tokens")
+        return completion
+
+    async def _generate(self, name: str, inputs: Dict[str, Any]) -> Completion:
+        prompt = self.registry.get(name)
+        text = prompt.render(inputs)
+        key = prompt_key(prompt, inputs, self.model)
+        self._count(prompt.feature, requests=1)
+
+        completion = self.cache.get(key)
+        if completion is not None:
+            self._count(prompt.feature, cache_hits=1)
+            return completion._replace(cached=True)
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self._count(prompt.feature, coalesced=1)
+        else:
+            # Its own task, so cancelling the caller that started it leaves the others waiting
+            task = self._inflight[key] = asyncio.get_running_loop().create_task(self._complete(prompt, text, key))
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    async def _complete(self, prompt: PromptTemplate, text: str, key: str) -> Completion:
+        completion = await self._call(prompt, text)
+        ttl = self.features.get(prompt.feature, {}).get('cache_ttl', self.cache_ttl)
+        if ttl:
+            self.cache.set(key, completion, ttl)
+        return completion
+
+    def _finished(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved, even if every caller has gone
+
+    def _run_loop(self, loop: asyncio.AbstractEventLoop, ready: threading.Event) -> None:
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        loop.run_forever()
+        loop.close()
+
+    def _submit(self, name: str, inputs: Dict[str, Any]) -> Future:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                ready = threading.Event()
+                threading.Thread(target=self._run_loop, args=(self._loop, ready),
+                                 name='ai-gateway', daemon=True).start()
+                ready.wait()
+        return asyncio.run_coroutine_threadsafe(self._generate(name, dict(inputs)), self._loop)
+
+    async def generate(self, name: str, inputs: Dict[str, Any]) -> Completion:
+        """
+        Answer a prompt, from cache when possible.
+
+        Args:
+            name: Registered prompt name
+            inputs: Values for the prompt's fields (JSON-serializable)
+
+        Returns:
+            The completion; `cached` is set when no model call was made for it
+
+        Raises:
+            AIError: If the prompt is unknown or the model call fails
+        """
+        return await asyncio.wrap_future(self._submit(name, inputs))
+
+    def generate_sync(self, name: str, inputs: Dict[str, Any]) -> Completion:
+        """Blocking `generate`, for request handlers and CLI commands."""
+        return self._submit(name, inputs).result()
+
+    def close(self) -> None:
+        """Stop the gateway's event loop."""
+        with self._loop_lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop = None
+                self._limits.clear()
+
+
+def get_ai_gateway() -> AIGateway:
+    """
+    Get the AI gateway for the current Flask app, creating it on first use.
+
+    Returns:
+        The app's gateway
+    """
+    from flask import current_app
+
+    # Ensure the pre-defined prompts are registered
+    from app.services import ai_prompts  # noqa: F401
+
+    gateway = current_app.extensions.get('ai_gateway')
+    if gateway is None:
+        gateway = AIGateway.from_config(current_app.config.get('CONFIG', {}))
+        current_app.extensions['ai_gateway'] = gateway
+    return gateway
@@ -0,0 +1,72 @@
+"""
+Pre-defined AI prompts for the Crowbank Intranet.
+
+Importing this module registers the prompts with the default registry.
+The input helpers pick out only the fields a prompt uses, so unrelated
+edits to a pet or customer keep their cached answers valid.
+"""
+
+from typing import Any, Dict
+
+from app.services.ai_gateway import register_prompt
+
+
+register_prompt(
+    name='social_caption',
+    feature='captions',
+    system="You write short, warm social media captions for Crowbank, a family-run pet boarding "
+           "kennels and cattery. No hashtags unless asked. Never mention the owner's name.",
+    template="Write a caption for a photo of {name}, a {breed} {species}, staying with us for {occasion}.",
+    max_tokens=80,
+    temperature=0.8,
+)
+
+register_prompt(
+    name='email_draft',
+    feature='email',
+    system="You draft polite, concise emails from Crowbank staff to customers. "
+           "Sign off as 'The Crowbank Team'.",
+    template="Draft an email to {first_name} about {purpose}. Their pets: {pets}.",
+    max_tokens=400,
+    temperature=0.5,
+)
+
+register_prompt(
+    name='vet_question',
+    feature='vet',
+    system="You help kennel staff decide whether a pet needs a vet. Be cautious: when in doubt, "
+           "advise calling the pet's vet. You are not a substitute for veterinary advice.",
+    template="{species} ({breed}, {age}). Staff observation: {question}",
+    max_tokens=400,
+    temperature=0.2,
+)
+
+
+def pet_inputs(pet) -> Dict[str, Any]:
+    """
+    Prompt inputs describing a pet.
+
+    Args:
+        pet: Pet
+
+    Returns:
+        name, species and breed
+    """
+    return {'name': pet.name, 'species': pet.species.value, 'breed': pet.breed or 'mixed breed'}
+
+
+def customer_inputs(customer) -> Dict[str, Any]:
+    """
+    Prompt inputs describing a household, addressed to its primary contact.
+
+    Args:
+        customer: Customer
+
+    Returns:
+        first_name and pets (their names, sorted)
+    """
+    primary = customer.primary_contacts
+    return {
+        'first_name': primary[0].first_name if primary else 'there',
+        'pets': ', '.join(sorted(pet.name for pet in customer.pets)) or 'none',
+    }
@@ -0,0 +1,311 @@
+"""
+Authentication and permission service for the Crowbank Intranet.
+
+A user's effective permission set is resolved with one query at login
+and cached in their session together with the user's
+`permissions_version`. Flask-Login loads the user on each request
+anyway, so a permission check only compares that version with the
+cached one; the role tables are queried again only after a role or
+permission change has bumped it.
+
+Password hashing uses bcrypt with a per-environment cost
+(``auth.bcrypt_log_rounds``), or any werkzeug hash method named in
+``auth.password_hash_method``. Hashes made with an outdated method or
+cost are upgraded at the user's next successful login.
+"""
+
+import logging
+from datetime import datetime, timezone
+from functools import wraps
+from typing import FrozenSet, Optional
+
+from flask import abort, current_app, g, session as flask_session
+from flask_login import LoginManager, current_user, login_user, logout_user
+from sqlalchemy import select
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from app.models.user import Permission, User, role_permissions, user_roles
+
+
+logger = logging.getLogger(__name__)
+
+# Session key holding the cached permission set
+PERMISSIONS_KEY = '_permissions'
+
+# Verified against when the username is unknown, so failed logins take
+# the same time whether or not the user exists
+_DUMMY_PASSWORD = 'not a real password'
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords.
+
+    Args:
+        method: 'bcrypt', or a werkzeug method such as 'scrypt' or 'pbkdf2:sha256:600000'
+        rounds: bcrypt cost factor (log2 of the work)
+    """
+
+    def __init__(self, method: str = 'bcrypt', rounds: int = 12):
+        self.method = method
+        self.rounds = rounds
+        self._dummy_hash = None
+
+    @staticmethod
+    def _bcrypt():
+        try:
+            import bcrypt
+        except ImportError as e:
+            raise RuntimeError("bcrypt password hashing requires the bcrypt package") from e
+        return bcrypt
+
+    def hash(self, password: str) -> str:
+        """
+        Hash a password with the configured method and cost.
+
+        Args:
+            password: Plain-text password
+
+        Returns:
+            Encoded hash
+        """
+        if self.method == 'bcrypt':
+            bcrypt = self._bcrypt()
+            return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.rounds)).decode('ascii')
+        return generate_password_hash(password, method=self.method)
+
+    def verify(self, password_hash: Optional[str], password: str) -> bool:
+        """
+        Check a password against a hash made by any supported method.
+
+        Args:
+            password_hash: Stored hash, or None to spend the time of a check and fail
+            password: Plain-text password
+
+        Returns:
+            True if the password matches
+        """
+        if password_hash is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = self.hash(_DUMMY_PASSWORD)
+            self.verify(self._dummy_hash, password)
+            return False
+        if password_hash.startswith('$2'):
+            return self._bcrypt().checkpw(password.encode('utf-8'), password_hash.encode('ascii'))
+        return check_password_hash(password_hash, password)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """
+        Check whether a hash was made with a different method or cost.
+
+        Args:
+            password_hash: Stored hash
+
+        Returns:
+            True if the hash should be replaced
+        """
+        if self.method == 'bcrypt':
+            # $2b$12$...
+            parts = password_hash.split('$')
+            return not (password_hash.startswith('$2') and len(parts) > 2
+                        and parts[2] == f"{self.rounds:02d}")
+        return not password_hash.startswith(self.method + '$')
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'PasswordHasher':
+        """
+        Build a hasher from the ``auth`` config section.
+
+        Args:
+            config: Nested application config
+
+        Returns:
+            Configured hasher
+        """
+        auth = config.get('auth', {})
+        return cls(auth.get('password_hash_method', 'bcrypt'), auth.get('bcrypt_log_rounds', 12))
+
+
+def get_password_hasher() -> PasswordHasher:
+    """
+    Get the current app's password hasher.
+
+    Returns:
+        The hasher, created from config on first use
+    """
+    hasher = current_app.extensions.get('password_hasher')
+    if hasher is None:
+        hasher = current_app.extensions['password_hasher'] = PasswordHasher.from_config(
+            current_app.config.get('CONFIG', {})
+        )
+    return hasher
+
+
+def resolve_permissions(session, user_id: int) -> FrozenSet[str]:
+    """
+    Compute a user's effective permissions across all their roles.
+
+    Args:
+        session: SQLAlchemy session
+        user_id: User id
+
+    Returns:
+        Permission names
+    """
+    return frozenset(session.scalars(
+        select(Permission.name)
+        .join(role_permissions, role_permissions.c.permission_id == Permission.id)
+        .join(user_roles, user_roles.c.role_id == role_permissions.c.role_id)
+        .where(user_roles.c.user_id == user_id)
+        .distinct()
+    ))
+
+
+def _cache_permissions(user: User, permissions: FrozenSet[str]) -> None:
+    flask_session[PERMISSIONS_KEY] = {
+        'user': user.id,
+        'version': user.permissions_version,
+        'names': sorted(permissions),
+    }
+
+
+def effective_permissions(user=None) -> FrozenSet[str]:
+    """
+    Get a user's permissions from the session cache, resolving only if stale.
+
+    Args:
+        user: User (defaults to the logged-in user)
+
+    Returns:
+        Permission names; empty for anonymous users
+    """
+    user = user if user is not None else current_user
+    if not getattr(user, 'is_authenticated', False):
+        return frozenset()
+
+    key = (user.id, user.permissions_version)
+    cached = g.get('permissions')
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    entry = flask_session.get(PERMISSIONS_KEY)
+    if entry and entry['user'] == user.id and entry['version'] == user.permissions_version:
+        permissions = frozenset(entry['names'])
+    else:
+        from app.extensions import db
+        permissions = resolve_permissions(db.session, user.id)
+        _cache_permissions(user, permissions)
+
+    g.permissions = (key, permissions)
+    return permissions
+
+
+def has_permission(name: str, user=None) -> bool:
+    """
+    Check whether a user holds a permission.
+
+    Args:
+        name: Permission name, e.g. 'bookings.edit'
+        user: User (defaults to the logged-in user)
+
+    Returns:
+        True if granted through any of the user's roles
+    """
+    return name in effective_permissions(user)
+
+
+def permission_required(name: str):
+    """
+    Restrict a view to users holding a permission.
+
+    Anonymous users are sent to the login view; logged-in users without
+    the permission get a 403.
+
+    Args:
+        name: Permission name
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_user.is_authenticated:
+                return current_app.login_manager.unauthorized()
+            if not has_permission(name):
+                abort(403)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def authenticate(session, username: str, password: str) -> Optional[User]:
+    """
+    Check a username and password, upgrading an outdated hash on success.
+
+    Args:
+        session: SQLAlchemy session
+        username: Username
+        password: Plain-text password
+
+    Returns:
+        The active user, or None if the credentials are wrong
+    """
+    hasher = get_password_hasher()
+    user = session.scalars(select(User).where(User.username == username)).first()
+    if not hasher.verify(user.password_hash if user else None, password) or not user.is_active:
+        return None
+    if hasher.needs_rehash(user.password_hash):
+        user.password_hash = hasher.hash(password)
+    return user
+
+
+def login(session, user: User, remember: bool = False) -> FrozenSet[str]:
+    """
+    Log a user in and cache their effective permissions.
+
+    The session id is regenerated first so a pre-login id cannot be reused.
+
+    Args:
+        session: SQLAlchemy session
+        user: Authenticated user
+        remember: Set Flask-Login's remember-me cookie
+
+    Returns:
+        The user's permissions
+    """
+    regenerate = getattr(flask_session, 'regenerate', None)
+    if regenerate is not None:
+        regenerate()
+    login_user(user, remember=remember)
+    user.last_login_at = datetime.now(timezone.utc)
+    session.commit()
+
+    permissions = resolve_permissions(session, user.id)
+    _cache_permissions(user, permissions)
+    g.permissions = ((user.id, user.permissions_version), permissions)
+    return permissions
+
+
+def logout() -> None:
+    """Log the current user out and drop their cached permissions."""
+    logout_user()
+    flask_session.pop(PERMISSIONS_KEY, None)
+    g.pop('permissions', None)
+
+
+def init_auth(app, login_manager: LoginManager, db) -> None:
+    """
+    Set up Flask-Login and the `can()` template helper.
+
+    Args:
+        app: Flask application
+        login_manager: Flask-Login manager
+        db: Flask-SQLAlchemy extension instance
+    """
+    login_manager.init_app(app)
+    login_manager.login_view = app.config.get('CONFIG', {}).get('auth', {}).get('login_view')
+
+    @login_manager.user_loader
+    def load_user(user_id):
+        return db.session.get(User, int(user_id))
+
+    app.extensions['password_hasher'] = PasswordHasher.from_config(app.config.get('CONFIG', {}))
+    app.jinja_env.globals['can'] = has_permission
@@ -0,0 +1,540 @@
+"""
+Duplicate household and contact detection for the Crowbank Intranet.
+
+The legacy data has the same household under several customer numbers
+and contacts re-typed per household. Comparing every pair is O(n²), so
+candidates come from blocking keys instead: two records are compared
+only if they share a normalized postcode, phone number, email address,
+or surname sound (Soundex) within a postcode district / first initial.
+Oversized blocks (e.g. a shared office phone) are skipped.
+
+Candidate pairs are scored with weighted field similarities in a process
+pool, working over chunks of pairs, and the pairs above a threshold are
+returned best first for review. `merge_customers` and `merge_contacts`
+then fold one record into another, repointing every foreign key to it in
+a single transaction.
+"""
+
+import logging
+import re
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+from typing import Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import delete, select, tuple_, update
+
+from app.models.base import Base
+from app.models.customer import Contact, ContactRole, Customer, CustomerContact
+from app.services.reports import data_versions
+
+
+logger = logging.getLogger(__name__)
+
+# Blocks larger than this carry little signal and would dominate the work
+MAX_BLOCK_SIZE = 100
+
+# Weights of each field's similarity in a pair's score
+CUSTOMER_WEIGHTS = {'email': 0.3, 'phone': 0.25, 'postcode': 0.15, 'street': 0.1, 'surname': 0.2}
+CONTACT_WEIGHTS = {'email': 0.3, 'phone': 0.25, 'postcode': 0.1, 'first_name': 0.15, 'last_name': 0.2}
+
+# A score based on less evidence than this (sum of weights of fields both
+# records have) is not trusted
+MIN_EVIDENCE = 0.4
+
+
+class Record(NamedTuple):
+    """Normalized fields of a customer or contact used for matching."""
+    id: int
+    emails: FrozenSet[str]
+    phones: FrozenSet[str]
+    postcode: str
+    street: str
+    first_name: str
+    surnames: FrozenSet[str]
+
+
+class Match(NamedTuple):
+    keep_id: int
+    merge_id: int
+    score: float
+    reasons: Tuple[str, ...]
+
+
+# Normalization
+
+def normalize_postcode(postcode: Optional[str]) -> str:
+    return re.sub(r'[^A-Z0-9]', '', (postcode or '').upper())
+
+
+def postcode_district(postcode: str) -> str:
+    """Outward code of a normalized UK postcode ('EH11AA' -> 'EH1')."""
+    return postcode[:-3] if len(postcode) > 4 else postcode
+
+
+def normalize_phone(phone: Optional[str]) -> str:
+    """Digits of a UK phone number in national form, or '' if too short to match on."""
+    digits = re.sub(r'\D', '', phone or '')
+    if digits.startswith('44'):
+        digits = digits[2:] if digits[2:3] == '0' else '0' + digits[2:]
+    return digits if len(digits) >= 7 else ''
+
+
+def normalize_email(email: Optional[str]) -> str:
+    return (email or '').strip().lower()
+
+
+def normalize_name(name: Optional[str]) -> str:
+    return re.sub(r'[^a-z]', '', (name or '').lower())
+
+
+def normalize_street(street: Optional[str]) -> str:
+    street = re.sub(r'[^a-z0-9 ]', ' ', (street or '').lower())
+    street = re.sub(r'\b(road|rd)\b', 'rd', street)
+    street = re.sub(r'\b(street|st)\b', 'st', street)
+    return ' '.join(street.split())
+
+
+_SOUNDEX_CODES = {c: str(d) for d, letters in enumerate(
+    ('aeiouyhw', 'bfpv', 'cgjkqsxz', 'dt', 'l', 'mn', 'r')) for c in letters}
+
+
+def soundex(name: str) -> str:
+    """American Soundex code of a normalized name ('' for an empty name)."""
+    if not name:
+        return ''
+    codes = [_SOUNDEX_CODES.get(c, '0') for c in name]
+    result = [name[0].upper()]
+    previous = codes[0]
+    for char, code in zip(name[1:], codes[1:]):
+        if code != '0' and code != previous:
+            result.append(code)
+        if char not in 'hw':
+            previous = code
+    return ''.join(result)[:4].ljust(4, '0')
+
+
+def name_similarity(a: str, b: str) -> float:
+    """Jaro-Winkler similarity of two names."""
+    if a == b:
+        return 1.0 if a else 0.0
+    if not a or not b:
+        return 0.0
+    window = max(max(len(a), len(b)) // 2 - 1, 0)
+    a_matched = [False] * len(a)
+    b_matched = [False] * len(b)
+    matches = 0
+    for i, char in enumerate(a):
+        for j in range(max(0, i - window), min(len(b), i + window + 1)):
+            if not b_matched[j] and b[j] == char:
+                a_matched[i] = b_matched[j] = True
+                matches += 1
+                break
+    if not matches:
+        return 0.0
+    a_chars = [c for c, m in zip(a, a_matched) if m]
+    b_chars = [c for c, m in zip(b, b_matched) if m]
+    transpositions = sum(x != y for x, y in zip(a_chars, b_chars)) / 2
+    jaro = (matches / len(a) + matches / len(b) + (matches - transpositions) / matches) / 3
+    prefix = 0
+    for x, y in zip(a[:4], b[:4]):
+        if x != y:
+            break
+        prefix += 1
+    return jaro + prefix * 0.1 * (1 - jaro)
+
+
+# Loading
+
+def _frozen(values: Iterable[str]) -> FrozenSet[str]:
+    return frozenset(v for v in values if v)
+
+
+def load_customer_records(session) -> List[Record]:
+    """
+    Load every household with its contacts' details, in two queries.
+
+    Args:
+        session: SQLAlchemy session
+
+    Returns:
+        One record per customer
+    """
+    details = defaultdict(lambda: (set(), set(), set(), set()))
+    rows = session.execute(
+        select(CustomerContact.customer_id, CustomerContact.role, Contact.first_name,
+               Contact.last_name, Contact.phone_number, Contact.email_address)
+        .join(Contact, Contact.id == CustomerContact.contact_id)
+    )
+    for customer_id, role, first_name, last_name, phone, email in rows:
+        # Households often share an emergency contact; that makes them neighbours, not duplicates
+        if role == ContactRole.EMERGENCY:
+            continue
+        emails, phones, surnames, first_names = details[customer_id]
+        emails.add(normalize_email(email))
+        phones.add(normalize_phone(phone))
+        surnames.add(normalize_name(last_name))
+        first_names.add(normalize_name(first_name))
+
+    records = []
+    for customer_id, street, postcode in session.execute(
+            select(Customer.id, Customer.street, Customer.postcode)):
+        emails, phones, surnames, first_names = details[customer_id]
+        records.append(Record(
+            id=customer_id,
+            emails=_frozen(emails),
+            phones=_frozen(phones),
+            postcode=normalize_postcode(postcode),
+            street=normalize_street(street),
+            first_name=min(first_names - {''}, default=''),
+            surnames=_frozen(surnames),
+        ))
+    return records
+
+
+def load_contact_records(session) -> List[Record]:
+    """
+    Load every contact.
+
+    Args:
+        session: SQLAlchemy session
+
+    Returns:
+        One record per contact
+    """
+    return [
+        Record(
+            id=contact_id,
+            emails=_frozen([normalize_email(email)]),
+            phones=_frozen([normalize_phone(phone)]),
+            postcode=normalize_postcode(postcode),
+            street=normalize_street(street),
+            first_name=normalize_name(first_name),
+            surnames=_frozen([normalize_name(last_name)]),
+        )
+        for contact_id, first_name, last_name, phone, email, street, postcode in session.execute(
+            select(Contact.id, Contact.first_name, Contact.last_name, Contact.phone_number,
+                   Contact.email_address, Contact.street, Contact.postcode)
+        )
+    ]
+
+
+# Blocking
+
+def blocking_keys(record: Record, contacts: bool = False) -> Set[str]:
+    """
+    Keys under which a record is grouped with possible duplicates.
+
+    Args:
+        record: Normalized record
+        contacts: Whether the record is a contact (surname blocks use the
+            first initial rather than the postcode district)
+
+    Returns:
+        Blocking keys
+    """
+    keys = {f"em:{email}" for email in record.emails}
+    keys.update(f"ph:{phone}" for phone in record.phones)
+    if record.postcode:
+        keys.add(f"pc:{record.postcode}")
+    qualifier = record.first_name[:1] if contacts else postcode_district(record.postcode)
+    if qualifier:
+        keys.update(f"sx:{soundex(surname)}:{qualifier}" for surname in record.surnames)
+    return keys
+
+
+def candidate_pairs(records: Sequence[Record], contacts: bool = False,
+                    max_block_size: int = MAX_BLOCK_SIZE) -> Set[Tuple[int, int]]:
+    """
+    Pairs of records sharing at least one blocking key.
+
+    Args:
+        records: Normalized records
+        contacts: Whether the records are contacts
+        max_block_size: Blocks with more records than this are skipped
+
+    Returns:
+        (lower id, higher id) pairs
+    """
+    blocks: Dict[str, List[int]] = defaultdict(list)
+    for record in records:
+        for key in blocking_keys(record, contacts):
+            blocks[key].append(record.id)
+
+    pairs = set()
+    skipped = 0
+    for key, ids in blocks.items():
+        if len(ids) > max_block_size:
+            skipped += 1
+            continue
+        ids.sort()
+        for i, first in enumerate(ids):
+            for second in ids[i + 1:]:
+                pairs.add((first, second))
+    if skipped:
+        logger.info(f"Skipped {skipped} oversized blocking keys")
+    return pairs
+
+
+# Scoring
+
+def _best(a: FrozenSet[str], b: FrozenSet[str], similarity) -> Optional[float]:
+    if not a or not b:
+        return None
+    return max(similarity(x, y) for x in a for y in b)
+
+
+def _exact(x: str, y: str) -> float:
+    return float(x == y)
+
+
+def _text(x: str, y: str) -> float:
+    return SequenceMatcher(None, x, y).ratio()
+
+
+def field_similarities(a: Record, b: Record, contacts: bool = False) -> Dict[str, Optional[float]]:
+    """Per-field similarity in [0, 1], or None where either record lacks the field."""
+    similarities = {
+        'email': _best(a.emails, b.emails, _exact),
+        'phone': _best(a.phones, b.phones, _exact),
+        'postcode': float(a.postcode == b.postcode) if a.postcode and b.postcode else None,
+    }
+    if contacts:
+        similarities['first_name'] = _best(_frozen([a.first_name]), _frozen([b.first_name]), name_similarity)
+        similarities['last_name'] = _best(a.surnames, b.surnames, name_similarity)
+    else:
+        similarities['street'] = _text(a.street, b.street) if a.street and b.street else None
+        similarities['surname'] = _best(a.surnames, b.surnames, name_similarity)
+    return similarities
+
+
+def score_pair(a: Record, b: Record, contacts: bool = False) -> Tuple[float, Tuple[str, ...]]:
+    """
+    Weighted similarity of two records.
+
+    Fields missing from either record are left out rather than counted as
+    mismatches, but too little shared evidence scores zero.
+
+    Args:
+        a, b: Normalized records
+        contacts: Whether the records are contacts
+
+    Returns:
+        (score in [0, 1], fields that matched closely)
+    """
+    weights = CONTACT_WEIGHTS if contacts else CUSTOMER_WEIGHTS
+    total = evidence = 0.0
+    reasons = []
+    for field, similarity in field_similarities(a, b, contacts).items():
+        if similarity is None:
+            continue
+        evidence += weights[field]
+        total += weights[field] * similarity
+        if similarity >= 0.9:
+            reasons.append(field)
+    if evidence < MIN_EVIDENCE:
+        return 0.0, ()
+    return total / evidence, tuple(reasons)
+
+
+_worker_records: Dict[int, Record] = {}
+
+
+def _init_worker(records: Dict[int, Record]) -> None:
+    global _worker_records
+    _worker_records = records
+
+
+def _score_chunk(pairs: Sequence[Tuple[int, int]], contacts: bool, threshold: float) -> List[Match]:
+    records = _worker_records
+    matches = []
+    for first, second in pairs:
+        score, reasons = score_pair(records[first], records[second], contacts)
+        if score and score >= threshold:
+            matches.append(Match(first, second, round(score, 3), reasons))
+    return matches
+
+
+def _chunks(items: List, size: int) -> Iterator[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def find_duplicates(records: Sequence[Record], contacts: bool = False, threshold: float = 0.8,
+                    workers: Optional[int] = None, chunk_size: int = 20000) -> List[Match]:
+    """
+    Find likely duplicate pairs among records.
+
+    Args:
+        records: Normalized records
+        contacts: Whether the records are contacts
+        threshold: Minimum score of a reported pair
+        workers: Scoring processes (0 scores in this process; None uses every CPU)
+        chunk_size: Pairs scored per task
+
+    Returns:
+        Matches, best first; the lower id is proposed as the record to keep
+    """
+    pairs = sorted(candidate_pairs(records, contacts))
+    by_id = {record.id: record for record in records}
+    logger.info(f"Scoring {len(pairs)} candidate pairs from {len(records)} records")
+
+    if workers == 0 or len(pairs) <= chunk_size:
+        _init_worker(by_id)
+        matches = _score_chunk(pairs, contacts, threshold)
+    else:
+        # Records are sent once per worker rather than with every chunk
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(by_id,)) as pool:
+            futures = [pool.submit(_score_chunk, chunk, contacts, threshold)
+                       for chunk in _chunks(pairs, chunk_size)]
+            matches = [match for future in futures for match in future.result()]
+
+    matches.sort(key=lambda m: (-m.score, m.keep_id, m.merge_id))
+    return matches
+
+
+def find_duplicate_customers(session, **kwargs) -> List[Match]:
+    """Find likely duplicate households. See `find_duplicates` for options."""
+    return find_duplicates(load_customer_records(session), **kwargs)
+
+
+def find_duplicate_contacts(session, **kwargs) -> List[Match]:
+    """Find likely duplicate contacts. See `find_duplicates` for options."""
+    return find_duplicates(load_contact_records(session), contacts=True, **kwargs)
+
+
+# Merging
+
+def _repoint_references(session, target, keep_id: int, merge_id: int) -> Set[str]:
+    """
+    Point every foreign key referencing `merge_id` in `target` at `keep_id`.
+
+    Where the foreign key is part of a primary key (association tables),
+    rows that would collide with one the kept record already has are
+    deleted first.
+
+    Returns:
+        Names of the tables changed
+    """
+    touched = set()
+    for table in Base.metadata.sorted_tables:
+        for fk in table.foreign_keys:
+            if fk.column.table is not target:
+                continue
+            column = fk.parent
+            others = [c for c in table.primary_key.columns if c is not column]
+            if column.primary_key and others:
+                existing = select(*others).where(column == keep_id)
+                session.execute(
+                    delete(table).where(column == merge_id,
+                                        (others[0] if len(others) == 1 else tuple_(*others)).in_(existing))
+                )
+            result = session.execute(update(table).where(column == merge_id).values({column.name: keep_id}))
+            if result.rowcount:
+                touched.add(table.name)
+    return touched
+
+
+def _append_note(existing: Optional[str], addition: Optional[str]) -> Optional[str]:
+    if not addition or (existing and addition in existing):
+        return existing
+    return f"{existing}\n{addition}" if existing else addition
+
+
+def merge_customers(session, keep_id: int, merge_id: int) -> Customer:
+    """
+    Fold one household into another.
+
+    Contacts, pets, bookings and anything else referencing the merged
+    customer are moved to the kept one, gaps in the kept customer's
+    details are filled from the merged one, and the merged customer is
+    deleted, all in one transaction (a savepoint within the caller's).
+    The caller commits.
+
+    Args:
+        session: SQLAlchemy session
+        keep_id: Customer to keep
+        merge_id: Customer to merge into it and delete
+
+    Returns:
+        The kept customer
+    """
+    if keep_id == merge_id:
+        raise ValueError("Cannot merge a customer into itself")
+
+    with session.begin_nested():
+        keep = session.get(Customer, keep_id, with_for_update=True)
+        merge = session.get(Customer, merge_id, with_for_update=True)
+        if keep is None or merge is None:
+            raise ValueError(f"Customer {keep_id if keep is None else merge_id} not found")
+
+        for field in ('street', 'town', 'county', 'postcode', 'default_vet_id'):
+            if getattr(keep, field) is None:
+                setattr(keep, field, getattr(merge, field))
+        keep.banned = keep.banned or merge.banned
+        keep.opt_out = keep.opt_out or merge.opt_out
+        keep.discount = max(keep.discount or 0, merge.discount or 0)
+        keep.notes = _append_note(keep.notes, merge.notes)
+        if merge.legacy_cust_no is not None:
+            if keep.legacy_cust_no is None:
+                legacy_cust_no = merge.legacy_cust_no
+                merge.legacy_cust_no = None  # Unique; free it before moving it over
+                session.flush()
+                keep.legacy_cust_no = legacy_cust_no
+            else:
+                keep.notes = _append_note(keep.notes, f"Merged legacy customer #{merge.legacy_cust_no}")
+        session.flush()
+
+        touched = _repoint_references(session, Customer.__table__, keep_id, merge_id)
+        session.expunge(merge)
+        session.execute(delete(Customer.__table__).where(Customer.__table__.c.id == merge_id))
+        session.expire(keep)
+
+    data_versions.bump(Customer.__tablename__, *touched)
+    logger.info(f"Merged customer {merge_id} into {keep_id}")
+    return keep
+
+
+def merge_contacts(session, keep_id: int, merge_id: int) -> Contact:
+    """
+    Fold one contact into another, across every household they belong to.
+
+    The caller commits.
+
+    Args:
+        session: SQLAlchemy session
+        keep_id: Contact to keep
+        merge_id: Contact to merge into it and delete
+
+    Returns:
+        The kept contact
+    """
+    if keep_id == merge_id:
+        raise ValueError("Cannot merge a contact into itself")
+
+    with session.begin_nested():
+        keep = session.get(Contact, keep_id, with_for_update=True)
+        merge = session.get(Contact, merge_id, with_for_update=True)
+        if keep is None or merge is None:
+            raise ValueError(f"Contact {keep_id if keep is None else merge_id} not found")
+
+        email = merge.email_address
+        merge.email_address = None  # Unique; free it before moving it over
+        session.flush()
+        for field in ('phone_number', 'street', 'town', 'county', 'postcode'):
+            if getattr(keep, field) is None:
+                setattr(keep, field, getattr(merge, field))
+        if keep.email_address is None:
+            keep.email_address = email
+        keep.notes = _append_note(keep.notes, merge.notes)
+        session.flush()
+
+        touched = _repoint_references(session, Contact.__table__, keep_id, merge_id)
+        session.expunge(merge)
+        session.execute(delete(Contact.__table__).where(Contact.__table__.c.id == merge_id))
+        session.expire(keep)
+
+    data_versions.bump(Contact.__tablename__, *touched)
+    logger.info(f"Merged contact {merge_id} into {keep_id}")
+    return keep
@@ -0,0 +1,293 @@
+"""
+Pricing calculation service for the Crowbank Intranet.
+
+Rate cards (seasons, nightly rates, multi-pet discounts) are loaded once
+and compiled into flat lookup tables:
+
+- a band index per calendar day over the compiled date range
+- per (species, run type), a running total of nightly rates in pence
+  over the same range, so the base price of any stay is one subtraction
+- multi-pet discounts indexed directly by pet count
+
+Quoting then touches no database and no per-night loop. The compiled
+tables are rebuilt when the rate tables change.
+"""
+
+import logging
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+
+from app.models.pet import Species
+from app.models.pricing import MultiPetDiscount, Rate, Season
+from app.models.run import RunType
+from app.services.reports import data_versions
+
+
+logger = logging.getLogger(__name__)
+
+PRICING_TABLES = (Season.__tablename__, Rate.__tablename__, MultiPetDiscount.__tablename__)
+
+
+class PricingError(Exception):
+    """Raised when a stay cannot be priced from the loaded rate cards."""
+
+
+class PetStay(NamedTuple):
+    species: Species
+    run_type: RunType
+
+
+class QuoteRequest(NamedTuple):
+    start_date: date
+    end_date: date  # Departure day; nights are start_date .. end_date - 1
+    pets: Sequence[PetStay]
+    customer_discount: Decimal = Decimal('0')
+
+
+class Quote(NamedTuple):
+    nights: int
+    base: Decimal
+    multi_pet_discount: Decimal
+    customer_discount: Decimal
+    total: Decimal
+
+
+def _to_pence(amount: Decimal) -> int:
+    return int((Decimal(amount) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def _from_pence(pence: int) -> Decimal:
+    return (Decimal(pence) / 100).quantize(Decimal('0.01'))
+
+
+def _percent_of(pence: int, basis_points: int) -> int:
+    """Percentage (in basis points) of an amount, rounded half up."""
+    return (pence * basis_points + 5000) // 10000
+
+
+class PricingEngine:
+    """
+    Compiled rate cards answering quotes from memory.
+
+    Build with `PricingEngine.load(session)` or directly from rows.
+    """
+
+    def __init__(self, seasons: Iterable[Season], rates: Iterable[Rate],
+                 multi_pet_discounts: Iterable[MultiPetDiscount], default_band: str = 'standard',
+                 first_day: Optional[date] = None, last_day: Optional[date] = None):
+        seasons = sorted(seasons, key=lambda s: s.priority)
+        rates = list(rates)
+        today = date.today()
+        self.first_day = first_day or min(
+            [today - timedelta(days=365)] + [s.start_date for s in seasons]
+        )
+        self.last_day = last_day or max(
+            [today + timedelta(days=2 * 365)] + [s.end_date for s in seasons]
+        )
+        self.default_band = default_band
+        self._origin = self.first_day.toordinal()
+        days = self.last_day.toordinal() - self._origin + 1
+
+        # Band per day; later (higher priority) seasons overwrite earlier ones
+        self._bands: List[str] = sorted({default_band} | {s.band for s in seasons}
+                                        | {r.band for r in rates})
+        self._band_index = band_index = {band: i for i, band in enumerate(self._bands)}
+        day_bands = [band_index[default_band]] * days
+        for season in seasons:
+            start = max(season.start_date.toordinal() - self._origin, 0)
+            end = min(season.end_date.toordinal() - self._origin, days - 1)
+            for day in range(start, end + 1):
+                day_bands[day] = band_index[season.band]
+        self._day_bands = day_bands
+
+        # Nightly pence per (species, run_type) and band
+        self._rates: Dict[Tuple[Species, RunType], List[Optional[int]]] = {}
+        for rate in rates:
+            by_band = self._rates.setdefault((rate.species, rate.run_type), [None] * len(self._bands))
+            by_band[band_index[rate.band]] = _to_pence(rate.nightly_rate)
+
+        # Running totals: cumulative[k] is the cost of nights first_day .. first_day + k - 1,
+        # with a parallel count of nights whose band has no rate
+        self._cumulative: Dict[Tuple[Species, RunType], Tuple[List[int], List[int]]] = {}
+        for key, by_band in self._rates.items():
+            cost, missing = [0], [0]
+            for band in day_bands:
+                nightly = by_band[band]
+                cost.append(cost[-1] + (nightly or 0))
+                missing.append(missing[-1] + (nightly is None))
+            self._cumulative[key] = (cost, missing)
+
+        # Discount basis points by pet count, capped at the largest threshold
+        thresholds = sorted((d.min_pets, _to_pence(d.percent)) for d in multi_pet_discounts)
+        max_pets = thresholds[-1][0] if thresholds else 1
+        self._multi_pet_bp = [0] * (max_pets + 1)
+        for count in range(max_pets + 1):
+            for min_pets, basis_points in thresholds:
+                if count >= min_pets:
+                    self._multi_pet_bp[count] = basis_points
+
+        # Fallback for days outside the compiled range
+        self._seasons = seasons
+
+    @classmethod
+    def load(cls, session, default_band: str = 'standard') -> 'PricingEngine':
+        """
+        Load and compile the rate cards.
+
+        Args:
+            session: SQLAlchemy session
+            default_band: Band for days not covered by any season
+
+        Returns:
+            Compiled pricing engine
+        """
+        seasons = session.scalars(select(Season)).all()
+        rates = session.scalars(select(Rate)).all()
+        discounts = session.scalars(select(MultiPetDiscount)).all()
+        logger.info(f"Compiled pricing: {len(seasons)} seasons, {len(rates)} rates")
+        return cls(seasons, rates, discounts, default_band=default_band)
+
+    def band_for(self, day: date) -> str:
+        """
+        Get the pricing band for a day.
+
+        Args:
+            day: Calendar day
+
+        Returns:
+            Band name
+        """
+        offset = day.toordinal() - self._origin
+        if 0 <= offset < len(self._day_bands):
+            return self._bands[self._day_bands[offset]]
+        band = self.default_band
+        for season in self._seasons:
+            if season.start_date <= day <= season.end_date:
+                band = season.band
+        return band
+
+    def _stay_pence(self, pet: PetStay, start: date, end: date) -> int:
+        compiled = self._cumulative.get((pet.species, pet.run_type))
+        if compiled is None:
+            raise PricingError(f"No rates for {pet.species.value} in {pet.run_type.value}")
+
+        cost, missing = compiled
+        first = start.toordinal() - self._origin
+        last = end.toordinal() - self._origin
+        if 0 <= first and last < len(cost) and missing[last] == missing[first]:
+            return cost[last] - cost[first]
+
+        # Outside the compiled range, or a night lacks a rate: price night by
+        # night so the error names the offending day
+        by_band = self._rates[(pet.species, pet.run_type)]
+        total = 0
+        day = start
+        while day < end:
+            band = self.band_for(day)
+            nightly = by_band[self._band_index[band]] if band in self._band_index else None
+            if nightly is None:
+                raise PricingError(
+                    f"No {band} rate for {pet.species.value} in {pet.run_type.value} on {day}"
+                )
+            total += nightly
+            day += timedelta(days=1)
+        return total
+
+    def quote(self, request: QuoteRequest) -> Quote:
+        """
+        Price a stay for one or more pets.
+
+        Args:
+            request: Dates, pets and customer discount percentage
+
+        Returns:
+            Quote with the base price, discounts and total
+        """
+        nights = (request.end_date - request.start_date).days
+        if nights <= 0:
+            raise PricingError("A stay must be at least one night")
+        if not request.pets:
+            raise PricingError("A stay needs at least one pet")
+
+        base = sum(self._stay_pence(pet, request.start_date, request.end_date) for pet in request.pets)
+        pet_count = min(len(request.pets), len(self._multi_pet_bp) - 1)
+        multi_pet = _percent_of(base, self._multi_pet_bp[pet_count])
+        customer = _percent_of(base - multi_pet, _to_pence(request.customer_discount))
+        return Quote(
+            nights=nights,
+            base=_from_pence(base),
+            multi_pet_discount=_from_pence(multi_pet),
+            customer_discount=_from_pence(customer),
+            total=_from_pence(base - multi_pet - customer),
+        )
+
+    def quote_many(self, requests: Iterable[QuoteRequest]) -> List[Quote]:
+        """
+        Price many stays at once, e.g. alternative dates or pet combinations.
+
+        Args:
+            requests: Quote requests
+
+        Returns:
+            Quotes in request order
+        """
+        quote = self.quote
+        return [quote(request) for request in requests]
+
+
+_engine: Optional[PricingEngine] = None
+_engine_version: Optional[tuple] = None  # (default band, table generations)
+_engine_loaded_at = 0.0
+_engine_lock = threading.Lock()
+
+
+def _pricing_config() -> dict:
+    from flask import current_app, has_app_context
+
+    if not has_app_context():
+        return {}
+    return current_app.config.get('CONFIG', {}).get('pricing', {})
+
+
+def get_pricing_engine(session, reload_interval: Optional[float] = None,
+                       default_band: Optional[str] = None) -> PricingEngine:
+    """
+    Get the compiled pricing engine, recompiling when rate cards change.
+
+    Changes made through this process's ORM are picked up immediately;
+    changes from other processes within `reload_interval` seconds.
+
+    Args:
+        session: SQLAlchemy session used if the rate cards must be reloaded
+        reload_interval: Maximum age of the compiled tables in seconds
+            (default: ``pricing.reload_interval``, else 300)
+        default_band: Band for days not covered by any season
+            (default: ``pricing.default_band``, else 'standard')
+
+    Returns:
+        The compiled pricing engine
+    """
+    global _engine, _engine_version, _engine_loaded_at
+
+    config = _pricing_config()
+    if reload_interval is None:
+        reload_interval = config.get('reload_interval', 300)
+    if default_band is None:
+        default_band = config.get('default_band', 'standard')
+
+    version = (default_band,) + data_versions.generation(PRICING_TABLES)
+    fresh = time.monotonic() - _engine_loaded_at < reload_interval
+    if _engine is not None and version == _engine_version and fresh:
+        return _engine
+
+    with _engine_lock:
+        if _engine is None or version != _engine_version or not fresh:
+            _engine = PricingEngine.load(session, default_band=default_band)
+            _engine_version = version
+            _engine_loaded_at = time.monotonic()
+        return _engine
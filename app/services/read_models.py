@@ -0,0 +1,159 @@
+"""
+Read-only records for list pages, exports and reports.
+
+Loading ORM instances for a few thousand rows costs far more than the rows
+themselves: each instance carries instrumentation state, is registered in
+the session's identity map and is checked on every flush. Pages that only
+display data can select the columns they need with Core and get plain
+NamedTuples back instead, at a fraction of the memory and load time (see
+``scripts/benchmark_read_models.py``).
+
+The records keep the helpers templates use on the models
+(`get_full_address`, `get_navigation_url`, `display_ref`,
+`primary_contacts`), so a template can take either. They are detached
+snapshots: they cannot lazy-load relationships or be saved.
+"""
+
+from itertools import groupby
+from operator import itemgetter
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.models.customer import Contact, ContactRole, Customer, CustomerContact
+from app.models.mixins import AddressMixin
+from app.models.vet import Vet
+
+
+class VetRow(NamedTuple):
+    id: int
+    practice_name: str
+    street: Optional[str]
+    town: Optional[str]
+    county: Optional[str]
+    postcode: Optional[str]
+    phone: Optional[str]
+    email: Optional[str]
+    website: Optional[str]
+
+    get_full_address = AddressMixin.get_full_address
+    get_navigation_url = AddressMixin.get_navigation_url
+
+
+class ContactRow(NamedTuple):
+    id: int
+    first_name: str
+    last_name: str
+    phone_number: Optional[str]
+    email_address: Optional[str]
+    street: Optional[str]
+    town: Optional[str]
+    county: Optional[str]
+    postcode: Optional[str]
+
+    get_full_address = AddressMixin.get_full_address
+    get_navigation_url = AddressMixin.get_navigation_url
+
+
+class CustomerRow(NamedTuple):
+    id: int
+    legacy_cust_no: Optional[int]
+    banned: bool
+    opt_out: bool
+    discount: Any  # Decimal
+    default_vet_id: Optional[int]
+    street: Optional[str]
+    town: Optional[str]
+    county: Optional[str]
+    postcode: Optional[str]
+    primary_contacts: Tuple[ContactRow, ...] = ()
+
+    get_full_address = AddressMixin.get_full_address
+    get_navigation_url = AddressMixin.get_navigation_url
+
+    display_ref = Customer.display_ref
+
+    @property
+    def primary_contact(self) -> Optional[ContactRow]:
+        return self.primary_contacts[0] if self.primary_contacts else None
+
+
+def _columns(model, fields) -> list:
+    return [model.__table__.c[field] for field in fields]
+
+
+VET_FIELDS = VetRow._fields
+CONTACT_FIELDS = ContactRow._fields
+CUSTOMER_FIELDS = CustomerRow._fields[:-1]  # All but primary_contacts
+
+
+def load_vets(session, *criteria, order_by=None) -> List[VetRow]:
+    """
+    Load vets as records.
+
+    Args:
+        session: SQLAlchemy session
+        *criteria: WHERE clauses on `Vet` columns
+        order_by: Sort column (default: practice name)
+
+    Returns:
+        Matching vets
+    """
+    query = select(*_columns(Vet, VET_FIELDS)).where(*criteria).order_by(
+        order_by if order_by is not None else Vet.practice_name, Vet.id)
+    return list(map(VetRow._make, session.execute(query)))
+
+
+def load_contacts(session, *criteria, order_by=None) -> List[ContactRow]:
+    """
+    Load contacts as records.
+
+    Args:
+        session: SQLAlchemy session
+        *criteria: WHERE clauses on `Contact` columns
+        order_by: Sort column (default: last name)
+
+    Returns:
+        Matching contacts
+    """
+    query = select(*_columns(Contact, CONTACT_FIELDS)).where(*criteria).order_by(
+        order_by if order_by is not None else Contact.last_name, Contact.id)
+    return list(map(ContactRow._make, session.execute(query)))
+
+
+def _primary_contacts(session, customer_ids) -> dict:
+    rows = session.execute(
+        select(CustomerContact.customer_id, *_columns(Contact, CONTACT_FIELDS))
+        .join(Contact, Contact.id == CustomerContact.contact_id)
+        .where(CustomerContact.role == ContactRole.PRIMARY, CustomerContact.customer_id.in_(customer_ids))
+        .order_by(CustomerContact.customer_id, Contact.id)
+    )
+    return {customer_id: tuple(ContactRow._make(row[1:]) for row in group)
+            for customer_id, group in groupby(rows, key=itemgetter(0))}
+
+
+def load_customers(session, *criteria, order_by=None, with_contacts: bool = True) -> List[CustomerRow]:
+    """
+    Load customers as records, with their primary contacts.
+
+    Primary contacts come from a second query over the same criteria, so
+    the cost is two queries whatever the number of customers.
+
+    Args:
+        session: SQLAlchemy session
+        *criteria: WHERE clauses on `Customer` columns
+        order_by: Sort column (default: id)
+        with_contacts: Load primary contacts
+
+    Returns:
+        Matching customers
+    """
+    columns = _columns(Customer, CUSTOMER_FIELDS)
+    query = select(*columns).where(*criteria).order_by(order_by if order_by is not None else Customer.id)
+    rows = session.execute(query).all()
+    if not with_contacts:
+        return [CustomerRow(*row) for row in rows]
+
+    contacts = _primary_contacts(session, select(Customer.id).where(*criteria))
+    return [CustomerRow(*row, contacts.get(row[0], ())) for row in rows]
+
@@ -0,0 +1,57 @@
+"""
+Pre-defined reports for the Crowbank Intranet.
+
+Importing this module registers the reports with the default registry.
+"""
+
+from app.services.reports import register_report
+
+
+register_report(
+    name='customer_contacts',
+    title='Customer Contact List',
+    sql="""
+        SELECT c.legacy_cust_no, ct.first_name, ct.last_name, ct.phone_number,
+               ct.email_address, c.street, c.town, c.postcode
+        FROM customers c
+        JOIN customer_contacts cc ON cc.customer_id = c.id AND cc.role = 'PRIMARY'
+        JOIN contacts ct ON ct.id = cc.contact_id
+        WHERE c.banned = false
+          AND (:include_opt_out OR c.opt_out = false)
+        ORDER BY ct.last_name, ct.first_name
+    """,
+    tables=('customers', 'customer_contacts', 'contacts'),
+    defaults={'include_opt_out': False},
+)
+
+register_report(
+    name='banned_customers',
+    title='Banned Customers',
+    sql="""
+        SELECT c.legacy_cust_no, ct.first_name, ct.last_name, c.postcode, c.notes
+        FROM customers c
+        LEFT JOIN customer_contacts cc ON cc.customer_id = c.id AND cc.role = 'PRIMARY'
+        LEFT JOIN contacts ct ON ct.id = cc.contact_id
+        WHERE c.banned = true
+        ORDER BY c.legacy_cust_no
+    """,
+    tables=('customers', 'customer_contacts', 'contacts'),
+)
+
+register_report(
+    name='vaccinations_due',
+    title='Vaccinations Due Before Stay',
+    sql="""
+        SELECT b.start_date, b.end_date, b.legacy_booking_no, p.name AS pet_name,
+               ct.last_name, ct.phone_number, a.vaccine_type, a.issue, a.expires_on
+        FROM vaccination_alerts a
+        JOIN bookings b ON b.id = a.booking_id
+        JOIN pets p ON p.id = a.pet_id
+        LEFT JOIN customer_contacts cc ON cc.customer_id = b.customer_id AND cc.role = 'PRIMARY'
+        LEFT JOIN contacts ct ON ct.id = cc.contact_id
+        WHERE b.start_date <= CURRENT_DATE + :days
+        ORDER BY b.start_date, ct.last_name, p.name
+    """,
+    tables=('vaccination_alerts', 'bookings', 'pets', 'customer_contacts', 'contacts'),
+    defaults={'days': 14},
+)
@@ -0,0 +1,559 @@
+"""
+Report generation service for the Crowbank Intranet.
+
+Each report is a parameterized SQL query registered in a `ReportRegistry`,
+optionally paired with a Word mail-merge template. Results are cached by
+(report, params, data version). On PostgreSQL the data version comes
+from the statistics system's per-table write counts, so changes from any
+process (and deletes) invalidate cached results; on other databases it
+is the newest `updated_at` of the report's tables. Either way it also
+includes an in-process counter bumped whenever the ORM flushes to them.
+
+Queries run as read-only units of work, so they are served by the read
+replica when one is configured. Rendering to DOCX/CSV files happens in a
+process pool; `stream_csv` streams large results without caching them.
+"""
+
+import csv
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, event, func, select, text
+from sqlalchemy.orm import Session
+
+from app.models.base import Base
+from app.utils.db_routing import on_primary, read_only
+
+
+logger = logging.getLogger(__name__)
+
+
+class ReportError(Exception):
+    """Raised when a report is unknown or cannot be generated."""
+
+
+@dataclass(frozen=True)
+class ReportDefinition:
+    """A pre-defined, parameterized report query."""
+
+    name: str
+    title: str
+    sql: str
+    # Tables the query reads, used to derive the data version
+    tables: Tuple[str, ...]
+    defaults: Dict[str, Any] = field(default_factory=dict)
+    # DOCX mail-merge template, relative to the report template folder
+    template: Optional[str] = None
+
+
+@dataclass
+class ReportResult:
+    """Materialized rows of a report run."""
+
+    report: str
+    columns: List[str]
+    rows: List[tuple]
+    data_version: str
+    generated_at: datetime
+
+    def records(self) -> List[Dict[str, Any]]:
+        """
+        Get the rows as dictionaries keyed by column name.
+
+        Returns:
+            List of row dictionaries
+        """
+        return [dict(zip(self.columns, row)) for row in self.rows]
+
+
+class ReportRegistry:
+    """Registry of pre-defined reports, keyed by name."""
+
+    def __init__(self):
+        self._reports: Dict[str, ReportDefinition] = {}
+
+    def register(self, report: ReportDefinition) -> ReportDefinition:
+        """
+        Add a report to the registry.
+
+        Args:
+            report: Report definition
+
+        Returns:
+            The registered definition
+        """
+        if report.name in self._reports:
+            raise ReportError(f"Report already registered: {report.name}")
+        self._reports[report.name] = report
+        return report
+
+    def get(self, name: str) -> ReportDefinition:
+        """
+        Look up a report by name.
+
+        Args:
+            name: Report name
+
+        Returns:
+            The report definition
+        """
+        try:
+            return self._reports[name]
+        except KeyError:
+            raise ReportError(f"Unknown report: {name}") from None
+
+    def all(self) -> List[ReportDefinition]:
+        """Get all registered reports ordered by title."""
+        return sorted(self._reports.values(), key=lambda r: r.title)
+
+
+# Default registry used by the pre-defined reports
+registry = ReportRegistry()
+
+
+def register_report(name: str, title: str, sql: str, tables: Sequence[str],
+                    defaults: Optional[Dict[str, Any]] = None,
+                    template: Optional[str] = None) -> ReportDefinition:
+    """
+    Register a report in the default registry.
+
+    Args:
+        name: Unique report name
+        title: Human-readable title
+        sql: Query text with named bind parameters (e.g. ``:days``)
+        tables: Tables the query reads
+        defaults: Default parameter values
+        template: Optional DOCX mail-merge template file name
+
+    Returns:
+        The registered definition
+    """
+    return registry.register(ReportDefinition(
+        name=name,
+        title=title,
+        sql=sql,
+        tables=tuple(tables),
+        defaults=dict(defaults or {}),
+        template=template,
+    ))
+
+
+class DataVersionTracker:
+    """
+    In-process change counters per table.
+
+    Bumped from ORM flushes so a report is invalidated as soon as this
+    process changes its data, including tables without an updated_at
+    column. Writes from other processes are picked up via the table
+    statistics (PostgreSQL) or updated_at.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generations: Dict[str, int] = defaultdict(int)
+
+    def bump(self, *tables: str) -> None:
+        """Record a change to the given tables."""
+        with self._lock:
+            for table in tables:
+                self._generations[table] += 1
+
+    def generation(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        """Get the current counters for the given tables."""
+        return tuple(self._generations[table] for table in tables)
+
+
+data_versions = DataVersionTracker()
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_flushed_tables(session, flush_context):
+    """Bump the data version of every table touched by a flush."""
+    tables = {
+        getattr(obj, '__tablename__', None)
+        for obj in chain(session.new, session.dirty, session.deleted)
+    }
+    tables.discard(None)
+    if tables:
+        data_versions.bump(*tables)
+
+
+# Cumulative rows written per table, and its file (which TRUNCATE replaces).
+# Every backend reports its counts, without locking anything, within about
+# a second of committing. A replica keeps its own statistics, so this is
+# always read from the primary.
+TABLE_WRITES_SQL = text(
+    "SELECT relname, pg_relation_filenode(relid), n_tup_ins + n_tup_upd + n_tup_del "
+    "FROM pg_stat_user_tables WHERE schemaname = current_schema() AND relname IN :tables"
+).bindparams(bindparam('tables', expanding=True))
+
+
+def tables_version(session, tables: Sequence[str]) -> str:
+    """
+    Compute a data version for a set of tables.
+
+    On PostgreSQL this reads each table's write statistics, which every
+    process's writes (including deletes and raw SQL) advance. Elsewhere
+    (SQLite in development and tests) it reads the newest `updated_at` of
+    each table. Both are combined with this process's flush counters, so
+    its own changes count at once.
+
+    Also used for page and fragment ETags.
+
+    Args:
+        session: SQLAlchemy session
+        tables: Table names
+
+    Returns:
+        Opaque version string; changes whenever the underlying data does
+    """
+    parts = [str(gen) for gen in data_versions.generation(tables)]
+    if session.get_bind().dialect.name == 'postgresql':
+        with on_primary():
+            # Statistics are otherwise read once per transaction
+            session.execute(text("SELECT pg_stat_clear_snapshot()"))
+            writes = {name: f"{filenode}.{count}"
+                      for name, filenode, count in session.execute(TABLE_WRITES_SQL, {'tables': list(tables)})}
+        return '|'.join([writes.get(name, '0') for name in tables] + parts)
+
+    stamped = [
+        Base.metadata.tables[name]
+        for name in tables
+        if name in Base.metadata.tables and 'updated_at' in Base.metadata.tables[name].c
+    ]
+    latest: Sequence[Any] = ()
+    if stamped:
+        # One round trip for all tables
+        latest = session.execute(select(*(
+            select(func.max(table.c.updated_at)).scalar_subquery()
+            for table in stamped
+        ))).one()
+
+    return '|'.join([str(value) for value in latest] + parts)
+
+
+def data_version(session, report: ReportDefinition) -> str:
+    """
+    Compute the current data version for a report's tables.
+
+    Args:
+        session: SQLAlchemy session
+        report: Report definition
+
+    Returns:
+        Opaque version string
+    """
+    return tables_version(session, report.tables)
+
+
+class ReportCache:
+    """
+    Size-bounded LRU cache of report results with a time-to-live.
+    """
+
+    def __init__(self, max_entries: int = 128, ttl: float = 900):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[tuple, Tuple[float, ReportResult]]' = OrderedDict()
+
+    def get(self, key: tuple) -> Optional[ReportResult]:
+        """Get a cached result, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, result = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return result
+
+    def set(self, key: tuple, result: ReportResult) -> None:
+        """Store a result, evicting the least recently used entries."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all cached results."""
+        with self._lock:
+            self._entries.clear()
+
+
+def _format_value(value: Any) -> str:
+    """Format a value for CSV or mail-merge output."""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%d/%m/%Y %H:%M')
+    if hasattr(value, 'strftime'):
+        return value.strftime('%d/%m/%Y')
+    return str(value)
+
+
+def render_csv(columns: Sequence[str], rows: Iterable[Sequence[Any]], output_path: str) -> str:
+    """
+    Write report rows to a CSV file.
+
+    Args:
+        columns: Column names
+        rows: Row values
+        output_path: Destination file
+
+    Returns:
+        The output path
+    """
+    with open(output_path, 'w', newline='', encoding='utf-8') as handle:
+        writer = csv.writer(handle)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([_format_value(value) for value in row])
+    return output_path
+
+
+def render_docx(template_path: str, title: str, columns: Sequence[str],
+                rows: Iterable[Sequence[Any]], output_path: str) -> str:
+    """
+    Merge report rows into a Word template.
+
+    The template's table rows are repeated per report row, anchored on
+    the first column's merge field; ``title`` and ``generated_at`` merge
+    fields are filled once.
+
+    Args:
+        template_path: DOCX mail-merge template
+        title: Report title
+        columns: Column names (merge field names)
+        rows: Row values
+        output_path: Destination file
+
+    Returns:
+        The output path
+    """
+    try:
+        from mailmerge import MailMerge
+    except ImportError as e:
+        raise ReportError("DOCX rendering requires the docx-mailmerge package") from e
+
+    records = [
+        {column: _format_value(value) for column, value in zip(columns, row)}
+        for row in rows
+    ]
+    with MailMerge(template_path) as document:
+        document.merge(
+            title=title,
+            generated_at=_format_value(datetime.now(timezone.utc)),
+        )
+        document.merge_rows(columns[0], records)
+        document.write(output_path)
+    return output_path
+
+
+class ReportEngine:
+    """
+    Runs, caches and renders registered reports.
+    """
+
+    def __init__(self, registry: ReportRegistry = registry, cache: Optional[ReportCache] = None,
+                 template_folder: str = 'app/templates/reports', max_cached_rows: int = 50000,
+                 render_workers: int = 2):
+        self.registry = registry
+        self.cache = cache or ReportCache()
+        self.template_folder = template_folder
+        self.max_cached_rows = max_cached_rows
+        self.render_workers = render_workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'ReportEngine':
+        """
+        Create an engine from the nested `reports` configuration.
+
+        Args:
+            config: Nested application configuration
+
+        Returns:
+            Configured report engine
+        """
+        reports_config = config.get('reports', {})
+        return cls(
+            cache=ReportCache(
+                max_entries=reports_config.get('cache_max_entries', 128),
+                ttl=reports_config.get('cache_ttl', 900),
+            ),
+            template_folder=reports_config.get('template_folder', 'app/templates/reports'),
+            max_cached_rows=reports_config.get('max_cached_rows', 50000),
+            render_workers=reports_config.get('render_workers', 2),
+        )
+
+    def _params(self, report: ReportDefinition, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        merged = dict(report.defaults)
+        merged.update(params or {})
+        return merged
+
+    def _cache_key(self, report: ReportDefinition, params: Dict[str, Any], version: str) -> tuple:
+        return (report.name, json.dumps(params, sort_keys=True, default=str), version)
+
+    def run(self, session, name: str, params: Optional[Dict[str, Any]] = None) -> ReportResult:
+        """
+        Run a report, serving repeated runs over unchanged data from cache.
+
+        Args:
+            session: SQLAlchemy session
+            name: Report name
+            params: Query parameters, overriding the report defaults
+
+        Returns:
+            The report result
+        """
+        report = self.registry.get(name)
+        params = self._params(report, params)
+
+        with read_only():
+            version = data_version(session, report)
+            key = self._cache_key(report, params, version)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+            result = session.execute(text(report.sql), params)
+            columns = list(result.keys())
+            rows = [tuple(row) for row in result]
+
+        report_result = ReportResult(
+            report=report.name,
+            columns=columns,
+            rows=rows,
+            data_version=version,
+            generated_at=datetime.now(timezone.utc),
+        )
+        if len(rows) <= self.max_cached_rows:
+            self.cache.set(key, report_result)
+        else:
+            logger.info(f"Report {name} returned {len(rows)} rows; not cached")
+        return report_result
+
+    def stream_csv(self, session, name: str, params: Optional[Dict[str, Any]] = None,
+                   chunk_size: int = 1000) -> Iterator[str]:
+        """
+        Stream a report as CSV text without materializing all rows.
+
+        Serves from cache when possible; otherwise rows are fetched from a
+        server-side cursor in chunks. Suitable for a Flask streaming response.
+
+        Args:
+            session: SQLAlchemy session
+            name: Report name
+            params: Query parameters, overriding the report defaults
+            chunk_size: Rows fetched and emitted per chunk
+
+        Yields:
+            CSV text chunks, starting with the header row
+        """
+        report = self.registry.get(name)
+        params = self._params(report, params)
+
+        def emit(columns, rows):
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            if columns is not None:
+                writer.writerow(columns)
+            for row in rows:
+                writer.writerow([_format_value(value) for value in row])
+            return buffer.getvalue()
+
+        with read_only():
+            version = data_version(session, report)
+            cached = self.cache.get(self._cache_key(report, params, version))
+            if cached is not None:
+                yield emit(cached.columns, [])
+                for start in range(0, len(cached.rows), chunk_size):
+                    yield emit(None, cached.rows[start:start + chunk_size])
+                return
+
+            result = session.execute(
+                text(report.sql).execution_options(stream_results=True, yield_per=chunk_size),
+                params,
+            )
+            yield emit(list(result.keys()), [])
+            for partition in result.partitions(chunk_size):
+                yield emit(None, partition)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.render_workers)
+            return self._pool
+
+    def submit_render(self, session, name: str, output_path: str,
+                      params: Optional[Dict[str, Any]] = None, fmt: str = 'docx') -> Future:
+        """
+        Render a report to a file in the process pool.
+
+        The query runs (or is served from cache) in the calling thread;
+        only the rendering is handed to a worker process.
+
+        Args:
+            session: SQLAlchemy session
+            name: Report name
+            output_path: Destination file
+            params: Query parameters, overriding the report defaults
+            fmt: 'docx' or 'csv'
+
+        Returns:
+            Future resolving to the output path
+        """
+        report = self.registry.get(name)
+        result = self.run(session, name, params)
+
+        if fmt == 'csv':
+            return self._executor().submit(render_csv, result.columns, result.rows, output_path)
+        if fmt == 'docx':
+            if not report.template:
+                raise ReportError(f"Report {name} has no DOCX template")
+            template_path = os.path.join(self.template_folder, report.template)
+            return self._executor().submit(
+                render_docx, template_path, report.title, result.columns, result.rows, output_path
+            )
+        raise ReportError(f"Unsupported report format: {fmt}")
+
+    def shutdown(self) -> None:
+        """Shut down the rendering process pool."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+def get_report_engine() -> ReportEngine:
+    """
+    Get the report engine for the current Flask app, creating it on first use.
+
+    Returns:
+        The app's report engine
+    """
+    from flask import current_app
+
+    # Ensure the pre-defined reports are registered
+    from app.services import report_definitions  # noqa: F401
+
+    engine = current_app.extensions.get('reports')
+    if engine is None:
+        engine = ReportEngine.from_config(current_app.config.get('CONFIG', {}))
+        current_app.extensions['reports'] = engine
+    return engine
@@ -0,0 +1,527 @@
+"""
+Run allocation service for the Crowbank Intranet.
+
+Allocating bookings to kennel and cattery runs is interval colouring:
+each stay is an interval of days, each run a colour, and two stays may
+share a run only if they do not overlap. Stays are placed in order of
+arrival into the run that best fits them: the smallest run big enough
+for the household's pets (siblings of the same species share a run up
+to its capacity), and among those the one whose previous guest leaves
+closest to the arrival, so runs fill back to back rather than leaving
+short gaps nobody can book.
+
+Days a pet must keep (locked allocations, and the days a checked-in pet
+has already spent in its run) are pinned: only the rest of its stay is
+placed, preferring the run it is already in.
+
+When no run is free for a whole stay, a repair step tries moving one
+other stay to another run to make room. Only if that fails is the stay
+split across runs, choosing at each change the run free for longest, so
+the number of mid-stay moves is the fewest possible for what is free.
+
+Each run keeps a sorted list of its occupied intervals, so checking a
+run for a stay is a binary search, and a new booking can be inserted
+into an existing allocation without re-planning anything else.
+"""
+
+import logging
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import delete, select
+
+from app.models.booking import ACTIVE_BOOKING_STATUSES, Booking, BookingPet, BookingStatus
+from app.models.pet import Pet, Species
+from app.models.run import RUN_TYPE_SPECIES, Run, RunAllocation, RunType
+
+
+logger = logging.getLogger(__name__)
+
+StayKey = Tuple[int, int]  # (booking id, first pet id)
+
+ONE_DAY = timedelta(days=1)
+
+
+class RunSlot(NamedTuple):
+    id: int
+    species: Species
+    capacity: int
+    rank: int  # Preference among runs of the same capacity, lowest first
+
+
+class Stay(NamedTuple):
+    key: StayKey
+    booking_id: int
+    species: Species
+    pet_ids: Tuple[int, ...]
+    start: date
+    end: date  # Departure day; the run is free again that day
+
+
+class Segment(NamedTuple):
+    run_id: int
+    start: date
+    end: date
+
+
+class Pin(NamedTuple):
+    segment: Segment
+    locked: bool  # A locked allocation, rather than days already spent in the run
+
+
+def _uncovered(start: date, end: date, segments: Iterable[Segment]) -> List[Tuple[date, date]]:
+    """Parts of [start, end) that no segment covers."""
+    gaps = []
+    day = start
+    for segment in sorted(segments, key=lambda s: s.start):
+        if segment.start > day:
+            gaps.append((day, min(segment.start, end)))
+        day = max(day, segment.end)
+        if day >= end:
+            break
+    if day < end:
+        gaps.append((day, end))
+    return [(a, b) for a, b in gaps if a < b]
+
+
+class RunPlanner:
+    """
+    Allocates stays to runs.
+
+    Args:
+        runs: Runs that may be allocated
+    """
+
+    def __init__(self, runs: Iterable[RunSlot]):
+        self.runs = {run.id: run for run in runs}
+        self._by_species: Dict[Species, List[RunSlot]] = defaultdict(list)
+        for run in sorted(self.runs.values(), key=lambda r: (r.capacity, r.rank, r.id)):
+            self._by_species[run.species].append(run)
+        # Per run, occupied (start, end, stay key) sorted by start; never overlapping
+        self._spans: Dict[int, List[Tuple[date, date, StayKey]]] = defaultdict(list)
+
+        self.stays: Dict[StayKey, Stay] = {}
+        self.placements: Dict[StayKey, List[Segment]] = {}
+        self.locked: Set[StayKey] = set()
+        # Segments of partly pinned stays that must stay where they are
+        self.pinned: Dict[StayKey, List[Segment]] = {}
+        self.unplaced: Dict[StayKey, Stay] = {}
+        self.changed: Set[StayKey] = set()
+
+    # Free intervals
+
+    def conflicts(self, run_id: int, start: date, end: date) -> List[StayKey]:
+        """Stays occupying a run at any time in [start, end)."""
+        spans = self._spans[run_id]
+        found = []
+        i = bisect_left(spans, (end,)) - 1
+        # Spans do not overlap, so ends are sorted too
+        while i >= 0 and spans[i][1] > start:
+            found.append(spans[i][2])
+            i -= 1
+        return found
+
+    def free_until(self, run_id: int, day: date) -> Optional[date]:
+        """Day the run is next occupied, if it is free on `day` (None if it is not)."""
+        if self.conflicts(run_id, day, day + ONE_DAY):
+            return None
+        spans = self._spans[run_id]
+        i = bisect_left(spans, (day + ONE_DAY,))
+        return spans[i][0] if i < len(spans) else date.max
+
+    def _gaps(self, run_id: int, start: date, end: date) -> Tuple[int, int]:
+        """Idle days before and after [start, end) in a run (large if unbounded)."""
+        spans = self._spans[run_id]
+        i = bisect_left(spans, (start,))
+        before = (start - spans[i - 1][1]).days if i else 10 ** 6
+        after = (spans[i][0] - end).days if i < len(spans) else 10 ** 6
+        return before, after
+
+    def candidates(self, stay: Stay) -> List[RunSlot]:
+        """Runs a stay could use, best fit first."""
+        return [run for run in self._by_species[stay.species] if run.capacity >= len(stay.pet_ids)]
+
+    # Bookkeeping
+
+    def _add(self, key: StayKey, segments: List[Segment]) -> None:
+        for segment in segments:
+            insort(self._spans[segment.run_id], (segment.start, segment.end, key))
+        self.placements[key] = segments
+        self.changed.add(key)
+
+    def _release(self, key: StayKey) -> None:
+        for segment in self.placements.pop(key, ()):
+            self._spans[segment.run_id].remove((segment.start, segment.end, key))
+
+    def load(self, stay: Stay, segments: Iterable[Segment], locked: bool = False) -> None:
+        """Record an existing placement without marking it changed."""
+        self.stays[stay.key] = stay
+        self._add(stay.key, list(segments))
+        self.changed.discard(stay.key)
+        if locked:
+            self.locked.add(stay.key)
+
+    def remove(self, key: StayKey) -> None:
+        """Take a stay out of its runs, to be re-placed or dropped."""
+        self._release(key)
+        self.unplaced.pop(key, None)
+        self.changed.add(key)
+
+    # Placement
+
+    def _best_free(self, stay: Stay, exclude: Optional[int] = None) -> Optional[RunSlot]:
+        free = [run for run in self.candidates(stay)
+                if run.id != exclude and not self.conflicts(run.id, stay.start, stay.end)]
+        if not free:
+            return None
+        return min(free, key=lambda run: (run.capacity, *self._gaps(run.id, stay.start, stay.end), run.rank))
+
+    def _repair(self, stay: Stay) -> Optional[Segment]:
+        """Make room by moving one other whole stay to another run."""
+        for run in self.candidates(stay):
+            blocking = self.conflicts(run.id, stay.start, stay.end)
+            if len(blocking) != 1:
+                continue
+            other_key = blocking[0]
+            if other_key in self.locked or other_key in self.pinned or len(self.placements[other_key]) != 1:
+                continue
+            other = self.stays[other_key]
+            alternative = self._best_free(other, exclude=run.id)
+            if alternative is None:
+                continue
+            self._release(other_key)
+            self._add(other_key, [Segment(alternative.id, other.start, other.end)])
+            return Segment(run.id, stay.start, stay.end)
+        return None
+
+    def _split(self, stay: Stay) -> Optional[List[Segment]]:
+        """Cover a stay with the fewest runs, taking the run free longest at each change."""
+        segments = []
+        day = stay.start
+        while day < stay.end:
+            options = [(until, run) for run in self.candidates(stay)
+                       if (until := self.free_until(run.id, day)) is not None]
+            if not options:
+                return None
+            until, run = max(options, key=lambda option: (min(option[0], stay.end), -option[1].capacity,
+                                                         -option[1].rank))
+            segments.append(Segment(run.id, day, min(until, stay.end)))
+            day = segments[-1].end
+        return segments
+
+    def _place_part(self, stay: Stay) -> Optional[List[Segment]]:
+        run = self._best_free(stay)
+        if run is not None:
+            return [Segment(run.id, stay.start, stay.end)]
+        repaired = self._repair(stay)
+        return [repaired] if repaired else self._split(stay)
+
+    def place(self, stay: Stay) -> bool:
+        """
+        Allocate one stay against the current allocation.
+
+        Pinned segments of the stay are kept and only the days they do not
+        cover are placed.
+
+        Args:
+            stay: Stay to place (replacing any earlier placement of it)
+
+        Returns:
+            Whether the whole stay could be placed; if not it is in `unplaced`
+        """
+        if stay.key in self.placements:
+            self._release(stay.key)
+            self.changed.add(stay.key)
+        self.stays[stay.key] = stay
+        self.unplaced.pop(stay.key, None)
+
+        # Pinned days go in first, so the rest prefers to continue in the same run
+        segments = sorted(self.pinned.get(stay.key, ()), key=lambda s: s.start)
+        self._add(stay.key, segments)
+        for start, end in _uncovered(stay.start, stay.end, segments):
+            placed = self._place_part(stay._replace(start=start, end=end))
+            if placed is None:
+                self.unplaced[stay.key] = stay
+                logger.warning(f"No run free for booking {stay.booking_id} on some day of "
+                               f"{stay.start} - {stay.end}")
+                return False
+            segments = sorted(segments + placed, key=lambda s: s.start)
+            self._release(stay.key)
+            self._add(stay.key, segments)
+        return True
+
+    def assign(self, stays: Iterable[Stay]) -> None:
+        """Place stays in arrival order, longest first on the same day."""
+        for stay in sorted(stays, key=lambda s: (s.start, s.start - s.end, s.key)):
+            self.place(stay)
+
+    @property
+    def moves(self) -> int:
+        """Mid-stay moves in the allocation."""
+        return sum(a.run_id != b.run_id for segments in self.placements.values()
+                   for a, b in zip(segments, segments[1:]))
+
+    def short_gaps(self, min_nights: int = 2) -> int:
+        """Idle gaps between stays too short to let (fewer than `min_nights`)."""
+        count = 0
+        for spans in self._spans.values():
+            count += sum(0 < (nxt[0] - prev[1]).days < min_nights for prev, nxt in zip(spans, spans[1:]))
+        return count
+
+
+def _stay_end(start: date, end: date) -> date:
+    # Day visits still need a run for the day
+    return max(end, start + ONE_DAY)
+
+
+# Database
+
+def load_runs(session) -> List[RunSlot]:
+    """Active runs, standard types ranked before deluxe ones."""
+    order = {run_type: n for n, run_type in enumerate(RunType)}
+    return [RunSlot(run.id, RUN_TYPE_SPECIES[run.run_type], run.capacity, order[run.run_type])
+            for run in session.scalars(select(Run).where(Run.active.is_(True)).order_by(Run.code))]
+
+
+def load_stays(session, planner: RunPlanner, start: date, end: date,
+               booking_ids: Optional[Iterable[int]] = None) -> List[Stay]:
+    """
+    Stays of active bookings overlapping [start, end).
+
+    Pets of a booking sharing a species become one stay, or several if
+    there are more than the largest run of that species holds.
+
+    Args:
+        session: SQLAlchemy session
+        planner: Planner whose runs set the largest capacity
+        start: First day
+        end: Day after the last
+        booking_ids: Only these bookings, if given
+
+    Returns:
+        Stays
+    """
+    query = (
+        select(Booking.id, Booking.start_date, Booking.end_date, Pet.id, Pet.species)
+        .join(BookingPet, BookingPet.booking_id == Booking.id)
+        .join(Pet, Pet.id == BookingPet.pet_id)
+        .where(Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+               Booking.start_date < end, Booking.end_date >= start)
+        .order_by(Booking.id, Pet.id)
+    )
+    if booking_ids is not None:
+        query = query.where(Booking.id.in_(list(booking_ids)))
+
+    largest = defaultdict(lambda: 1)
+    for run in planner.runs.values():
+        largest[run.species] = max(largest[run.species], run.capacity)
+
+    groups = defaultdict(list)
+    dates = {}
+    for booking_id, arrival, departure, pet_id, species in session.execute(query):
+        groups[(booking_id, species)].append(pet_id)
+        dates[booking_id] = (arrival, _stay_end(arrival, departure))
+
+    stays = []
+    for (booking_id, species), pet_ids in groups.items():
+        size = largest[species]
+        for i in range(0, len(pet_ids), size):
+            chunk = tuple(pet_ids[i:i + size])
+            stays.append(Stay((booking_id, chunk[0]), booking_id, species, chunk, *dates[booking_id]))
+    return stays
+
+
+def _load_allocations(session, planner: RunPlanner, start: date, end: date,
+                      exclude_booking_ids: Iterable[int] = (),
+                      today: Optional[date] = None) -> Dict[Tuple[int, int], List[Pin]]:
+    """
+    Load existing allocations overlapping [start, end) into a planner.
+
+    The window is widened once to take in the whole of every stay found,
+    so a stay moved by repair is checked against everything around it.
+    Locked allocations, and the days up to `today` of checked-in bookings,
+    are pinned. Of `exclude_booking_ids`, only the pinned days are loaded.
+
+    Returns:
+        Pinned segments per (booking id, pet id)
+    """
+    today = today or date.today()
+    exclude = set(exclude_booking_ids)
+    pins = defaultdict(list)
+    for _ in range(2):
+        rows = session.execute(
+            select(RunAllocation.booking_id, RunAllocation.pet_id, RunAllocation.run_id,
+                   RunAllocation.start_date, RunAllocation.end_date, RunAllocation.locked,
+                   Pet.species, Booking.status)
+            .join(Pet, Pet.id == RunAllocation.pet_id)
+            .join(Booking, Booking.id == RunAllocation.booking_id)
+            .where(RunAllocation.start_date < end, RunAllocation.end_date > start)
+        ).all()
+        if not rows:
+            return pins
+        widened = (min(start, min(r.start_date for r in rows)), max(end, max(r.end_date for r in rows)))
+        if widened == (start, end):
+            break
+        start, end = widened
+
+    by_pet = defaultdict(list)
+    species_of = {}
+    for booking_id, pet_id, run_id, seg_start, seg_end, locked, species, status in rows:
+        segment = Segment(run_id, seg_start, seg_end)
+        pin = None
+        if locked:
+            pin = Pin(segment, True)
+        elif status == BookingStatus.CHECKED_IN and seg_start <= today:
+            pin = Pin(segment._replace(end=min(seg_end, today + ONE_DAY)), False)
+        if pin is not None:
+            pins[(booking_id, pet_id)].append(pin)
+        if booking_id in exclude:
+            if pin is None:
+                continue
+            segment = pin.segment
+        by_pet[(booking_id, pet_id)].append(segment)
+        species_of[(booking_id, pet_id)] = species
+
+    # Pets of a booking with the same segments and pins share a run
+    shared = defaultdict(list)
+    for (booking_id, pet_id), segments in by_pet.items():
+        pinned = tuple(sorted(pin.segment for pin in pins.get((booking_id, pet_id), ())))
+        shared[(booking_id, tuple(sorted(segments, key=lambda s: s.start)), pinned)].append(pet_id)
+    for (booking_id, segments, pinned), pet_ids in shared.items():
+        pet_ids.sort()
+        stay = Stay((booking_id, pet_ids[0]), booking_id, species_of[(booking_id, pet_ids[0])],
+                    tuple(pet_ids), segments[0].start, segments[-1].end)
+        fully_pinned = set(segments) <= set(pinned)
+        planner.load(stay, segments, locked=fully_pinned)
+        if pinned and not fully_pinned:
+            planner.pinned[stay.key] = list(pinned)
+    return pins
+
+
+def _to_place(planner: RunPlanner, stays: Iterable[Stay], pins: Dict[Tuple[int, int], List[Pin]]) -> List[Stay]:
+    """
+    Stays grouped by what of them is pinned, without those pinned throughout.
+
+    Records each stay's pinned segments in the planner, so only the rest
+    of it is placed.
+    """
+    result = []
+    for stay in stays:
+        groups = defaultdict(list)
+        for pet_id in stay.pet_ids:
+            pinned = tuple(sorted(pin.segment for pin in pins.get((stay.booking_id, pet_id), ())))
+            groups[pinned].append(pet_id)
+        for pinned, pet_ids in groups.items():
+            part = stay._replace(key=(stay.booking_id, pet_ids[0]), pet_ids=tuple(pet_ids))
+            if not _uncovered(part.start, part.end, pinned):
+                continue
+            if pinned:
+                planner.pinned[part.key] = list(pinned)
+            else:
+                planner.pinned.pop(part.key, None)
+            result.append(part)
+    return result
+
+
+def _locked_rows(pins: Dict[Tuple[int, int], List[Pin]]) -> Set[Tuple[int, int, Segment]]:
+    return {(booking_id, pet_id, pin.segment)
+            for (booking_id, pet_id), pet_pins in pins.items() for pin in pet_pins if pin.locked}
+
+
+def _release_pets(planner: RunPlanner, stays: Iterable[Stay]) -> None:
+    """Take out loaded placements sharing pets with stays about to be placed."""
+    placing = {(stay.booking_id, pet_id) for stay in stays for pet_id in stay.pet_ids}
+    for key, stay in list(planner.stays.items()):
+        if key in planner.placements and any((stay.booking_id, p) in placing for p in stay.pet_ids):
+            planner.remove(key)
+            planner.locked.discard(key)
+
+
+def _delete_unlocked(session, stay: Stay) -> None:
+    session.execute(delete(RunAllocation).where(
+        RunAllocation.booking_id == stay.booking_id, RunAllocation.pet_id.in_(stay.pet_ids),
+        RunAllocation.locked.is_(False)))
+
+
+def _save(session, planner: RunPlanner, locked_rows: Set[Tuple[int, int, Segment]] = frozenset()) -> None:
+    """Write the placements that changed; locked allocations are never rewritten."""
+    # All deletes first: a stay re-keyed by re-planning shares pets with its old key
+    for key in planner.changed:
+        _delete_unlocked(session, planner.stays[key])
+    for key in planner.changed:
+        stay = planner.stays[key]
+        session.add_all(
+            RunAllocation(booking_id=stay.booking_id, pet_id=pet_id, run_id=segment.run_id,
+                          start_date=segment.start, end_date=segment.end)
+            for segment in planner.placements.get(key, ()) for pet_id in stay.pet_ids
+            if (stay.booking_id, pet_id, segment) not in locked_rows
+        )
+    session.flush()
+    planner.changed.clear()
+
+
+def plan_runs(session, start: date, end: date, today: Optional[date] = None) -> RunPlanner:
+    """
+    Re-plan run allocations for bookings overlapping a window.
+
+    Locked allocations, and the days checked-in pets have already spent in
+    their runs, stay where they are. Everything else in the window is
+    re-allocated from scratch. The caller commits.
+
+    Args:
+        session: SQLAlchemy session
+        start: First day
+        end: Day after the last
+        today: Current day (for tests)
+
+    Returns:
+        The planner, with any stays that could not be placed in `unplaced`
+    """
+    planner = RunPlanner(load_runs(session))
+    pins = _load_allocations(session, planner, start, end, today=today)
+    stays = _to_place(planner, load_stays(session, planner, start, end), pins)
+
+    _release_pets(planner, stays)
+    planner.assign(stays)
+    _save(session, planner, _locked_rows(pins))
+    logger.info(f"Allocated {len(stays)} stays from {start} to {end}: {planner.moves} moves, "
+                f"{len(planner.unplaced)} unplaced")
+    return planner
+
+
+def allocate_booking(session, booking: Booking, today: Optional[date] = None) -> RunPlanner:
+    """
+    Allocate (or re-allocate) one booking against the existing allocation.
+
+    Other bookings are moved only if one of them can go to another run to
+    make room. Days already spent by a checked-in booking, and locked
+    allocations, are kept; only the remaining days are placed (e.g. when a
+    stay is extended). A cancelled booking's other allocations are removed.
+    The caller commits.
+
+    Args:
+        session: SQLAlchemy session
+        booking: Booking created or changed (flushed)
+        today: Current day (for tests)
+
+    Returns:
+        The planner, with the booking's stays in `unplaced` if some could not be placed
+    """
+    planner = RunPlanner(load_runs(session))
+    end = _stay_end(booking.start_date, booking.end_date)
+    pins = _load_allocations(session, planner, booking.start_date, end,
+                             exclude_booking_ids=[booking.id], today=today)
+
+    # Pinned days removed here are written back by _save
+    session.execute(delete(RunAllocation).where(RunAllocation.booking_id == booking.id,
+                                                RunAllocation.locked.is_(False)))
+    for key in [key for key, stay in planner.stays.items() if stay.booking_id == booking.id]:
+        planner.remove(key)
+        planner.locked.discard(key)
+    for stay in _to_place(planner, load_stays(session, planner, booking.start_date, end,
+                                              booking_ids=[booking.id]), pins):
+        planner.place(stay)
+    _save(session, planner, _locked_rows(pins))
+    return planner
@@ -0,0 +1,533 @@
+"""
+Staff scheduling service for the Crowbank Intranet.
+
+Coverage comes from booked occupancy: each day's full staffing is the
+number of dogs and cats on site divided by how many of each one person
+can look after, scaled per shift type and floored at the shift's
+minimum. A shift with dogs (cats) on site also needs someone with the
+dog handling (cat care) skill.
+
+The rota is filled by a greedy heuristic with a repair step. The most
+constrained shifts go first. Each picks, among the staff who are
+available that weekday, not on approved leave, not already on a shift
+that day and under their weekly hours, the one with the most hours
+left (and, among equals, the fewest skills, keeping versatile staff
+free). A shift left short then tries to borrow someone from another
+shift that day whose place can be taken by someone else.
+
+Locked assignments (set by a manager) are always kept. When a booking
+or a leave request changes, only the affected days are re-solved
+against the rest of the week, so a manager's edits elsewhere survive and
+re-solving is instant.
+"""
+
+import logging
+import math
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import delete, func, select
+
+from app.models.booking import ACTIVE_BOOKING_STATUSES, Booking, BookingPet
+from app.models.pet import Pet, Species
+from app.models.staff import (Employee, EmployeeAvailability, EmployeeSkill, LeaveRequest, LeaveStatus,
+                              ShiftAssignment, ShiftType, Skill)
+
+
+logger = logging.getLogger(__name__)
+
+Slot = Tuple[date, int]  # (day, shift type id)
+
+SPECIES_SKILLS = {Species.DOG: Skill.DOG_HANDLING, Species.CAT: Skill.CAT_CARE}
+
+
+class StaffMember(NamedTuple):
+    id: int
+    skills: FrozenSet[Skill]
+    max_hours: float
+    available: FrozenSet[Tuple[int, int]]  # (weekday, shift type id)
+    leave: Tuple[Tuple[date, date], ...]
+
+
+class Shift(NamedTuple):
+    id: int
+    hours: float
+    min_staff: int
+    load_factor: float
+
+
+class Requirement(NamedTuple):
+    staff: int
+    skills: FrozenSet[Skill]
+
+
+class Shortfall(NamedTuple):
+    staff: int
+    skills: FrozenSet[Skill]
+
+
+class Settings(NamedTuple):
+    dogs_per_staff: float = 10
+    cats_per_staff: float = 20
+    max_shifts_per_day: int = 1
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'Settings':
+        section = config.get('scheduling', {})
+        return cls(**{field: section[field] for field in cls._fields if field in section})
+
+
+class Rota:
+    """Assignments of staff to shifts, with the locked ones and any shortfalls."""
+
+    def __init__(self, assignments: Optional[Dict[Slot, Set[int]]] = None,
+                 locked: Iterable[Tuple[Slot, int]] = ()):
+        self.assignments: Dict[Slot, Set[int]] = defaultdict(set)
+        for slot, employee_ids in (assignments or {}).items():
+            self.assignments[slot].update(employee_ids)
+        self.locked: Set[Tuple[Slot, int]] = set(locked)
+        for slot, employee_id in self.locked:
+            self.assignments[slot].add(employee_id)
+        self.shortfalls: Dict[Slot, Shortfall] = {}
+
+    def shifts_of(self, employee_id: int) -> List[Slot]:
+        return sorted(slot for slot, ids in self.assignments.items() if employee_id in ids)
+
+    def copy(self) -> 'Rota':
+        rota = Rota(self.assignments, self.locked)
+        rota.shortfalls = dict(self.shortfalls)
+        return rota
+
+
+def week_of(day: date) -> date:
+    """Monday of the day's week."""
+    return day - timedelta(days=day.weekday())
+
+
+# Coverage
+
+def occupancy(session, start: date, end: date) -> Dict[date, Dict[Species, int]]:
+    """
+    Count pets on site per day and species.
+
+    Pets count on both their arrival and departure days.
+
+    Args:
+        session: SQLAlchemy session
+        start: First day
+        end: Last day (inclusive)
+
+    Returns:
+        Counts by day and species (days without pets are omitted)
+    """
+    rows = session.execute(
+        select(Booking.start_date, Booking.end_date, Pet.species, func.count())
+        .join(BookingPet, BookingPet.booking_id == Booking.id)
+        .join(Pet, Pet.id == BookingPet.pet_id)
+        .where(Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+               Booking.start_date <= end, Booking.end_date >= start)
+        .group_by(Booking.id, Booking.start_date, Booking.end_date, Pet.species)
+    )
+
+    # Difference arrays: +n on arrival, -n the day after departure
+    days = (end - start).days + 1
+    deltas = {species: [0] * (days + 1) for species in Species}
+    for arrival, departure, species, count in rows:
+        first = max((arrival - start).days, 0)
+        last = min((departure - start).days, days - 1)
+        deltas[species][first] += count
+        deltas[species][last + 1] -= count
+
+    result: Dict[date, Dict[Species, int]] = {}
+    running = dict.fromkeys(Species, 0)
+    for offset in range(days):
+        for species in Species:
+            running[species] += deltas[species][offset]
+        if any(running.values()):
+            result[start + timedelta(days=offset)] = dict(running)
+    return result
+
+
+def required_coverage(pets_on_site: Dict[date, Dict[Species, int]], shifts: Iterable[Shift],
+                      days: Iterable[date], settings: Settings = Settings()) -> Dict[Slot, Requirement]:
+    """
+    Staff and skills needed on each shift.
+
+    Args:
+        pets_on_site: Output of `occupancy`
+        shifts: Shift types
+        days: Days to cover
+        settings: Staffing ratios
+
+    Returns:
+        Requirement per (day, shift type id)
+    """
+    shifts = list(shifts)
+    requirements = {}
+    for day in days:
+        counts = pets_on_site.get(day, {})
+        dogs, cats = counts.get(Species.DOG, 0), counts.get(Species.CAT, 0)
+        full = dogs / settings.dogs_per_staff + cats / settings.cats_per_staff
+        skills = frozenset(SPECIES_SKILLS[s] for s, n in counts.items() if n)
+        for shift in shifts:
+            staff = max(shift.min_staff, math.ceil(full * shift.load_factor - 1e-9))
+            if staff:
+                requirements[(day, shift.id)] = Requirement(staff, skills)
+    return requirements
+
+
+# Solving
+
+class Scheduler:
+    """
+    Assigns staff to shifts.
+
+    Args:
+        staff: Employees that may be rostered
+        shifts: Shift types
+        settings: Scheduling settings
+    """
+
+    def __init__(self, staff: Iterable[StaffMember], shifts: Iterable[Shift],
+                 settings: Settings = Settings()):
+        self.staff = {member.id: member for member in staff}
+        self.shifts = {shift.id: shift for shift in shifts}
+        self.settings = settings
+
+    def available(self, employee_id: int, slot: Slot) -> bool:
+        """Whether an employee can work a shift, ignoring the rest of the rota."""
+        member = self.staff.get(employee_id)
+        day, shift_id = slot
+        if member is None or (day.weekday(), shift_id) not in member.available:
+            return False
+        return not any(start <= day <= end for start, end in member.leave)
+
+    def _load(self, rota: Rota):
+        hours: Dict[Tuple[int, date], float] = defaultdict(float)
+        per_day: Dict[Tuple[int, date], int] = defaultdict(int)
+        for (day, shift_id), employee_ids in rota.assignments.items():
+            for employee_id in employee_ids:
+                hours[(employee_id, week_of(day))] += self.shifts[shift_id].hours
+                per_day[(employee_id, day)] += 1
+        return hours, per_day
+
+    def _can_take(self, employee_id, slot, rota, hours, per_day) -> bool:
+        day, shift_id = slot
+        member = self.staff[employee_id]
+        return (employee_id not in rota.assignments[slot]
+                and self.available(employee_id, slot)
+                and per_day[(employee_id, day)] < self.settings.max_shifts_per_day
+                and hours[(employee_id, week_of(day))] + self.shifts[shift_id].hours <= member.max_hours)
+
+    def _preference(self, employee_id, day, hours):
+        member = self.staff[employee_id]
+        remaining = member.max_hours - hours[(employee_id, week_of(day))]
+        return (-remaining, len(member.skills), employee_id)
+
+    def _assign(self, employee_id, slot, rota, hours, per_day) -> None:
+        day, shift_id = slot
+        rota.assignments[slot].add(employee_id)
+        hours[(employee_id, week_of(day))] += self.shifts[shift_id].hours
+        per_day[(employee_id, day)] += 1
+
+    def _unassign(self, employee_id, slot, rota, hours, per_day) -> None:
+        day, shift_id = slot
+        rota.assignments[slot].discard(employee_id)
+        hours[(employee_id, week_of(day))] -= self.shifts[shift_id].hours
+        per_day[(employee_id, day)] -= 1
+
+    def _missing(self, slot, requirement, rota) -> Shortfall:
+        assigned = rota.assignments[slot]
+        covered = set().union(*(self.staff[e].skills for e in assigned if e in self.staff))
+        return Shortfall(max(requirement.staff - len(assigned), 0), requirement.skills - covered)
+
+    def _fill_slot(self, slot, requirement, rota, hours, per_day) -> None:
+        day = slot[0]
+        for skill in sorted(self._missing(slot, requirement, rota).skills):
+            candidates = [e for e, m in self.staff.items()
+                          if skill in m.skills and self._can_take(e, slot, rota, hours, per_day)]
+            if candidates:
+                self._assign(min(candidates, key=lambda e: self._preference(e, day, hours)),
+                             slot, rota, hours, per_day)
+        while len(rota.assignments[slot]) < requirement.staff:
+            candidates = [e for e in self.staff if self._can_take(e, slot, rota, hours, per_day)]
+            if not candidates:
+                break
+            self._assign(min(candidates, key=lambda e: self._preference(e, day, hours)),
+                         slot, rota, hours, per_day)
+
+    def _repair(self, slot, requirements, rota, hours, per_day) -> None:
+        """Borrow someone from another shift that day if their place can be refilled."""
+        day = slot[0]
+        for other in [s for s in requirements if s[0] == day and s != slot]:
+            for employee_id in sorted(rota.assignments[other]):
+                shortfall = self._missing(slot, requirements[slot], rota)
+                if not shortfall.staff and not shortfall.skills:
+                    return
+                if (other, employee_id) in rota.locked or not self.available(employee_id, slot):
+                    continue
+                member = self.staff[employee_id]
+                if not shortfall.staff and not (shortfall.skills & member.skills):
+                    continue
+                before = set(rota.assignments[other])
+                self._unassign(employee_id, other, rota, hours, per_day)
+                if self._can_take(employee_id, slot, rota, hours, per_day):
+                    self._assign(employee_id, slot, rota, hours, per_day)
+                    self._fill_slot(other, requirements[other], rota, hours, per_day)
+                    if not any(self._missing(other, requirements[other], rota)):
+                        continue
+                    # The other shift could not be refilled: undo the move
+                    self._unassign(employee_id, slot, rota, hours, per_day)
+                    for extra in rota.assignments[other] - before:
+                        self._unassign(extra, other, rota, hours, per_day)
+                self._assign(employee_id, other, rota, hours, per_day)
+
+    def _fill(self, requirements: Dict[Slot, Requirement], slots: Iterable[Slot], rota: Rota) -> Rota:
+        hours, per_day = self._load(rota)
+        slots = [s for s in slots if s in requirements]
+        # Most constrained first: fewest available staff per place needed
+        slots.sort(key=lambda s: (sum(self.available(e, s) for e in self.staff) / requirements[s].staff, s))
+
+        for slot in slots:
+            self._fill_slot(slot, requirements[slot], rota, hours, per_day)
+        for slot in slots:
+            if any(self._missing(slot, requirements[slot], rota)):
+                self._repair(slot, requirements, rota, hours, per_day)
+
+        for slot in slots:
+            shortfall = self._missing(slot, requirements[slot], rota)
+            if any(shortfall):
+                rota.shortfalls[slot] = shortfall
+            else:
+                rota.shortfalls.pop(slot, None)
+        return rota
+
+    def solve(self, requirements: Dict[Slot, Requirement],
+              locked: Iterable[Tuple[Slot, int]] = ()) -> Rota:
+        """
+        Build a rota from scratch, around locked assignments.
+
+        Args:
+            requirements: Coverage per slot
+            locked: (slot, employee id) pairs that must stay
+
+        Returns:
+            The rota, with any shifts that could not be covered in `shortfalls`
+        """
+        return self._fill(requirements, requirements, Rota(locked=locked))
+
+    def resolve(self, rota: Rota, requirements: Dict[Slot, Requirement],
+                days: Iterable[date] = (), employee_ids: Iterable[int] = ()) -> Rota:
+        """
+        Re-solve only what a change touched.
+
+        Unlocked assignments on `days` are released (all of them, or only
+        those of `employee_ids` if given) and the affected shifts refilled;
+        everything else stays as it is.
+
+        Args:
+            rota: Current rota
+            requirements: Coverage per slot (at least for the affected days)
+            days: Days whose coverage or staff changed
+            employee_ids: Employees whose availability changed (e.g. leave)
+
+        Returns:
+            A new rota
+        """
+        days = set(days)
+        employee_ids = set(employee_ids)
+        rota = rota.copy()
+        for slot, assigned in rota.assignments.items():
+            if slot[0] not in days:
+                continue
+            for employee_id in list(assigned):
+                if (slot, employee_id) in rota.locked:
+                    continue
+                if not employee_ids or employee_id in employee_ids:
+                    assigned.discard(employee_id)
+        for slot in [s for s in rota.shortfalls if s[0] in days]:
+            del rota.shortfalls[slot]
+        return self._fill(requirements, [s for s in requirements if s[0] in days], rota)
+
+
+# Database
+
+def load_scheduler(session, settings: Settings = Settings(), on: Optional[date] = None) -> Scheduler:
+    """
+    Build a scheduler from active employees, their availability and approved leave.
+
+    Args:
+        session: SQLAlchemy session
+        settings: Scheduling settings
+        on: Only leave ending on or after this day is loaded
+
+    Returns:
+        Scheduler
+    """
+    shifts = [Shift(s.id, s.hours, s.min_staff, float(s.load_factor))
+              for s in session.scalars(select(ShiftType))]
+
+    skills = defaultdict(set)
+    for employee_id, skill in session.execute(select(EmployeeSkill.employee_id, EmployeeSkill.skill)):
+        skills[employee_id].add(skill)
+    available = defaultdict(set)
+    for employee_id, weekday, shift_type_id in session.execute(
+            select(EmployeeAvailability.employee_id, EmployeeAvailability.weekday,
+                   EmployeeAvailability.shift_type_id)):
+        available[employee_id].add((weekday, shift_type_id))
+    leave_query = (select(LeaveRequest.employee_id, LeaveRequest.start_date, LeaveRequest.end_date)
+                   .where(LeaveRequest.status == LeaveStatus.APPROVED))
+    if on is not None:
+        leave_query = leave_query.where(LeaveRequest.end_date >= on)
+    leave = defaultdict(list)
+    for employee_id, start, end in session.execute(leave_query):
+        leave[employee_id].append((start, end))
+
+    staff = [
+        StaffMember(employee_id, frozenset(skills[employee_id]), float(max_hours),
+                    frozenset(available[employee_id]), tuple(leave[employee_id]))
+        for employee_id, max_hours in session.execute(
+            select(Employee.id, Employee.max_hours_per_week).where(Employee.active.is_(True)))
+    ]
+    return Scheduler(staff, shifts, settings)
+
+
+def load_rota(session, start: date, end: date) -> Rota:
+    """Current assignments between two days (inclusive)."""
+    rows = session.execute(
+        select(ShiftAssignment.date, ShiftAssignment.shift_type_id, ShiftAssignment.employee_id,
+               ShiftAssignment.locked)
+        .where(ShiftAssignment.date.between(start, end))
+    )
+    assignments = defaultdict(set)
+    locked = []
+    for day, shift_type_id, employee_id, is_locked in rows:
+        assignments[(day, shift_type_id)].add(employee_id)
+        if is_locked:
+            locked.append(((day, shift_type_id), employee_id))
+    return Rota(assignments, locked)
+
+
+def _save_rota(session, rota: Rota, before: Rota, days: Set[date]) -> None:
+    """Write the difference between two rotas on the given days."""
+    removed = [(slot, e) for slot, ids in before.assignments.items() if slot[0] in days
+               for e in ids - rota.assignments.get(slot, set())]
+    added = [(slot, e) for slot, ids in rota.assignments.items() if slot[0] in days
+             for e in ids - before.assignments.get(slot, set())]
+
+    for (day, shift_type_id), employee_id in removed:
+        session.execute(delete(ShiftAssignment).where(
+            ShiftAssignment.date == day, ShiftAssignment.shift_type_id == shift_type_id,
+            ShiftAssignment.employee_id == employee_id, ShiftAssignment.locked.is_(False)))
+    session.add_all(ShiftAssignment(employee_id=employee_id, shift_type_id=shift_type_id, date=day)
+                    for (day, shift_type_id), employee_id in added)
+    session.flush()
+    logger.info(f"Rota updated for {len(days)} days: {len(added)} shifts added, {len(removed)} removed")
+
+
+def _week_span(days: Iterable[date]) -> Tuple[date, date]:
+    """First Monday and last Sunday of the weeks containing the days."""
+    days = list(days)
+    return week_of(min(days)), week_of(max(days)) + timedelta(days=6)
+
+
+def plan_week(session, week_start: date, settings: Settings = Settings()) -> Rota:
+    """
+    Build the rota for a week from scratch, keeping locked assignments.
+
+    The caller commits.
+
+    Args:
+        session: SQLAlchemy session
+        week_start: Any day of the week (the rota runs Monday to Sunday)
+        settings: Scheduling settings
+
+    Returns:
+        The new rota
+    """
+    start, end = _week_span([week_start])
+    days = [start + timedelta(days=n) for n in range(7)]
+    scheduler = load_scheduler(session, settings, on=start)
+    requirements = required_coverage(occupancy(session, start, end), scheduler.shifts.values(), days, settings)
+
+    before = load_rota(session, start, end)
+    rota = scheduler.solve(requirements, before.locked)
+    _save_rota(session, rota, before, set(days))
+    return rota
+
+
+def replan(session, days: Iterable[date], employee_ids: Iterable[int] = (),
+           settings: Settings = Settings()) -> Rota:
+    """
+    Re-solve the rota on the given days only.
+
+    Weekly hours are still counted over the whole of each week, so
+    shifts elsewhere in the week are respected. The caller commits.
+
+    Args:
+        session: SQLAlchemy session
+        days: Days whose coverage or staffing changed
+        employee_ids: If given, only these employees' shifts are released
+        settings: Scheduling settings
+
+    Returns:
+        The rota of the weeks containing the days
+    """
+    days = set(days)
+    if not days:
+        return Rota()
+    start, end = _week_span(days)
+    scheduler = load_scheduler(session, settings, on=start)
+    requirements = required_coverage(occupancy(session, min(days), max(days)),
+                                     scheduler.shifts.values(), sorted(days), settings)
+
+    before = load_rota(session, start, end)
+    rota = scheduler.resolve(before, requirements, days, employee_ids)
+    _save_rota(session, rota, before, days)
+    return rota
+
+
+def _date_range(start: date, end: date) -> List[date]:
+    return [start + timedelta(days=n) for n in range((end - start).days + 1)]
+
+
+def on_booking_changed(session, booking: Booking, old_dates: Optional[Tuple[date, date]] = None,
+                       settings: Settings = Settings()) -> Rota:
+    """
+    Re-solve the days a booking covers (and covered, if its dates moved).
+
+    Args:
+        session: SQLAlchemy session
+        booking: Booking created, changed or cancelled (flushed)
+        old_dates: Previous (start_date, end_date), if the dates changed
+        settings: Scheduling settings
+
+    Returns:
+        The updated rota
+    """
+    days = set(_date_range(booking.start_date, booking.end_date))
+    if old_dates:
+        days.update(_date_range(*old_dates))
+    return replan(session, days, settings=settings)
+
+
+def on_leave_changed(session, leave: LeaveRequest, settings: Settings = Settings()) -> Rota:
+    """
+    Re-solve the days of a leave request that was approved, rejected or withdrawn.
+
+    Approved leave releases the employee's shifts on those days; anything
+    else lets them be rostered again.
+
+    Args:
+        session: SQLAlchemy session
+        leave: Leave request (flushed)
+        settings: Scheduling settings
+
+    Returns:
+        The updated rota
+    """
+    days = _date_range(leave.start_date, leave.end_date)
+    if leave.status == LeaveStatus.APPROVED:
+        return replan(session, days, employee_ids=[leave.employee_id], settings=settings)
+    return replan(session, days, settings=settings)
@@ -0,0 +1,116 @@
+"""
+Full-text search over customer and contact notes.
+
+On PostgreSQL, notes are matched against their trigger-maintained
+``notes_tsv`` vectors through GIN indexes, ranked with ``ts_rank_cd``,
+and only the top hits get a ``ts_headline`` snippet (the expensive
+part, since it re-parses the note). Queries use ``websearch_to_tsquery``
+syntax: ``bites -muzzle``, ``"insulin twice"``, ``diabetic or insulin``.
+
+Other databases (SQLite in development and tests) fall back to matching
+every word with LIKE, ranked by the number of occurrences.
+
+Snippets are returned as `Markup`, with the note text escaped and the
+matched words wrapped in ``<mark>``.
+"""
+
+import re
+from typing import List, NamedTuple, Sequence
+
+from markupsafe import Markup, escape
+from sqlalchemy import and_, desc, func, literal, select, union_all
+
+from app.models.base import SEARCH_CONFIG
+from app.models.customer import Contact, Customer
+
+# Private-use characters stand in for the highlight tags until the note is escaped
+_START, _STOP = '\ue000', '\ue001'
+
+HEADLINE_OPTIONS = f'StartSel="{_START}", StopSel="{_STOP}", MaxWords=25, MinWords=10, MaxFragments=2'
+
+SEARCHABLE = {'customer': Customer, 'contact': Contact}
+
+
+class SearchHit(NamedTuple):
+    kind: str  # 'customer' or 'contact'
+    id: int
+    rank: float
+    snippet: Markup
+
+
+def _markup(snippet: str) -> Markup:
+    return Markup(str(escape(snippet)).replace(_START, '<mark>').replace(_STOP, '</mark>'))
+
+
+def search_notes(session, query: str, limit: int = 20,
+                 kinds: Sequence[str] = ('customer', 'contact')) -> List[SearchHit]:
+    """
+    Find the notes best matching a query.
+
+    Args:
+        session: SQLAlchemy session
+        query: Search text (web search syntax on PostgreSQL)
+        limit: Maximum hits returned
+        kinds: Which notes to search ('customer', 'contact')
+
+    Returns:
+        Hits, best first
+    """
+    if not query.strip():
+        return []
+    models = [(kind, SEARCHABLE[kind]) for kind in kinds]
+    if session.get_bind().dialect.name == 'postgresql':
+        return _search_postgres(session, query, limit, models)
+    return _search_fallback(session, query, limit, models)
+
+
+def _search_postgres(session, query, limit, models) -> List[SearchHit]:
+    tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+    ranked = []
+    for kind, model in models:
+        rank = func.ts_rank_cd(model.notes_tsv, tsquery)
+        top = (select(literal(kind).label('kind'), model.id.label('id'), rank.label('rank'),
+                      model.notes.label('notes'))
+               .where(model.notes_tsv.op('@@')(tsquery))
+               .order_by(desc(rank))
+               .limit(limit)
+               .subquery())
+        ranked.append(select(top))
+    hits = union_all(*ranked).subquery()
+
+    # Headlines only for the rows actually returned
+    rows = session.execute(
+        select(hits.c.kind, hits.c.id, hits.c.rank,
+               func.ts_headline(SEARCH_CONFIG, hits.c.notes, tsquery, HEADLINE_OPTIONS))
+        .order_by(hits.c.rank.desc(), hits.c.kind, hits.c.id)
+        .limit(limit)
+    )
+    return [SearchHit(kind, id_, float(rank), _markup(snippet)) for kind, id_, rank, snippet in rows]
+
+
+def _fallback_snippet(notes: str, pattern: re.Pattern, width: int = 60) -> str:
+    match = pattern.search(notes)
+    start = max(match.start() - width, 0) if match else 0
+    end = min((match.end() if match else 0) + width, len(notes))
+    excerpt = notes[start:end]
+    excerpt = pattern.sub(lambda m: f"{_START}{m.group(0)}{_STOP}", excerpt)
+    return ('...' if start else '') + excerpt + ('...' if end < len(notes) else '')
+
+
+def _search_fallback(session, query, limit, models) -> List[SearchHit]:
+    words = [w for w in re.findall(r'\w+', query.lower()) if len(w) > 1]
+    if not words:
+        return []
+    pattern = re.compile('|'.join(re.escape(w) for w in words), re.I)
+    hits = []
+    for kind, model in models:
+        rows = session.execute(
+            select(model.id, model.notes)
+            .where(and_(*(func.lower(model.notes).contains(w) for w in words)))
+        )
+        for id_, notes in rows:
+            lowered = notes.lower()
+            rank = sum(lowered.count(w) for w in words) / (1 + len(notes) / 1000)
+            hits.append(SearchHit(kind, id_, rank, _markup(_fallback_snippet(notes, pattern))))
+    hits.sort(key=lambda hit: (-hit.rank, hit.kind, hit.id))
+    return hits[:limit]
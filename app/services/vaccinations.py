@@ -0,0 +1,239 @@
+"""
+Vaccination expiry scanning for the Crowbank Intranet.
+
+Flags booked pets whose required vaccinations are missing, already
+expired, or expire before the end of their stay. All bookings in the
+scan window are checked with a single set-based query; incremental runs
+only re-check pets touched since the previous run, plus bookings that
+have newly entered the window.
+"""
+
+import logging
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import and_, delete, func, literal, or_, select, union_all
+
+from app.models.booking import ACTIVE_BOOKING_STATUSES, Booking, BookingPet
+from app.models.job import JobRun
+from app.models.pet import (
+    REQUIRED_VACCINES, Pet, Vaccination, VaccinationAlert, VaccinationIssue, VaccineType,
+)
+from app.services.reports import data_versions
+
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = 'vaccination_scan'
+
+# Rows committed by transactions that overlapped the previous run may carry
+# an updated_at just before its watermark, so re-check a little further back
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+
+class VaccinationProblem(NamedTuple):
+    booking_id: int
+    pet_id: int
+    vaccine_type: VaccineType
+    issue: VaccinationIssue
+    expires_on: Optional[date]
+
+
+class ScanSummary(NamedTuple):
+    full: bool
+    checked_from: date
+    checked_until: date
+    alerts: int
+
+
+def _required_vaccines():
+    """Build the (species, vaccine_type) pairs as an inline derived table."""
+    # Typed as the enum columns they are joined to (PostgreSQL has no text = enum)
+    return union_all(*(
+        select(
+            literal(species, Pet.species.type).label('species'),
+            literal(vaccine, Vaccination.vaccine_type.type).label('vaccine_type'),
+        )
+        for species, vaccines in REQUIRED_VACCINES.items()
+        for vaccine in vaccines
+    )).subquery('required')
+
+
+def find_problems(session, start: date, until: date,
+                  pet_ids: Optional[Iterable[int]] = None,
+                  booking_ids: Optional[Iterable[int]] = None) -> List[VaccinationProblem]:
+    """
+    Find booked pets whose vaccinations will not cover their stay.
+
+    Args:
+        session: SQLAlchemy session
+        start: Only consider bookings ending on or after this date
+        until: Only consider bookings starting on or before this date
+        pet_ids: Restrict to these pets
+        booking_ids: Restrict to these bookings (combined with pet_ids using OR)
+
+    Returns:
+        One entry per booking, pet and missing/expiring vaccine
+    """
+    booked = (
+        select(BookingPet.booking_id, BookingPet.pet_id, Booking.start_date, Booking.end_date)
+        .join(Booking, Booking.id == BookingPet.booking_id)
+        .where(
+            Booking.start_date <= until,
+            Booking.end_date >= start,
+            Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+        )
+    )
+    filters = []
+    if pet_ids is not None:
+        filters.append(BookingPet.pet_id.in_(list(pet_ids)))
+    if booking_ids is not None:
+        filters.append(BookingPet.booking_id.in_(list(booking_ids)))
+    if filters:
+        booked = booked.where(or_(*filters))
+    booked = booked.subquery('booked')
+
+    # Latest expiry per pet and vaccine, limited to pets in the window;
+    # served by the partial index on vaccinations
+    latest = (
+        select(
+            Vaccination.pet_id,
+            Vaccination.vaccine_type,
+            func.max(Vaccination.expires_on).label('expires_on'),
+        )
+        .where(
+            Vaccination.expires_on.isnot(None),
+            Vaccination.pet_id.in_(select(booked.c.pet_id)),
+        )
+        .group_by(Vaccination.pet_id, Vaccination.vaccine_type)
+        .subquery('latest')
+    )
+
+    required = _required_vaccines()
+    query = (
+        select(
+            booked.c.booking_id,
+            booked.c.pet_id,
+            required.c.vaccine_type,
+            booked.c.start_date,
+            latest.c.expires_on,
+        )
+        .select_from(booked)
+        .join(Pet, Pet.id == booked.c.pet_id)
+        .join(required, required.c.species == Pet.species)
+        .outerjoin(latest, and_(
+            latest.c.pet_id == booked.c.pet_id,
+            latest.c.vaccine_type == required.c.vaccine_type,
+        ))
+        .where(or_(latest.c.expires_on.is_(None), latest.c.expires_on < booked.c.end_date))
+        .order_by(booked.c.start_date, booked.c.booking_id, booked.c.pet_id)
+    )
+
+    problems = []
+    for booking_id, pet_id, vaccine_type, start_date, expires_on in session.execute(query):
+        if expires_on is None:
+            issue = VaccinationIssue.MISSING
+        elif expires_on < start_date:
+            issue = VaccinationIssue.EXPIRED
+        else:
+            issue = VaccinationIssue.EXPIRES_DURING_STAY
+        problems.append(VaccinationProblem(
+            booking_id, pet_id, vaccine_type, issue, expires_on
+        ))
+    return problems
+
+
+def _touched_pet_ids(since: datetime):
+    """
+    Select pets whose record, vaccinations or bookings changed since a time.
+
+    Deleting a vaccination touches its pet (see app.models.pet).
+    """
+    return union_all(
+        select(Pet.id).where(Pet.updated_at >= since),
+        select(Vaccination.pet_id).where(Vaccination.updated_at >= since),
+        select(BookingPet.pet_id).where(BookingPet.created_at >= since),
+        select(BookingPet.pet_id)
+        .join(Booking, Booking.id == BookingPet.booking_id)
+        .where(Booking.updated_at >= since),
+    )
+
+
+def scan(session, days_ahead: int = 14, today: Optional[date] = None,
+         full: bool = False) -> ScanSummary:
+    """
+    Refresh vaccination alerts for bookings in the next `days_ahead` days.
+
+    The first run, or a run with `full=True`, rebuilds all alerts. Later
+    runs re-check only pets touched since the last run and bookings that
+    have entered the window since then. The caller commits.
+
+    Args:
+        session: SQLAlchemy session
+        days_ahead: Size of the scan window in days
+        today: Start of the window (defaults to the current date)
+        full: Force a full rescan
+
+    Returns:
+        Summary of the run
+    """
+    today = today or date.today()
+    until = today + timedelta(days=days_ahead)
+    started_at = session.execute(select(func.now())).scalar()
+
+    job = session.get(JobRun, JOB_NAME)
+    full = full or job is None
+
+    # Stays that have ended, and pets taken off a booking, no longer need alerts
+    session.execute(delete(VaccinationAlert).where(or_(
+        VaccinationAlert.booking_id.in_(select(Booking.id).where(Booking.end_date < today)),
+        ~select(BookingPet.booking_id).where(
+            BookingPet.booking_id == VaccinationAlert.booking_id,
+            BookingPet.pet_id == VaccinationAlert.pet_id,
+        ).exists(),
+    )).execution_options(synchronize_session=False))
+
+    if full:
+        session.execute(delete(VaccinationAlert).execution_options(synchronize_session=False))
+        problems = find_problems(session, today, until)
+    else:
+        since = job.last_run_at - WATERMARK_OVERLAP
+        touched = [row[0] for row in session.execute(_touched_pet_ids(since))]
+        # Bookings starting beyond the previous window were never checked
+        entered = [row[0] for row in session.execute(
+            select(Booking.id).where(
+                Booking.start_date > job.last_run_at.date() + timedelta(days=days_ahead),
+                Booking.start_date <= until,
+            )
+        )]
+        if touched:
+            session.execute(delete(VaccinationAlert).where(VaccinationAlert.pet_id.in_(touched))
+                            .execution_options(synchronize_session=False))
+        if entered:
+            session.execute(delete(VaccinationAlert).where(VaccinationAlert.booking_id.in_(entered))
+                            .execution_options(synchronize_session=False))
+        problems = find_problems(session, today, until, pet_ids=touched, booking_ids=entered) \
+            if touched or entered else []
+
+    if problems:
+        session.execute(VaccinationAlert.__table__.insert(), [
+            {
+                'booking_id': problem.booking_id,
+                'pet_id': problem.pet_id,
+                'vaccine_type': problem.vaccine_type,
+                'issue': problem.issue,
+                'expires_on': problem.expires_on,
+            }
+            for problem in problems
+        ])
+
+    # Alerts are written with Core statements, so invalidate cached reports here
+    data_versions.bump(VaccinationAlert.__tablename__)
+
+    if job is None:
+        session.add(JobRun(name=JOB_NAME, last_run_at=started_at))
+    else:
+        job.last_run_at = started_at
+
+    logger.info(f"Vaccination scan ({'full' if full else 'incremental'}): {len(problems)} alerts refreshed")
+    return ScanSummary(full=full, checked_from=today, checked_until=until, alerts=len(problems))
@@ -0,0 +1,442 @@
+"""
+Inbound webhooks (Gravity Forms, Stripe) for the Crowbank Intranet.
+
+Receiving and processing are split so senders never wait on our work:
+
+- ``POST /webhooks/<source>`` only checks the delivery is authentic and
+  well formed, stores the raw body under the sender's idempotency key
+  (the Stripe event id, or the Gravity Forms form and entry ids) and
+  answers 202. A retried delivery hits the unique key and is answered
+  the same way without being stored again.
+- A worker (``flask process-webhooks --loop``) claims pending events in
+  batches, matches each to a customer by legacy customer number or
+  contact email with one lookup per batch, and runs any handler
+  registered for the event type. Events whose handler fails are retried
+  up to ``webhooks.max_attempts`` times, with exponential backoff from
+  ``webhooks.retry_delay``.
+- ``flask replay-webhooks`` puts processed or failed events back on the
+  queue, e.g. after fixing a handler or importing missing customers.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from flask import abort, current_app, jsonify, request
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.models.customer import Contact, ContactRole, Customer, CustomerContact
+from app.models.webhook import WebhookEvent, WebhookSource, WebhookStatus
+
+
+logger = logging.getLogger(__name__)
+
+EMAIL = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+Handler = Callable[[Any, WebhookEvent, Dict[str, Any]], None]
+
+# (source, event type) -> handler run after the customer is matched
+HANDLERS: Dict[Tuple[WebhookSource, str], Handler] = {}
+
+
+class WebhookError(Exception):
+    """A delivery that is rejected; `status` is the HTTP status returned."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class Delivery(NamedTuple):
+    idempotency_key: str
+    event_type: Optional[str]
+
+
+class BatchSummary(NamedTuple):
+    claimed: int
+    matched: int
+    unmatched: int
+    failed: int
+    retrying: int
+
+
+def handles(source: WebhookSource, *event_types: str):
+    """
+    Register a handler for event types of a source.
+
+    The handler is called as ``handler(session, event, payload)`` with
+    `event.customer_id` already set (or None). It runs in a savepoint; an
+    exception rolls its changes back and the event is retried.
+    """
+    def decorator(handler: Handler) -> Handler:
+        for event_type in event_types:
+            HANDLERS[(source, event_type)] = handler
+        return handler
+    return decorator
+
+
+# Validation
+
+def _parse_json(body: bytes) -> Dict[str, Any]:
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise WebhookError("Body is not JSON")
+    if not isinstance(payload, dict):
+        raise WebhookError("Body is not a JSON object")
+    return payload
+
+
+def verify_stripe_signature(body: bytes, header: str, secret: str, tolerance: float = 300,
+                            now: Optional[float] = None) -> None:
+    """
+    Check a ``Stripe-Signature`` header.
+
+    Args:
+        body: Raw request body
+        header: Header value, e.g. ``t=1700000000,v1=5257a8...``
+        secret: Endpoint signing secret
+        tolerance: Seconds a signature timestamp stays valid
+        now: Current Unix time (for tests)
+
+    Raises:
+        WebhookError: If the signature is missing, stale or wrong
+    """
+    parts = [item.split('=', 1) for item in (header or '').split(',') if '=' in item]
+    timestamps = [value for key, value in parts if key == 't']
+    signatures = [value for key, value in parts if key == 'v1']
+    if not timestamps or not signatures or not timestamps[0].isdigit():
+        raise WebhookError("Missing Stripe signature", 401)
+    if abs((now or time.time()) - int(timestamps[0])) > tolerance:
+        raise WebhookError("Stale Stripe signature", 401)
+    expected = hmac.new(secret.encode(), f"{timestamps[0]}.".encode() + body, hashlib.sha256).hexdigest()
+    if not any(hmac.compare_digest(expected, signature) for signature in signatures):
+        raise WebhookError("Bad Stripe signature", 401)
+
+
+def parse_stripe(body: bytes, headers, settings: dict) -> Delivery:
+    secret = settings.get('stripe', {}).get('secret')
+    if not secret:
+        raise WebhookError("Stripe webhooks are not configured", 503)
+    verify_stripe_signature(body, headers.get('Stripe-Signature'), secret,
+                            settings.get('stripe', {}).get('tolerance', 300))
+    payload = _parse_json(body)
+    if not payload.get('id'):
+        raise WebhookError("Stripe event has no id")
+    return Delivery(str(payload['id']), payload.get('type'))
+
+
+def parse_gravity_forms(body: bytes, headers, settings: dict) -> Delivery:
+    config = settings.get('gravity_forms', {})
+    token = config.get('token')
+    if not token:
+        raise WebhookError("Gravity Forms webhooks are not configured", 503)
+    # The Webhooks add-on sends fixed headers, not a body signature
+    if not hmac.compare_digest(headers.get(config.get('token_header', 'X-Crowbank-Token'), ''), token):
+        raise WebhookError("Bad Gravity Forms token", 401)
+    payload = _parse_json(body)
+    if not payload.get('id') or not payload.get('form_id'):
+        raise WebhookError("Gravity Forms entry has no id or form_id")
+    return Delivery(f"{payload['form_id']}:{payload['id']}", f"form_{payload['form_id']}")
+
+
+PARSERS = {
+    WebhookSource.STRIPE: parse_stripe,
+    WebhookSource.GRAVITY_FORMS: parse_gravity_forms,
+}
+
+
+def ingest(session, source: WebhookSource, body: bytes, headers, settings: dict) -> Tuple[int, bool]:
+    """
+    Validate a delivery and queue it, once.
+
+    The caller commits.
+
+    Args:
+        session: SQLAlchemy session
+        source: Sender
+        body: Raw request body
+        headers: Request headers
+        settings: ``webhooks`` config section
+
+    Returns:
+        (event id, whether it was new)
+
+    Raises:
+        WebhookError: If the delivery is rejected
+    """
+    delivery = PARSERS[source](body, headers, settings)
+    event = WebhookEvent(source=source, idempotency_key=delivery.idempotency_key,
+                         event_type=delivery.event_type, payload=body.decode('utf-8', 'replace'))
+    try:
+        with session.begin_nested():
+            session.add(event)
+    except IntegrityError:
+        existing = session.scalar(select(WebhookEvent.id).where(
+            WebhookEvent.source == source, WebhookEvent.idempotency_key == delivery.idempotency_key))
+        return existing, False
+    return event.id, True
+
+
+def _receive(session, source: str):
+    try:
+        source = WebhookSource(source)
+    except ValueError:
+        abort(404)
+    settings = current_app.config['CONFIG'].get('webhooks', {})
+    if (request.content_length or 0) > settings.get('max_payload_bytes', 1048576):
+        abort(413)
+    try:
+        event_id, created = ingest(session, source, request.get_data(), request.headers, settings)
+    except WebhookError as e:
+        logger.warning(f"Rejected {source.value} webhook: {e}")
+        return jsonify(error=str(e)), e.status
+    session.commit()
+    return jsonify(id=event_id, duplicate=not created), 202
+
+
+def init_webhooks(app, db) -> None:
+    """
+    Serve the webhook endpoint at ``/webhooks/<source>``.
+
+    Args:
+        app: Flask application
+        db: Flask-SQLAlchemy extension instance
+    """
+    def receive_webhook(source):
+        return _receive(db.session, source)
+
+    app.add_url_rule('/webhooks/<source>', 'receive_webhook', receive_webhook, methods=['POST'])
+
+
+# Processing
+
+def _find(data: Any, *path: str) -> Any:
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def _legacy_number(value: Any) -> Optional[int]:
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def extract_identity(event: WebhookEvent, payload: Dict[str, Any],
+                     settings: dict) -> Tuple[Optional[str], Optional[int]]:
+    """
+    The customer email and legacy customer number a payload carries.
+
+    Gravity Forms fields are found through ``webhooks.gravity_forms.forms``
+    (form id to field ids); forms not listed there are searched for the
+    first value that looks like an email address.
+
+    Returns:
+        (lower-cased email or None, legacy customer number or None)
+    """
+    email = legacy = None
+    if event.source == WebhookSource.STRIPE:
+        obj = _find(payload, 'data', 'object') or {}
+        email = (obj.get('customer_email') or obj.get('receipt_email') or obj.get('email')
+                 or _find(obj, 'billing_details', 'email') or _find(obj, 'customer_details', 'email'))
+        legacy = _find(obj, 'metadata', 'legacy_cust_no')
+    else:
+        fields = settings.get('gravity_forms', {}).get('forms', {}).get(str(payload.get('form_id')), {})
+        if 'email' in fields:
+            email = payload.get(str(fields['email']))
+        else:
+            email = next((v for k, v in payload.items()
+                          if k[:1].isdigit() and isinstance(v, str) and EMAIL.match(v.strip())), None)
+        legacy = payload.get(str(fields['legacy_cust_no'])) if 'legacy_cust_no' in fields else None
+
+    email = email.strip().lower() if isinstance(email, str) and EMAIL.match(email.strip()) else None
+    return email, _legacy_number(legacy)
+
+
+def match_customers(session, identities: Iterable[Tuple[Optional[str], Optional[int]]]
+                    ) -> Tuple[Dict[int, int], Dict[str, int]]:
+    """
+    Look up customers for a batch of identities, in one query per key.
+
+    Args:
+        session: SQLAlchemy session
+        identities: (email, legacy customer number) pairs
+
+    Returns:
+        (customer id by legacy number, customer id by lower-cased email)
+    """
+    identities = list(identities)
+    numbers = {number for _, number in identities if number is not None}
+    emails = {email for email, _ in identities if email}
+
+    by_number = {}
+    if numbers:
+        by_number = dict(session.execute(
+            select(Customer.legacy_cust_no, Customer.id).where(Customer.legacy_cust_no.in_(numbers))).all())
+
+    by_email = {}
+    if emails:
+        rows = session.execute(
+            select(func.lower(Contact.email_address), CustomerContact.customer_id, CustomerContact.role)
+            .join(CustomerContact, CustomerContact.contact_id == Contact.id)
+            .where(func.lower(Contact.email_address).in_(emails))
+            .order_by(CustomerContact.customer_id)
+        )
+        # A primary contact's household wins over one they are only an emergency contact for
+        rank = {ContactRole.PRIMARY: 0, ContactRole.SECONDARY: 1, ContactRole.EMERGENCY: 2}
+        best = {}
+        for email, customer_id, role in rows:
+            if email not in best or rank[role] < best[email][0]:
+                best[email] = (rank[role], customer_id)
+        by_email = {email: customer_id for email, (_, customer_id) in best.items()}
+    return by_number, by_email
+
+
+def retry_delay(settings: dict, attempts: int) -> timedelta:
+    """Wait before retrying an event that has failed `attempts` times."""
+    seconds = settings.get('retry_delay', 60) * 2 ** (attempts - 1)
+    return timedelta(seconds=min(seconds, settings.get('max_retry_delay', 3600)))
+
+
+def process_batch(session, settings: dict, batch_size: Optional[int] = None,
+                  now: Optional[datetime] = None) -> BatchSummary:
+    """
+    Claim and process one batch of pending events.
+
+    Events are claimed with ``FOR UPDATE SKIP LOCKED``, so several workers
+    can run side by side. An event whose handler failed is not claimed
+    again until its backoff has passed. The caller commits (which
+    releases the batch).
+
+    Args:
+        session: SQLAlchemy session
+        settings: ``webhooks`` config section
+        batch_size: Events per batch (default ``webhooks.batch_size``)
+        now: Current time (for tests)
+
+    Returns:
+        Counts for the batch
+    """
+    batch_size = batch_size or settings.get('batch_size', 500)
+    max_attempts = settings.get('max_attempts', 5)
+    now = now or datetime.now(timezone.utc)
+    events = session.scalars(
+        select(WebhookEvent)
+        .where(WebhookEvent.status == WebhookStatus.PENDING,
+               or_(WebhookEvent.next_attempt_at.is_(None), WebhookEvent.next_attempt_at <= now))
+        .order_by(WebhookEvent.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+
+    payloads = {}
+    identities = {}
+    for event in events:
+        try:
+            payloads[event.id] = json.loads(event.payload)
+            identities[event.id] = extract_identity(event, payloads[event.id], settings)
+        except (ValueError, AttributeError) as e:
+            payloads[event.id] = None
+            event.error = f"Unreadable payload: {e}"
+    by_number, by_email = match_customers(session, identities.values())
+
+    counts = dict.fromkeys(('matched', 'unmatched', 'failed', 'retrying'), 0)
+    for event in events:
+        event.attempts += 1
+        payload = payloads[event.id]
+        if payload is None:
+            event.status = WebhookStatus.FAILED
+            counts['failed'] += 1
+            continue
+        email, number = identities[event.id]
+        event.customer_id = by_number.get(number) or by_email.get(email)
+
+        handler = HANDLERS.get((event.source, event.event_type))
+        try:
+            if handler is not None:
+                with session.begin_nested():
+                    handler(session, event, payload)
+        except Exception as e:
+            logger.exception(f"Webhook event {event.id} failed (attempt {event.attempts})")
+            event.error = f"{type(e).__name__}: {e}"
+            if event.attempts >= max_attempts:
+                event.status = WebhookStatus.FAILED
+                counts['failed'] += 1
+            else:
+                event.next_attempt_at = now + retry_delay(settings, event.attempts)
+                counts['retrying'] += 1
+            continue
+
+        event.error = None
+        event.next_attempt_at = None
+        event.processed_at = now
+        event.status = WebhookStatus.PROCESSED if event.customer_id else WebhookStatus.UNMATCHED
+        counts['matched' if event.customer_id else 'unmatched'] += 1
+
+    session.flush()
+    if events:
+        logger.info(f"Processed {len(events)} webhook events: {counts}")
+    return BatchSummary(len(events), **counts)
+
+
+def process_pending(session, settings: dict, batch_size: Optional[int] = None) -> List[BatchSummary]:
+    """
+    Process batches until no event is due, committing after each.
+
+    Events waiting out a retry backoff are left for a later run.
+
+    Returns:
+        Summary of each batch
+    """
+    summaries = []
+    while True:
+        summary = process_batch(session, settings, batch_size)
+        session.commit()
+        if not summary.claimed:
+            break
+        summaries.append(summary)
+    return summaries
+
+
+def replay(session, ids: Iterable[int] = (), source: Optional[WebhookSource] = None,
+           since: Optional[datetime] = None,
+           statuses: Iterable[WebhookStatus] = (WebhookStatus.FAILED, WebhookStatus.UNMATCHED)) -> int:
+    """
+    Put events back on the queue.
+
+    The caller commits.
+
+    Args:
+        session: SQLAlchemy session
+        ids: Only these events (any status)
+        source: Only events from this sender
+        since: Only events received since then
+        statuses: Statuses replayed when no ids are given
+
+    Returns:
+        Number of events queued again
+    """
+    ids = list(ids)
+    query = update(WebhookEvent).values(status=WebhookStatus.PENDING, attempts=0, error=None, processed_at=None,
+                                         next_attempt_at=None)
+    if ids:
+        query = query.where(WebhookEvent.id.in_(ids))
+    else:
+        query = query.where(WebhookEvent.status.in_(list(statuses)))
+    if source is not None:
+        query = query.where(WebhookEvent.source == source)
+    if since is not None:
+        query = query.where(WebhookEvent.created_at >= since)
+    count = session.execute(query.execution_options(synchronize_session=False)).rowcount
+    logger.info(f"Queued {count} webhook events for replay")
+    return count
@@ -0,0 +1,245 @@
+"""
+Static asset and template build helpers for the Crowbank Intranet.
+
+`build_assets` copies every file in the static folder to a build folder
+under a content-hashed name (``css/app.css`` -> ``css/app.3f2a1b9c04de.css``),
+writes gzip and brotli variants of text assets next to it, and records
+the mapping in ``manifest.json``. Templates reference assets through the
+``asset_url()`` helper; hashed files are served from ``/assets/`` with
+long-lived immutable cache headers and the best pre-compressed variant
+the client accepts.
+
+`compile_templates` compiles every template into Jinja's filesystem
+bytecode cache so workers skip parsing on first render.
+
+Both run from ``flask build-assets`` or, if ``assets.build_on_startup``
+is set, when the app starts.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import tempfile
+from typing import Dict
+
+from flask import current_app, request, send_from_directory, url_for
+from jinja2 import FileSystemBytecodeCache
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+
+# Only text formats benefit from compression; images are already compressed
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.xml'}
+
+# Pre-compressed variants in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    """Write a file so concurrent readers never see it half-written."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def build_assets(static_folder: str, build_folder: str, compress: bool = True) -> Dict[str, str]:
+    """
+    Fingerprint and pre-compress the static files.
+
+    Unchanged files keep their hashed name, so rebuilding is cheap and
+    old names stay valid for clients mid-deploy.
+
+    Args:
+        static_folder: Source static folder
+        build_folder: Output folder (skipped if inside the static folder)
+        compress: Whether to write gzip/brotli variants
+
+    Returns:
+        Manifest mapping original to hashed relative paths
+    """
+    manifest: Dict[str, str] = {}
+    build_root = os.path.abspath(build_folder)
+
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != build_root]
+        for name in files:
+            source = os.path.join(root, name)
+            relative = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as handle:
+                data = handle.read()
+
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            stem, ext = os.path.splitext(relative)
+            hashed = f"{stem}.{digest}{ext}"
+            manifest[relative] = hashed
+
+            target = os.path.join(build_folder, hashed)
+            if os.path.exists(target):
+                continue
+            _atomic_write(target, data)
+
+            if compress and ext.lower() in COMPRESSIBLE_EXTENSIONS:
+                variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+                if brotli is not None:
+                    variants['.br'] = brotli.compress(data, quality=11)
+                for suffix, compressed in variants.items():
+                    if len(compressed) < len(data):
+                        _atomic_write(target + suffix, compressed)
+
+    _atomic_write(
+        os.path.join(build_folder, MANIFEST_NAME),
+        json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'),
+    )
+    logger.info(f"Built {len(manifest)} static assets into {build_folder}")
+    return manifest
+
+
+def load_manifest(build_folder: str) -> Dict[str, str]:
+    """
+    Load the asset manifest written by `build_assets`.
+
+    Args:
+        build_folder: Build output folder
+
+    Returns:
+        Manifest mapping, empty if assets have not been built
+    """
+    try:
+        with open(os.path.join(build_folder, MANIFEST_NAME), 'r') as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return {}
+
+
+def compile_templates(app) -> int:
+    """
+    Compile all templates into the bytecode cache.
+
+    Args:
+        app: Flask application
+
+    Returns:
+        Number of templates compiled
+    """
+    count = 0
+    for name in app.jinja_env.list_templates(extensions=['html', 'txt', 'xml']):
+        app.jinja_env.get_template(name)
+        count += 1
+    logger.info(f"Compiled {count} templates")
+    return count
+
+
+def asset_url(path: str) -> str:
+    """
+    Get the URL of a static asset, fingerprinted when assets are built.
+
+    Args:
+        path: Path relative to the static folder
+
+    Returns:
+        URL of the hashed asset, or the plain static URL
+    """
+    manifest = current_app.extensions.get('asset_manifest')
+    if manifest and path in manifest:
+        return url_for('assets', filename=manifest[path])
+    return url_for('static', filename=path)
+
+
+def send_asset(filename: str):
+    """
+    Serve a fingerprinted asset with immutable caching.
+
+    Picks a pre-compressed variant when the client accepts it.
+
+    Args:
+        filename: Hashed path relative to the build folder
+
+    Returns:
+        File response
+    """
+    settings = current_app.extensions['asset_settings']
+    build_folder = settings['build_folder']
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    response = None
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] and os.path.exists(os.path.join(build_folder, filename + suffix)):
+            response = send_from_directory(build_folder, filename + suffix,
+                                           mimetype=mimetype, max_age=settings['max_age'])
+            response.headers['Content-Encoding'] = encoding
+            break
+    if response is None:
+        response = send_from_directory(build_folder, filename, mimetype=mimetype,
+                                       max_age=settings['max_age'])
+
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_assets(app) -> None:
+    """
+    Configure the template bytecode cache and fingerprinted assets.
+
+    Args:
+        app: Flask application
+    """
+    config = app.config.get('CONFIG', {}).get('assets', {})
+
+    if config.get('bytecode_cache', True):
+        cache_dir = os.path.join(app.instance_path, config.get('bytecode_cache_folder', 'jinja_cache'))
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+    build_folder = os.path.join(app.instance_path, config.get('build_folder', 'assets'))
+    app.extensions['asset_settings'] = {
+        'build_folder': build_folder,
+        'max_age': config.get('max_age', 31536000),
+    }
+    app.add_url_rule('/assets/<path:filename>', endpoint='assets', view_func=send_asset)
+    app.jinja_env.globals['asset_url'] = asset_url
+
+    if not config.get('fingerprint', True):
+        return
+
+    if config.get('build_on_startup', False):
+        build_assets(app.static_folder, build_folder, compress=config.get('compress', True))
+        compile_templates(app)
+    app.extensions['asset_manifest'] = load_manifest(build_folder)
+
+
+def build_all(app) -> Dict[str, str]:
+    """
+    Build assets and compile templates for an app (the `build-assets` command).
+
+    Args:
+        app: Flask application
+
+    Returns:
+        The new asset manifest
+    """
+    config = app.config.get('CONFIG', {}).get('assets', {})
+    settings = app.extensions['asset_settings']
+    manifest = build_assets(app.static_folder, settings['build_folder'],
+                            compress=config.get('compress', True))
+    app.extensions['asset_manifest'] = manifest
+    with app.app_context():
+        compile_templates(app)
+    return manifest
@@ -0,0 +1,387 @@
+"""
+Live change notifications for the Crowbank Intranet.
+
+Dashboard cards (arrivals, departures, check-ins, customer flags) update
+from a push channel instead of every open browser polling the database:
+
+1. When a flush touches a watched table (``change_feed.watch``), a
+   compact JSON payload per changed row, e.g.
+   ``{"t": "bookings", "id": 12, "op": "u", "c": ["status"]}``, is sent
+   with ``pg_notify`` inside the same transaction. Postgres delivers it
+   only if the transaction commits, and drops duplicates.
+2. One `ChangeListener` thread per app process holds a dedicated
+   ``LISTEN`` connection and hands each notification to the `ChangeHub`.
+3. The hub fans events out to the ``/events`` server-sent events stream
+   of every connected browser. The event name is the table, so an HTMX
+   fragment can refetch on e.g. ``hx-trigger="sse:bookings"`` only.
+
+The listener starts with the first subscriber, so CLI commands and
+workers that serve no dashboards never open a listening connection.
+Other databases (SQLite in development and tests) publish to the local
+hub on commit instead.
+"""
+
+import json
+import logging
+import queue
+import secrets
+import select
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from flask import Response, current_app, request
+from flask_login import login_required
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHANNEL = 'crowbank_changes'
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7999
+
+ChangeEvent = Dict[str, Any]
+
+# Event ids are (hub epoch << EPOCH_SHIFT) + sequence number
+EPOCH_SHIFT = 32
+
+
+class ChangeHub:
+    """
+    Fans change events out to subscribers.
+
+    Each subscriber has a bounded queue. A subscriber that falls behind
+    has its queue replaced by a single ``resync`` event, telling the
+    browser to refresh everything rather than see a partial history.
+    Recent events are kept so a reconnecting browser (``Last-Event-ID``)
+    gets what it missed. Event ids carry a random per-hub epoch in their
+    high bits: an id from another worker, or from before a restart, says
+    nothing about what this hub has sent, so it gets a resync.
+
+    Args:
+        queue_size: Events buffered per subscriber
+        history: Recent events kept for reconnecting subscribers
+    """
+
+    def __init__(self, queue_size: int = 100, history: int = 256):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers: Set[queue.Queue] = set()
+        self._history: deque = deque(maxlen=history)
+        self.epoch = secrets.randbits(31)
+        self._last_id = self.epoch << EPOCH_SHIFT
+
+    def publish(self, change: ChangeEvent) -> int:
+        """
+        Send an event to every subscriber.
+
+        Args:
+            change: Event payload
+
+        Returns:
+            Event id
+        """
+        with self._lock:
+            self._last_id += 1
+            item = (self._last_id, change)
+            self._history.append(item)
+            for subscriber in self._subscribers:
+                try:
+                    subscriber.put_nowait(item)
+                except queue.Full:
+                    self._resync(subscriber)
+            return self._last_id
+
+    def _resync(self, subscriber: queue.Queue) -> None:
+        while True:
+            try:
+                subscriber.get_nowait()
+            except queue.Empty:
+                break
+        subscriber.put_nowait((self._last_id, {'t': 'resync'}))
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> queue.Queue:
+        """
+        Register a subscriber, replaying events after `last_event_id`.
+
+        Args:
+            last_event_id: Last event the subscriber saw, if reconnecting
+
+        Returns:
+            The subscriber's queue of (event id, event)
+        """
+        subscriber = queue.Queue(self.queue_size)
+        with self._lock:
+            if last_event_id is not None and (last_event_id >> EPOCH_SHIFT != self.epoch
+                                              or last_event_id > self._last_id):
+                self._resync(subscriber)
+            elif last_event_id is not None:
+                missed = [item for item in self._history if item[0] > last_event_id]
+                oldest = self._history[0][0] if self._history else self._last_id + 1
+                if last_event_id < oldest - 1 or len(missed) > self.queue_size:
+                    self._resync(subscriber)
+                else:
+                    for item in missed:
+                        subscriber.put_nowait(item)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+class ChangeFeed:
+    """
+    Which changes are published, and where.
+
+    Configured by `init_change_feed`; until then nothing is published.
+    """
+
+    def __init__(self):
+        self.channel = DEFAULT_CHANNEL
+        # Table name -> columns whose changes are published (empty: any column)
+        self.watch: Dict[str, Tuple[str, ...]] = {}
+        self.hub = ChangeHub()
+
+    def configure(self, watch: Dict[str, Iterable[str]], channel: str = DEFAULT_CHANNEL,
+                  queue_size: int = 100) -> None:
+        self.watch = {table: tuple(columns or ()) for table, columns in watch.items()}
+        self.channel = channel
+        self.hub = ChangeHub(queue_size)
+
+    def changes(self, session) -> List[ChangeEvent]:
+        """Events for the watched rows in a flush, for use in `after_flush`."""
+        events = []
+        for op, objects in (('i', session.new), ('u', session.dirty), ('d', session.deleted)):
+            for obj in objects:
+                table = getattr(obj, '__tablename__', None)
+                if table not in self.watch:
+                    continue
+                state = inspect(obj)
+                if op == 'u':
+                    columns = self.watch[table] or [attr.key for attr in state.mapper.column_attrs]
+                    changed = [c for c in columns if state.attrs[c].history.has_changes()]
+                    if not changed:
+                        continue
+                    events.append({'t': table, 'id': _identity(obj, state), 'op': op, 'c': changed})
+                else:
+                    events.append({'t': table, 'id': _identity(obj, state), 'op': op})
+        return events
+
+
+def _identity(obj, state):
+    # New rows get their identity key only after the flush completes
+    identity = state.mapper.primary_key_from_instance(obj)
+    return identity[0] if len(identity) == 1 else identity
+
+
+def encode(change: ChangeEvent) -> str:
+    """Compact JSON payload, dropping the changed columns if it would not fit."""
+    payload = json.dumps(change, separators=(',', ':'), default=str)
+    if len(payload.encode()) > MAX_PAYLOAD_BYTES:
+        payload = json.dumps({k: v for k, v in change.items() if k != 'c'}, separators=(',', ':'), default=str)
+    return payload
+
+
+feed = ChangeFeed()
+
+
+@event.listens_for(Session, 'after_flush')
+def _notify_changes(session, flush_context):
+    """Queue NOTIFYs for watched rows in the flushing transaction."""
+    if not feed.watch:
+        return
+    changes = feed.changes(session)
+    if not changes:
+        return
+    connection = session.connection()
+    if connection.dialect.name == 'postgresql':
+        connection.execute(
+            text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+            {'channel': feed.channel, 'payloads': [encode(change) for change in changes]},
+        )
+    else:
+        session.info.setdefault('_change_events', []).extend(changes)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_local_changes(session):
+    for change in session.info.pop('_change_events', ()):
+        feed.hub.publish(change)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_local_changes(session):
+    session.info.pop('_change_events', None)
+
+
+class ChangeListener:
+    """
+    Thread holding the process's ``LISTEN`` connection.
+
+    Reconnects with backoff if the connection drops; subscribers are sent
+    a ``resync`` event afterwards, since notifications sent while
+    disconnected are lost.
+
+    Args:
+        engine: Engine on the primary database
+        channel: Channel to listen on
+        hub: Hub receiving the notifications
+        poll_interval: Seconds between checks for a stop request
+    """
+
+    def __init__(self, engine, channel: str, hub: ChangeHub, poll_interval: float = 5.0):
+        self.engine = engine
+        self.channel = channel
+        self.hub = hub
+        self.poll_interval = poll_interval
+        self.listening = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start listening, if not already."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='change-listener', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        backoff = 1.0
+        reconnecting = False
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = self.engine.raw_connection()
+                driver = connection.driver_connection
+                driver.autocommit = True
+                with driver.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                logger.info(f"Listening for changes on {self.channel}")
+                self.listening.set()
+                if reconnecting:
+                    self.hub.publish({'t': 'resync'})
+                backoff = 1.0
+                self._listen(driver)
+            except Exception:
+                logger.exception(f"Change listener failed, reconnecting in {backoff:.0f}s")
+                reconnecting = True
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 60)
+            finally:
+                self.listening.clear()
+                if connection is not None:
+                    try:
+                        connection.invalidate()
+                    except Exception:
+                        pass
+
+    def _listen(self, driver) -> None:
+        while not self._stop.is_set():
+            if select.select([driver], [], [], self.poll_interval) == ([], [], []):
+                continue
+            driver.poll()
+            while driver.notifies:
+                notification = driver.notifies.pop(0)
+                try:
+                    self.hub.publish(json.loads(notification.payload))
+                except ValueError:
+                    logger.warning(f"Ignoring malformed change payload: {notification.payload[:100]}")
+
+
+def _last_event_id() -> Optional[int]:
+    value = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def event_stream(hub: ChangeHub, tables: Optional[Set[str]] = None, keepalive: float = 15.0,
+                 last_event_id: Optional[int] = None, retry: float = 2.0) -> Iterator[str]:
+    """
+    Server-sent events for the hub's changes.
+
+    Args:
+        hub: Hub to subscribe to
+        tables: Only events for these tables (resyncs always pass)
+        keepalive: Seconds between comment lines keeping proxies from timing out
+        last_event_id: Last event the browser saw, if reconnecting
+        retry: Seconds the browser waits before reconnecting a dropped stream
+
+    Yields:
+        SSE messages
+    """
+    subscriber = hub.subscribe(last_event_id)
+    try:
+        yield f"retry: {int(retry * 1000)}\n\n"
+        while True:
+            try:
+                event_id, change = subscriber.get(timeout=keepalive)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            table = change.get('t')
+            if tables and table != 'resync' and table not in tables:
+                continue
+            yield f"id: {event_id}\nevent: {table}\ndata: {encode(change)}\n\n"
+    finally:
+        hub.unsubscribe(subscriber)
+
+
+@login_required
+def stream_changes():
+    """
+    SSE endpoint; ``?tables=bookings,customers`` limits the events sent.
+
+    The stream needs neither the request nor the database, so the request
+    ends (returning the session's connection to the pool) before it starts
+    rather than lasting as long as the browser stays connected.
+    """
+    state = current_app.extensions['change_feed']
+    if state['listener'] is not None:
+        state['listener'].start()
+    tables = {t for t in request.args.get('tables', '').split(',') if t} or None
+    stream = event_stream(feed.hub, tables, state['keepalive'], _last_event_id(), state['retry'])
+    current_app.extensions['sqlalchemy'].session.remove()  # Loaded the user for login_required
+    return Response(stream, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def init_change_feed(app, db) -> None:
+    """
+    Publish watched model changes and serve them at ``/events``.
+
+    Args:
+        app: Flask application
+        db: Flask-SQLAlchemy extension instance
+    """
+    config = app.config.get('CONFIG', {}).get('change_feed', {})
+    if not config.get('enabled', True):
+        return
+    feed.configure(config.get('watch', {}), config.get('channel', DEFAULT_CHANNEL),
+                   config.get('client_queue_size', 100))
+
+    with app.app_context():
+        engine = db.engine
+    listener = None
+    if engine.dialect.name == 'postgresql':
+        listener = ChangeListener(engine, feed.channel, feed.hub)
+    app.extensions['change_feed'] = {'listener': listener, 'keepalive': config.get('keepalive', 15),
+                                     'retry': config.get('retry', 2)}
+    app.add_url_rule('/events', 'stream_changes', stream_changes)
@@ -0,0 +1,238 @@
+"""
+Read-replica routing for the Crowbank Intranet.
+
+Units of work that only read (reports, exports, search) can be declared
+read-only with the `read_only` context manager or `read_only_session`
+decorator. While one is active, sessions built on `RoutingSessionMixin`
+send queries to the replica engine; flushes and everything outside a
+read-only block go to the primary.
+
+A `ReplicaMonitor` checks replication lag at most once per interval and
+routes back to the primary when the replica is unreachable or behind.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Iterator, Optional, TypeVar
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session as SASession
+from flask import current_app
+from flask_sqlalchemy.session import Session as FlaskSession
+
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+# Whether the current context has declared a read-only unit of work
+_read_only: ContextVar[bool] = ContextVar('crowbank_read_only', default=False)
+
+# Seconds the replica is behind the primary; 0 when it has replayed all WAL
+REPLICA_LAG_SQL = text(
+    "SELECT CASE "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+    "END"
+)
+
+
+def is_read_only() -> bool:
+    """
+    Check whether the current context is a declared read-only unit of work.
+
+    Returns:
+        True inside a `read_only` block or `read_only_session` function
+    """
+    return _read_only.get()
+
+
+@contextmanager
+def read_only() -> Iterator[None]:
+    """
+    Route queries issued inside the block to the read replica.
+
+    Nested blocks are allowed; the outer state is restored on exit.
+    """
+    token = _read_only.set(True)
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
+
+
+@contextmanager
+def on_primary() -> Iterator[None]:
+    """
+    Route queries issued inside the block to the primary, even within a
+    read-only unit of work (e.g. for state a replica does not share).
+    """
+    token = _read_only.set(False)
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
+
+
+def read_only_session(func: F) -> F:
+    """
+    Decorator declaring a function as a read-only unit of work.
+
+    Args:
+        func: Function whose queries may be served by the replica
+
+    Returns:
+        Wrapped function
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with read_only():
+            return func(*args, **kwargs)
+    return wrapper  # type: ignore[return-value]
+
+
+class ReplicaMonitor:
+    """
+    Tracks whether a replica engine is healthy enough to serve reads.
+
+    The lag check runs at most once per `check_interval` seconds and the
+    result is shared by all sessions, so routing adds no query per request.
+    """
+
+    def __init__(self, engine: Engine, max_lag_seconds: float = 5.0,
+                 check_interval: float = 2.0):
+        self.engine = engine
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked_at: Optional[float] = None
+        self._usable = False
+        self.last_lag: Optional[float] = None
+
+    def measure_lag(self) -> Optional[float]:
+        """
+        Query the replica for its replication lag.
+
+        Returns:
+            Lag in seconds, or None if the replica could not be reached
+        """
+        try:
+            with self.engine.connect() as connection:
+                return float(connection.execute(REPLICA_LAG_SQL).scalar() or 0)
+        except Exception as e:
+            logger.warning(f"Replica lag check failed: {e}")
+            return None
+
+    def is_usable(self) -> bool:
+        """
+        Check whether reads may currently be sent to the replica.
+
+        Returns:
+            True if the replica answered its last check within the lag limit
+        """
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return self._usable
+
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._checked_at is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return self._usable
+
+            lag = self.measure_lag()
+            self.last_lag = lag
+            usable = lag is not None and lag <= self.max_lag_seconds
+            if self._usable and not usable:
+                logger.warning(f"Replica unavailable or lagging ({lag}s); reading from primary")
+            self._usable = usable
+            self._checked_at = time.monotonic()
+            return usable
+
+
+class RoutingSessionMixin:
+    """
+    Session mixin that sends read-only units of work to the replica.
+
+    Subclasses provide `_replica_monitor()`; when it returns None routing
+    is disabled and every query goes to the primary.
+    """
+
+    def _replica_monitor(self) -> Optional[ReplicaMonitor]:
+        raise NotImplementedError
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if kwargs.get('bind') is None and is_read_only() and not self._flushing:
+            monitor = self._replica_monitor()
+            if monitor is not None and monitor.is_usable():
+                return monitor.engine
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+
+class RoutingSession(RoutingSessionMixin, SASession):
+    """
+    Plain SQLAlchemy session with replica routing.
+
+    The monitor is passed through the session's `info` dictionary, e.g.
+    ``sessionmaker(class_=RoutingSession, info={'replica_monitor': monitor})``.
+    """
+
+    def _replica_monitor(self) -> Optional[ReplicaMonitor]:
+        return self.info.get('replica_monitor')
+
+
+class FlaskRoutingSession(RoutingSessionMixin, FlaskSession):
+    """
+    Flask-SQLAlchemy session with replica routing.
+
+    Uses the monitor registered on the current app by `register_replica_monitor`.
+    """
+
+    def _replica_monitor(self) -> Optional[ReplicaMonitor]:
+        return current_app.extensions.get('replica_monitor')
+
+
+def configure_replica_bind(app) -> bool:
+    """
+    Add the replica engine to the app's SQLAlchemy binds.
+
+    Must run before `db.init_app` so the replica engine is created
+    alongside the primary.
+
+    Args:
+        app: Flask application
+
+    Returns:
+        True if a replica is configured
+    """
+    uri = app.config.get('SQLALCHEMY_REPLICA_URI')
+    if not uri:
+        return False
+
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    binds['replica'] = uri
+    app.config['SQLALCHEMY_BINDS'] = binds
+    return True
+
+
+def register_replica_monitor(app, db) -> None:
+    """
+    Register the lag monitor for the app's replica bind.
+
+    Args:
+        app: Flask application, after `db.init_app`
+        db: Flask-SQLAlchemy extension instance
+    """
+    replica_config = app.config.get('CONFIG', {}).get('database', {}).get('replica', {})
+    with app.app_context():
+        engine = db.engines['replica']
+
+    app.extensions['replica_monitor'] = ReplicaMonitor(
+        engine,
+        max_lag_seconds=replica_config.get('max_lag_seconds', 5),
+        check_interval=replica_config.get('check_interval', 2),
+    )
@@ -0,0 +1,136 @@
+"""
+HTMX rendering helpers for the Crowbank Intranet.
+
+Routes render through `render_htmx`. A normal request gets the full page.
+An HTMX request (``HX-Request: true``) gets only the block being swapped:
+the block named by ``HX-Target`` (element id, dashes as underscores) if
+the template defines one, otherwise ``content``.
+
+When the route passes a data `version` (e.g. from
+`app.services.reports.tables_version`), the response carries a weak ETag
+and a conditional GET returns 304 without rendering anything.
+"""
+
+import hashlib
+from typing import Any, Optional
+
+from flask import Response, current_app, make_response, render_template, request
+
+
+DEFAULT_BLOCK = 'content'
+
+
+def is_htmx_request() -> bool:
+    """
+    Check whether the current request was issued by HTMX.
+
+    Returns:
+        True for HTMX requests (excluding history restores, which need the full page)
+    """
+    return (request.headers.get('HX-Request') == 'true'
+            and request.headers.get('HX-History-Restore-Request') != 'true')
+
+
+def target_block(template_name: str) -> str:
+    """
+    Get the template block matching the request's HX-Target element.
+
+    Args:
+        template_name: Template the route renders
+
+    Returns:
+        Block name, or the default content block
+    """
+    target = request.headers.get('HX-Target')
+    if target:
+        block = target.replace('-', '_')
+        template = current_app.jinja_env.get_template(template_name)
+        if block in template.blocks:
+            return block
+    return DEFAULT_BLOCK
+
+
+def render_block(template_name: str, block_name: str, **context: Any) -> str:
+    """
+    Render a single block of a template, without its layout.
+
+    Args:
+        template_name: Template defining the block
+        block_name: Name of the block to render
+        **context: Template variables
+
+    Returns:
+        Rendered block HTML
+    """
+    app = current_app._get_current_object()
+    template = app.jinja_env.get_template(template_name)
+    if block_name not in template.blocks:
+        raise KeyError(f"Template {template_name} has no block '{block_name}'")
+
+    app.update_template_context(context)
+    block = template.blocks[block_name]
+    return ''.join(block(template.new_context(context)))
+
+
+def make_etag(template_name: str, block_name: Optional[str], version: Any) -> str:
+    """
+    Build an ETag value for a rendered page or fragment.
+
+    The application version is included so a deploy with changed
+    templates invalidates what clients hold.
+
+    Args:
+        template_name: Template rendered
+        block_name: Block rendered, or None for the full page
+        version: Data version of what the page shows
+
+    Returns:
+        ETag value (without the weak prefix or quotes)
+    """
+    app_version = current_app.config.get('CONFIG', {}).get('app', {}).get('version', '')
+    key = f"{app_version}:{template_name}:{block_name or ''}:{version}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+
+
+def render_htmx(template_name: str, block: Optional[str] = None,
+                version: Optional[Any] = None, **context: Any) -> Response:
+    """
+    Render a full page, or only the swapped block for HTMX requests.
+
+    Args:
+        template_name: Page template
+        block: Block to render for HTMX requests (defaults to the HX-Target match)
+        version: Data version of the page; enables ETag/304 handling when given
+        **context: Template variables
+
+    Returns:
+        Response, or an empty 304 if the client's copy is current
+    """
+    partial = is_htmx_request()
+    block_name = (block or target_block(template_name)) if partial else None
+
+    etag = None
+    if version is not None:
+        etag = make_etag(template_name, block_name, version)
+        if request.if_none_match.contains_weak(etag):
+            response = current_app.response_class(status=304)
+            _set_headers(response, etag)
+            return response
+
+    if partial:
+        body = render_block(template_name, block_name, **context)
+    else:
+        body = render_template(template_name, **context)
+
+    response = make_response(body)
+    _set_headers(response, etag)
+    return response
+
+
+def _set_headers(response: Response, etag: Optional[str]) -> None:
+    """Attach the Vary header and, if versioned, a weak ETag that must be revalidated."""
+    # Full pages and fragments share a URL
+    response.vary.update(('HX-Request', 'HX-Target'))
+    if etag is not None:
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
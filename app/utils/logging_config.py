@@ -0,0 +1,292 @@
+"""
+Logging setup for the Crowbank Intranet.
+
+Request threads never write logs themselves: the root logger gets a
+`QueueHandler` and a `QueueListener` thread does the formatting and I/O.
+Records are written as JSON lines carrying the request id, user, route
+and, for the per-request access line, the timing.
+
+Records below ``logging.level`` are kept only for a sample of requests
+(``logging.sample_rate``), so production can log at ERROR but still see
+full DEBUG traces for, say, 1% of requests. Sampling is per request, so
+a sampled request keeps all of its lines.
+
+Error emails (``email.error_reporting_enabled``) go through their own
+queue and listener, so a slow SMTP server never delays other logs, and
+are rate-limited: at most ``email.error_rate_limit`` per
+``email.error_rate_window`` seconds, with the number suppressed reported
+in the next email sent.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, SMTPHandler
+from typing import List, Optional
+
+from flask import g, has_request_context, request
+
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+# Listeners of the current configuration, stopped when logging is reconfigured
+_listeners: List[QueueListener] = []
+_lock = threading.Lock()
+
+access_logger = logging.getLogger('app.access')
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    Queue handler that captures request context on the emitting thread.
+
+    The message and traceback are rendered here too, since arguments and
+    exception objects may not be safe to use from the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Other handlers still see the original record, with its args and exc_info
+        record = copy.copy(record)
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.route = request.url_rule.rule if request.url_rule else None
+            record.method = request.method
+            record.path = request.path
+            user = g.get('_login_user')  # Only if Flask-Login already loaded it
+            record.user = getattr(user, 'username', None)
+
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as single-line JSON objects."""
+
+    CONTEXT_FIELDS = ('request_id', 'user', 'method', 'path', 'route', 'status', 'duration_ms')
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in self.CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Pass records at or above `level`, and all records of sampled requests.
+
+    Args:
+        level: Level always passed
+        sample_rate: Fraction of requests (or, outside requests, of records)
+            whose lower-level records are kept
+    """
+
+    def __init__(self, level: int, sample_rate: float = 0.0):
+        super().__init__()
+        self.level = level
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= self.level:
+            return True
+        if self.sample_rate <= 0:
+            return False
+        if has_request_context():
+            sampled = g.get('log_sampled')
+            if sampled is None:
+                sampled = g.log_sampled = random.random() < self.sample_rate
+            return sampled
+        return random.random() < self.sample_rate
+
+
+class RateLimitedSMTPHandler(SMTPHandler):
+    """
+    SMTP handler sending at most `limit` emails per `window` seconds.
+
+    Args:
+        limit: Emails allowed per window
+        window: Window length in seconds
+        *args, **kwargs: Passed to `SMTPHandler`
+    """
+
+    def __init__(self, *args, limit: int = 5, window: float = 300, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limit = limit
+        self.window = window
+        self._sent: List[float] = []
+        self.suppressed = 0
+
+    def allow(self) -> bool:
+        """Record a send attempt and say whether it is within the limit."""
+        now = time.monotonic()
+        self._sent = [t for t in self._sent if now - t < self.window]
+        if len(self._sent) >= self.limit:
+            self.suppressed += 1
+            return False
+        self._sent.append(now)
+        return True
+
+    def getSubject(self, record: logging.LogRecord) -> str:
+        subject = super().getSubject(record)
+        if self.suppressed:
+            subject += f" ({self.suppressed} earlier errors not emailed)"
+        return subject
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if not self.allow():
+            return
+        super().emit(record)
+        self.suppressed = 0
+
+
+def _start_listener(handlers: List[logging.Handler], level: int = logging.NOTSET,
+                    filters: Optional[List[logging.Filter]] = None) -> QueueHandler:
+    log_queue = queue.SimpleQueue()
+    handler = ContextQueueHandler(log_queue)
+    handler.setLevel(level)
+    for log_filter in filters or ():
+        handler.addFilter(log_filter)
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+    return handler
+
+
+def stop_logging() -> None:
+    """Flush and stop the listener threads of the current configuration."""
+    with _lock:
+        while _listeners:
+            _listeners.pop().stop()
+
+
+atexit.register(stop_logging)
+
+
+def build_error_email_handler(config: dict) -> Optional[RateLimitedSMTPHandler]:
+    """
+    Build the rate-limited error email handler from the ``email`` config section.
+
+    Args:
+        config: Nested application config
+
+    Returns:
+        Handler, or None if error reporting is disabled or has no recipients
+    """
+    email = config.get('email', {})
+    recipients = email.get('error_recipients') or []
+    if not email.get('error_reporting_enabled') or not recipients:
+        return None
+
+    credentials = None
+    if email.get('username'):
+        credentials = (email['username'], email.get('password', ''))
+    handler = RateLimitedSMTPHandler(
+        (email.get('server', 'localhost'), email.get('port', 25)),
+        email.get('default_sender', 'intranet@crowbank.co.uk'),
+        recipients,
+        email.get('error_subject', 'Crowbank Intranet error'),
+        credentials=credentials,
+        secure=() if email.get('use_tls') else None,
+        timeout=email.get('timeout', 10),
+        limit=email.get('error_rate_limit', 5),
+        window=email.get('error_rate_window', 300),
+    )
+    handler.setLevel(logging.ERROR)
+    handler.setFormatter(logging.Formatter(config.get('logging', {}).get('format')))
+    return handler
+
+
+def configure_logging(config: dict, handlers: Optional[List[logging.Handler]] = None) -> None:
+    """
+    Route all logging through background listener threads.
+
+    Replaces any configuration made by an earlier call.
+
+    Args:
+        config: Nested application config
+        handlers: Output handlers (defaults to stderr)
+    """
+    settings = config.get('logging', {})
+    level = logging.getLevelName(str(settings.get('level', 'INFO')).upper())
+    sample_rate = float(settings.get('sample_rate', 0))
+    sample_level = logging.getLevelName(str(settings.get('sample_level', 'DEBUG')).upper())
+
+    if handlers is None:
+        output = logging.StreamHandler()
+        if settings.get('json', True):
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(logging.Formatter(settings.get('format')))
+        handlers = [output]
+
+    stop_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, ContextQueueHandler):
+            root.removeHandler(handler)
+
+    with _lock:
+        root.addHandler(_start_listener(handlers, filters=[SamplingFilter(level, sample_rate)]))
+        email_handler = build_error_email_handler(config)
+        if email_handler is not None:
+            root.addHandler(_start_listener([email_handler], level=logging.ERROR))
+
+    # Sampled requests need records below the level to be created at all
+    root.setLevel(min(level, sample_level) if sample_rate > 0 else level)
+
+
+def init_logging(app) -> None:
+    """
+    Configure logging from the app config and log each request with its timing.
+
+    Args:
+        app: Flask application
+    """
+    from flask.logging import default_handler
+
+    # Tests configure logging themselves and rely on pytest's capture
+    if not app.testing:
+        configure_logging(app.config.get('CONFIG', {}))
+        app.logger.removeHandler(default_handler)
+
+    @app.before_request
+    def start_request_log():
+        g.request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def log_request(response):
+        started = g.get('request_started')
+        if started is not None:
+            access_logger.info(
+                f"{request.method} {request.path} {response.status_code}",
+                extra={
+                    'status': response.status_code,
+                    'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+                },
+            )
+            response.headers[REQUEST_ID_HEADER] = g.request_id
+        return response
@@ -0,0 +1,356 @@
+"""
+Lock-safe schema change helpers for Alembic migrations.
+
+The booking desk stays online during deploys, so migrations on populated
+tables must never hold an ACCESS EXCLUSIVE lock for longer than a
+catalog update. The helpers here follow the usual PostgreSQL recipe:
+
+- `add_column` always adds the column nullable (a catalog-only change)
+- `backfill` fills it in keyed batches, each committed on its own, with a
+  pause between batches and progress logging
+- `set_not_null`, `add_check_constraint` and `add_foreign_key` add the
+  constraint ``NOT VALID``, commit, and then ``VALIDATE`` it, which scans
+  the table under a lock that does not block reads or writes
+- `create_index` / `drop_index` run ``CONCURRENTLY``
+
+These steps run outside the migration's transaction so each exclusive
+lock is released as soon as its statement finishes, and every DDL
+statement runs with a short ``lock_timeout`` so a migration queued
+behind a long transaction fails fast instead of stalling all traffic
+behind it. A migration that fails part-way leaves the steps before it
+committed.
+
+`check_migrations` renders each migration's SQL offline and flags
+operations that would block on a populated table; run it with
+``flask check-migrations``. A migration can acknowledge a flagged
+operation by listing the rule in a module-level ``ALLOW_BLOCKING`` set.
+"""
+
+import io
+import logging
+import re
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+import sqlalchemy as sa
+from alembic import op
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCK_TIMEOUT = '5s'
+
+
+@contextmanager
+def lock_timeout(timeout: str = DEFAULT_LOCK_TIMEOUT):
+    """
+    Limit how long the enclosed DDL may wait for a lock.
+
+    Args:
+        timeout: PostgreSQL interval, e.g. '5s'
+    """
+    op.execute(f"SET lock_timeout = '{timeout}'")
+    try:
+        yield
+    finally:
+        op.execute("SET lock_timeout = DEFAULT")
+
+
+def add_column(table: str, column: sa.Column, timeout: str = DEFAULT_LOCK_TIMEOUT) -> None:
+    """
+    Add a column as nullable, whatever the column declares.
+
+    Follow with `backfill` and `set_not_null` for required columns.
+
+    Args:
+        table: Table name
+        column: Column to add
+        timeout: Lock timeout for the ALTER
+    """
+    column.nullable = True
+    with lock_timeout(timeout):
+        op.add_column(table, column)
+
+
+def backfill(table: str, values: Dict[str, object], where: Optional[str] = None,
+             key: str = 'id', batch_size: int = 1000, pause: float = 0.1,
+             progress: Optional[Callable[[int, object], None]] = None) -> int:
+    """
+    Update rows in keyed batches, committing each batch.
+
+    Batches walk the key upwards, so each UPDATE locks at most
+    `batch_size` rows, briefly, and concurrent writes are never blocked
+    for long. Rows added concurrently must be handled by the application
+    (e.g. through a column default) since a finished batch is not revisited.
+
+    Args:
+        table: Table name
+        values: Column name to SQL expression or literal value
+        where: Optional SQL condition restricting the rows (e.g. "banned IS NULL")
+        key: Indexed, unique, sortable column to batch on
+        batch_size: Rows per batch
+        pause: Seconds to sleep between batches, to let replicas and vacuum keep up
+        progress: Called with (rows updated so far, last key) after each batch
+
+    Returns:
+        Number of rows updated
+    """
+    table_clause = sa.table(table, sa.column(key), *(sa.column(name) for name in values))
+    key_column = table_clause.c[key]
+    condition = sa.text(where) if where else sa.true()
+    assignments = {
+        name: value if isinstance(value, sa.sql.ClauseElement) else sa.literal(value)
+        for name, value in values.items()
+    }
+
+    context = op.get_context()
+    if context.as_sql:
+        # Offline SQL scripts can't loop; emit one statement
+        op.execute(sa.update(table_clause).where(condition).values(assignments))
+        return 0
+
+    total = 0
+    last_key = None
+    with context.autocommit_block():
+        connection = op.get_bind()
+        while True:
+            batch = sa.select(key_column).where(condition).order_by(key_column).limit(batch_size)
+            if last_key is not None:
+                batch = batch.where(key_column > last_key)
+            batch = batch.subquery()
+            keys = connection.execute(
+                sa.update(table_clause)
+                .where(key_column.in_(sa.select(batch.c[key])))
+                .values(assignments)
+                .returning(key_column)
+            ).scalars().all()
+            if not keys:
+                break
+            total += len(keys)
+            last_key = max(keys)
+            if progress is not None:
+                progress(total, last_key)
+            else:
+                logger.info(f"Backfilled {total} rows of {table} (up to {key} {last_key})")
+            if len(keys) < batch_size:
+                break
+            time.sleep(pause)
+    return total
+
+
+def add_check_constraint(name: str, table: str, condition: str,
+                         timeout: str = DEFAULT_LOCK_TIMEOUT) -> None:
+    """
+    Add a CHECK constraint without blocking writes while existing rows are checked.
+
+    Args:
+        name: Constraint name
+        table: Table name
+        condition: SQL condition
+        timeout: Lock timeout for the ALTERs
+    """
+    with op.get_context().autocommit_block(), lock_timeout(timeout):
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} CHECK ({condition}) NOT VALID")
+        op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
+
+
+def add_foreign_key(name: str, source: str, referent: str, local_cols: List[str],
+                    remote_cols: List[str], ondelete: Optional[str] = None,
+                    timeout: str = DEFAULT_LOCK_TIMEOUT) -> None:
+    """
+    Add a foreign key without blocking writes while existing rows are checked.
+
+    Args:
+        name: Constraint name
+        source: Referencing table
+        referent: Referenced table
+        local_cols: Referencing columns
+        remote_cols: Referenced columns
+        ondelete: Optional ON DELETE action
+        timeout: Lock timeout for the ALTERs
+    """
+    on_delete = f" ON DELETE {ondelete}" if ondelete else ''
+    with op.get_context().autocommit_block(), lock_timeout(timeout):
+        op.execute(
+            f"ALTER TABLE {source} ADD CONSTRAINT {name} FOREIGN KEY ({', '.join(local_cols)}) "
+            f"REFERENCES {referent} ({', '.join(remote_cols)}){on_delete} NOT VALID"
+        )
+        op.execute(f"ALTER TABLE {source} VALIDATE CONSTRAINT {name}")
+
+
+def set_not_null(table: str, column: str, timeout: str = DEFAULT_LOCK_TIMEOUT) -> None:
+    """
+    Make a column NOT NULL without a table scan under an exclusive lock.
+
+    A validated ``CHECK (column IS NOT NULL)`` lets PostgreSQL 12+ skip
+    the scan when setting NOT NULL; the check is dropped afterwards.
+
+    Args:
+        table: Table name
+        column: Column name (must already be backfilled)
+        timeout: Lock timeout for the ALTERs
+    """
+    check = f"ck_{table}_{column}_not_null"
+    add_check_constraint(check, table, f"{column} IS NOT NULL", timeout=timeout)
+    with op.get_context().autocommit_block(), lock_timeout(timeout):
+        op.alter_column(table, column, nullable=False)
+        op.drop_constraint(check, table, type_='check')
+
+
+def create_index(name: str, table: str, columns: List[str], unique: bool = False, **kw) -> None:
+    """
+    Build an index without blocking writes.
+
+    Runs outside the migration's transaction, as CONCURRENTLY requires.
+    A build that fails leaves an invalid index, so it is dropped first
+    when the migration is retried.
+
+    Args:
+        name: Index name
+        table: Table name
+        columns: Indexed columns or expressions
+        unique: Whether the index is unique
+        **kw: Extra `op.create_index` options (e.g. postgresql_where)
+    """
+    with op.get_context().autocommit_block():
+        op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+        op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True, **kw)
+
+
+def drop_index(name: str, table: str) -> None:
+    """
+    Drop an index without blocking reads or writes.
+
+    Args:
+        name: Index name
+        table: Table name
+    """
+    with op.get_context().autocommit_block():
+        op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+class BlockingOperation(NamedTuple):
+    revision: str
+    rule: str
+    statement: str
+
+
+_TABLE = r'"?(\w+)"?'
+
+# (rule, pattern on a single statement, message); group 1 is the table
+BLOCKING_RULES = (
+    ('add-not-null-column',
+     re.compile(rf'^ALTER TABLE {_TABLE} ADD COLUMN (?!.*\bDEFAULT\b).*\bNOT NULL\b', re.S),
+     "adds a NOT NULL column without a default; add it nullable and backfill"),
+    ('add-stored-generated-column',
+     re.compile(rf'^ALTER TABLE {_TABLE} ADD COLUMN .*\bGENERATED ALWAYS AS\b.*\bSTORED\b', re.S),
+     "adds a stored generated column, rewriting the table; add it plain, keep it with a trigger and backfill"),
+    ('set-not-null',
+     re.compile(rf'^ALTER TABLE {_TABLE} ALTER COLUMN \S+ SET NOT NULL'),
+     "sets NOT NULL with a full scan under an exclusive lock; use set_not_null()"),
+    ('column-type-change',
+     re.compile(rf'^ALTER TABLE {_TABLE} ALTER COLUMN \S+ (?:SET DATA )?TYPE\b'),
+     "changes a column type, which may rewrite the table"),
+    ('constraint-not-valid',
+     re.compile(rf'^ALTER TABLE {_TABLE} ADD (?:CONSTRAINT \S+ )?(?:FOREIGN KEY|CHECK)\b(?!.*\bNOT VALID\b)', re.S),
+     "validates a constraint under an exclusive lock; add it NOT VALID and VALIDATE separately"),
+    ('unique-constraint',
+     re.compile(rf'^ALTER TABLE {_TABLE} ADD (?:CONSTRAINT \S+ )?UNIQUE\b'),
+     "builds a unique index under an exclusive lock; create the index concurrently first"),
+    ('index-not-concurrent',
+     re.compile(rf'^CREATE (?:UNIQUE )?INDEX (?!CONCURRENTLY)(?:IF NOT EXISTS )?\S+ ON {_TABLE}'),
+     "builds an index blocking writes; use create_index()"),
+    ('drop-index-not-concurrent',
+     re.compile(r'^DROP INDEX (?!CONCURRENTLY)(?:IF EXISTS )?"?(\w+)"?'),
+     "drops an index under an exclusive lock; use drop_index()"),
+)
+
+_CREATE_TABLE = re.compile(rf'^CREATE TABLE (?:IF NOT EXISTS )?{_TABLE}')
+_VALIDATE = re.compile(rf'^ALTER TABLE {_TABLE} VALIDATE CONSTRAINT')
+
+
+def render_upgrade_sql(upgrade: Callable[[], None]) -> List[str]:
+    """
+    Render the SQL a migration's upgrade() would run on PostgreSQL.
+
+    Args:
+        upgrade: The migration's upgrade function
+
+    Returns:
+        SQL statements, in order
+    """
+    from alembic.operations import Operations
+    from alembic.runtime.migration import MigrationContext
+
+    buffer = io.StringIO()
+    context = MigrationContext.configure(
+        dialect_name='postgresql',
+        opts={'as_sql': True, 'output_buffer': buffer, 'literal_binds': True},
+    )
+    with Operations.context(context):
+        upgrade()
+    statements = (' '.join(s.split()) for s in buffer.getvalue().split(';\n'))
+    return [s for s in statements if s]
+
+
+def check_statements(revision: str, statements: Iterable[str],
+                     allowed: Iterable[str] = ()) -> List[BlockingOperation]:
+    """
+    Flag statements that would block traffic on a populated table.
+
+    Tables created in the same migration are empty, so anything on them
+    is allowed. SET NOT NULL is allowed after a VALIDATE on the same table.
+
+    Args:
+        revision: Revision id, for reporting
+        statements: SQL statements of one migration
+        allowed: Rules the migration acknowledges
+
+    Returns:
+        Blocking operations found
+    """
+    statements = list(statements)
+    new_tables = {m.group(1) for m in map(_CREATE_TABLE.match, statements) if m}
+    allowed = set(allowed)
+    validated = set()
+    found = []
+    for statement in statements:
+        match = _VALIDATE.match(statement)
+        if match:
+            validated.add(match.group(1))
+        for rule, pattern, _ in BLOCKING_RULES:
+            match = pattern.match(statement)
+            if not match or rule in allowed or match.group(1) in new_tables:
+                continue
+            if rule == 'set-not-null' and match.group(1) in validated:
+                continue
+            found.append(BlockingOperation(revision, rule, statement))
+    return found
+
+
+def check_migrations(script_location: str = 'migrations') -> List[BlockingOperation]:
+    """
+    Check every migration in a script directory for blocking operations.
+
+    Args:
+        script_location: Alembic script directory
+
+    Returns:
+        Blocking operations found, oldest migration first
+    """
+    from alembic.script import ScriptDirectory
+
+    found = []
+    scripts = list(ScriptDirectory(script_location).walk_revisions())
+    for script in reversed(scripts):
+        module = script.module
+        statements = render_upgrade_sql(module.upgrade)
+        found.extend(check_statements(script.revision, statements, getattr(module, 'ALLOW_BLOCKING', ())))
+    return found
+
+
+def describe(operation: BlockingOperation) -> str:
+    """Human-readable report line for a blocking operation."""
+    message = next(m for rule, _, m in BLOCKING_RULES if rule == operation.rule)
+    return f"{operation.revision}: [{operation.rule}] {message}\n    {operation.statement}"
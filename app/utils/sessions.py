@@ -0,0 +1,358 @@
+"""
+Server-side sessions for the Crowbank Intranet.
+
+The session cookie holds only a random id; the data lives in a shared
+backend so any app node can serve any request:
+
+- `DatabaseSessionBackend` stores sessions in the `sessions` table, with
+  an indexed expiry column purged in batches
+- `RedisSessionBackend` stores them in Redis with native key expiry
+
+Sessions are loaded lazily, at most once per request, so requests that
+never touch the session (static files, health checks) cost no backend
+round trip. Unchanged sessions are only written back to extend their
+expiry, and then at most once per `refresh_interval`.
+"""
+
+import logging
+import secrets
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from sqlalchemy import delete, select
+from werkzeug.datastructures import CallbackDict
+
+from app.models.session import ServerSession
+
+
+logger = logging.getLogger(__name__)
+
+serializer = TaggedJSONSerializer()
+
+SessionRecord = Tuple[Dict[str, Any], datetime]
+
+
+class SessionBackend:
+    """Storage for serialized session data."""
+
+    def load(self, sid: str) -> Optional[SessionRecord]:
+        """
+        Load an unexpired session.
+
+        Args:
+            sid: Session id
+
+        Returns:
+            (data, expires_at), or None if missing or expired
+        """
+        raise NotImplementedError
+
+    def save(self, sid: str, data: Dict[str, Any], expires_at: datetime) -> None:
+        """Create or replace a session."""
+        raise NotImplementedError
+
+    def delete(self, sid: str) -> None:
+        """Remove a session."""
+        raise NotImplementedError
+
+    def purge_expired(self, batch_size: int = 1000) -> int:
+        """
+        Remove expired sessions.
+
+        Returns:
+            Number of sessions removed
+        """
+        return 0
+
+
+class DatabaseSessionBackend(SessionBackend):
+    """
+    Sessions stored in the `sessions` table.
+
+    Uses its own short transactions on the engine, independent of the
+    request's ORM session, so saving a session never commits view work.
+    """
+
+    table = ServerSession.__table__
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def load(self, sid: str) -> Optional[SessionRecord]:
+        with self.engine.connect() as connection:
+            row = connection.execute(
+                select(self.table.c.data, self.table.c.expires_at).where(
+                    self.table.c.id == sid,
+                    self.table.c.expires_at > datetime.now(timezone.utc),
+                )
+            ).first()
+        if row is None:
+            return None
+        expires_at = row.expires_at
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return serializer.loads(row.data), expires_at
+
+    def _upsert(self, engine):
+        if engine.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        return insert(self.table)
+
+    def save(self, sid: str, data: Dict[str, Any], expires_at: datetime) -> None:
+        statement = self._upsert(self.engine).values(id=sid, data=serializer.dumps(data), expires_at=expires_at)
+        statement = statement.on_conflict_do_update(
+            index_elements=[self.table.c.id],
+            set_={'data': statement.excluded.data, 'expires_at': statement.excluded.expires_at},
+        )
+        with self.engine.begin() as connection:
+            connection.execute(statement)
+
+    def delete(self, sid: str) -> None:
+        with self.engine.begin() as connection:
+            connection.execute(delete(self.table).where(self.table.c.id == sid))
+
+    def purge_expired(self, batch_size: int = 1000) -> int:
+        """
+        Delete expired sessions in batches.
+
+        Each batch is its own short transaction so purging never holds
+        locks long enough to stall logins.
+        """
+        total = 0
+        while True:
+            expired = (
+                select(self.table.c.id)
+                .where(self.table.c.expires_at <= datetime.now(timezone.utc))
+                .limit(batch_size)
+                .scalar_subquery()
+            )
+            with self.engine.begin() as connection:
+                deleted = connection.execute(delete(self.table).where(self.table.c.id.in_(expired))).rowcount
+            total += deleted
+            if deleted < batch_size:
+                break
+        if total:
+            logger.info(f"Purged {total} expired sessions")
+        return total
+
+
+class RedisSessionBackend(SessionBackend):
+    """Sessions stored in Redis; expiry is handled by Redis itself."""
+
+    def __init__(self, url: str, prefix: str = 'session:'):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("The redis session backend requires the redis package") from e
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def load(self, sid: str) -> Optional[SessionRecord]:
+        pipeline = self.client.pipeline()
+        pipeline.get(self.prefix + sid)
+        pipeline.ttl(self.prefix + sid)
+        raw, ttl = pipeline.execute()
+        if raw is None or ttl is None or ttl < 0:
+            return None
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+        return serializer.loads(raw.decode('utf-8')), expires_at
+
+    def save(self, sid: str, data: Dict[str, Any], expires_at: datetime) -> None:
+        ttl = max(int((expires_at - datetime.now(timezone.utc)).total_seconds()), 1)
+        self.client.setex(self.prefix + sid, ttl, serializer.dumps(data))
+
+    def delete(self, sid: str) -> None:
+        self.client.delete(self.prefix + sid)
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """
+    Session whose data is fetched from the backend on first use.
+    """
+
+    def __init__(self, sid: str, loader: Optional[Callable[[], Optional[SessionRecord]]] = None,
+                 new: bool = False):
+        def on_update(session):
+            session.modified = True
+        super().__init__(None, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.loaded = loader is None
+        self.expires_at: Optional[datetime] = None
+        self.previous_sid: Optional[str] = None
+        self._loader = loader
+
+    def _load(self) -> None:
+        if self.loaded:
+            return
+        self.loaded = True
+        record = self._loader()
+        if record is None:
+            # Unknown or expired id: start afresh under a new id
+            self.sid = generate_sid()
+            self.new = True
+        else:
+            data, self.expires_at = record
+            dict.update(self, data)
+
+    def regenerate(self) -> None:
+        """Move the session to a new id, e.g. on login, to prevent fixation."""
+        self._load()
+        if not self.new:
+            self.previous_sid = self.sid
+        self.sid = generate_sid()
+        self.new = True
+        self.modified = True
+
+    @property
+    def accessed(self) -> bool:
+        return self.loaded
+
+
+def _lazy(name: str):
+    method = getattr(CallbackDict, name)
+
+    def wrapper(self, *args, **kwargs):
+        self._load()
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in ('__getitem__', '__setitem__', '__delitem__', '__contains__', '__iter__',
+              '__len__', '__eq__', '__repr__', 'get', 'keys', 'values', 'items', 'pop',
+              'popitem', 'setdefault', 'update', 'clear', 'copy'):
+    setattr(ServerSideSession, _name, _lazy(_name))
+
+
+def generate_sid() -> str:
+    """Generate an unguessable session id."""
+    return secrets.token_urlsafe(32)
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Flask session interface backed by a `SessionBackend`.
+    """
+
+    session_class = ServerSideSession
+
+    def __init__(self, backend: SessionBackend, refresh_interval: int = 300):
+        self.backend = backend
+        self.refresh_interval = timedelta(seconds=refresh_interval)
+
+    def open_session(self, app, request) -> ServerSideSession:
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if not sid:
+            return ServerSideSession(generate_sid(), new=True)
+        return ServerSideSession(sid, loader=lambda: self.backend.load(sid))
+
+    def _expires_at(self, app, session) -> datetime:
+        # Non-permanent sessions end with the browser, but the stored copy
+        # still needs a lifetime
+        return (self.get_expiration_time(app, session)
+                or datetime.now(timezone.utc) + app.permanent_session_lifetime)
+
+    def save_session(self, app, session: ServerSideSession, response) -> None:
+        if not session.loaded:
+            return
+
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        response.vary.add('Cookie')
+
+        if session.previous_sid:
+            self.backend.delete(session.previous_sid)
+
+        if not session:
+            if not session.new:
+                self.backend.delete(session.sid)
+            if session.modified or session.previous_sid:
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app),
+                                       httponly=self.get_cookie_httponly(app))
+            return
+
+        expires_at = self._expires_at(app, session)
+        stale = (session.expires_at is None
+                 or expires_at - session.expires_at > self.refresh_interval)
+        if not (session.modified or session.new or stale):
+            return
+
+        self.backend.save(session.sid, dict(session), expires_at)
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def _start_purge_thread(backend: SessionBackend, interval: int, batch_size: int) -> threading.Thread:
+    """Purge expired sessions every `interval` seconds in a daemon thread."""
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                backend.purge_expired(batch_size)
+            except Exception as e:
+                logger.warning(f"Session purge failed: {e}")
+
+    thread = threading.Thread(target=run, name='session-purge', daemon=True)
+    thread.stop = stop
+    thread.start()
+    return thread
+
+
+def init_sessions(app, db) -> None:
+    """
+    Install the server-side session interface configured under `session`.
+
+    Args:
+        app: Flask application
+        db: Flask-SQLAlchemy extension instance (for the database backend)
+    """
+    config = app.config.get('CONFIG', {}).get('session', {})
+    app.permanent_session_lifetime = timedelta(seconds=config.get('permanent_lifetime', 86400))
+
+    backend_type = config.get('type', 'database')
+    if backend_type == 'redis':
+        backend = RedisSessionBackend(config.get('redis_url', 'redis://localhost:6379/0'))
+    elif backend_type == 'database':
+        with app.app_context():
+            backend = DatabaseSessionBackend(db.engine)
+    else:
+        # Keep Flask's signed-cookie sessions
+        return
+
+    app.session_interface = ServerSideSessionInterface(
+        backend, refresh_interval=config.get('refresh_interval', 300)
+    )
+    app.extensions['session_backend'] = backend
+
+    purge_interval = config.get('purge_interval', 0)
+    if purge_interval and backend_type == 'database' and not app.testing:
+        purge_lock = threading.Lock()
+
+        # Started by the first request, so only processes serving the web
+        # app purge; CLI commands and the gunicorn master never do
+        @app.before_request
+        def start_session_purge():
+            if 'session_purge' in app.extensions:
+                return
+            with purge_lock:
+                if 'session_purge' not in app.extensions:
+                    app.extensions['session_purge'] = _start_purge_thread(
+                        backend, purge_interval, config.get('purge_batch_size', 1000))
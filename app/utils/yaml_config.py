@@ -154,6 +154,19 @@ def load_config(env: Optional[str] = None) -> Dict[str, Any]:
             config['sqlalchemy']['database_uri'] = (
                 f"postgresql://{db['user']}:{db['password']}@{db['host']}{port_str}/{db['name']}"
             )
+        
+        # Optional read replica for reporting and search queries; credentials
+        # and database name default to the primary's
+        replica_section = db.get('replica') or {}
+        replica = {**db, **replica_section}
+        if (replica_section.get('enabled') and replica_section.get('host')
+                and all(k in replica for k in ['user', 'password', 'name'])):
+            port = replica.get('port', '')
+            port_str = f":{port}" if port else ""
+            config.setdefault('sqlalchemy', {})
+            config['sqlalchemy']['replica_uri'] = (
+                f"postgresql://{replica['user']}:{replica['password']}@{replica['host']}{port_str}/{replica['name']}"
+            )
     
     # 7. Create a Flask-style flattened config for compatibility
     flask_config = flatten_dict(config)
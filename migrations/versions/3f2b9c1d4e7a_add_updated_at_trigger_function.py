@@ -0,0 +1,67 @@
+"""Add set_updated_at() trigger function for server-side audit timestamps
+
+Revision ID: 3f2b9c1d4e7a
+Revises: 86ca15789c6a
+Create Date: 2026-10-19 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.base import (
+    CREATE_UPDATED_AT_FUNCTION_SQL,
+    DROP_UPDATED_AT_FUNCTION_SQL,
+    create_updated_at_trigger_sql,
+    drop_updated_at_trigger_sql,
+)
+from app.utils import online_migrations
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f2b9c1d4e7a'
+down_revision: Union[str, None] = '86ca15789c6a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# timestamp -> timestamptz is a catalog-only change while the session time
+# zone is UTC (PostgreSQL 12+), and the old values were written as UTC
+ALLOW_BLOCKING = {'column-type-change'}
+
+# Tables that predate the migration history; where they carry the old
+# naive, client-defaulted audit columns, bring them in line with CrowbankBase
+EXISTING_TABLES = ('customers', 'contacts', 'vets')
+
+
+def _audit_columns_sql(table: str) -> str:
+    return f"""
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_schema = current_schema() AND table_name = '{table}'
+               AND column_name = 'updated_at') THEN
+        PERFORM set_config('timezone', 'UTC', true);
+        ALTER TABLE {table} ALTER COLUMN created_at TYPE timestamptz, ALTER COLUMN created_at SET DEFAULT now(), ALTER COLUMN updated_at TYPE timestamptz, ALTER COLUMN updated_at SET DEFAULT now();
+        {drop_updated_at_trigger_sql(table)};
+        {create_updated_at_trigger_sql(table)};
+    END IF;
+END $$
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Tables built on CrowbankBase later attach it in their own migration with
+    # op.execute(create_updated_at_trigger_sql('<table>'))
+    op.execute(CREATE_UPDATED_AT_FUNCTION_SQL)
+    with online_migrations.lock_timeout():
+        for table in EXISTING_TABLES:
+            op.execute(_audit_columns_sql(table))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in EXISTING_TABLES:
+        op.execute(drop_updated_at_trigger_sql(table))
+    op.execute(DROP_UPDATED_AT_FUNCTION_SQL)
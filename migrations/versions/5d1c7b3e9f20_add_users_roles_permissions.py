@@ -0,0 +1,87 @@
+"""Add users, roles and permissions
+
+Revision ID: 5d1c7b3e9f20
+Revises: e8a3f6c2b917
+Create Date: 2026-10-19 13:48:36.207114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.base import create_updated_at_trigger_sql, drop_updated_at_trigger_sql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d1c7b3e9f20'
+down_revision: Union[str, None] = 'e8a3f6c2b917'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('users', 'roles', 'permissions')
+
+
+def _audit_columns():
+    return [
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'users',
+        *_audit_columns(),
+        sa.Column('username', sa.String(50), nullable=False, unique=True),
+        sa.Column('email', sa.String(120), nullable=True),
+        sa.Column('password_hash', sa.String(255), nullable=False),
+        sa.Column('active', sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column('last_login_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('permissions_version', sa.Integer(), nullable=False, server_default='1'),
+    )
+
+    op.create_table(
+        'roles',
+        *_audit_columns(),
+        sa.Column('name', sa.String(50), nullable=False, unique=True),
+        sa.Column('description', sa.String(255), nullable=True),
+    )
+
+    op.create_table(
+        'permissions',
+        *_audit_columns(),
+        sa.Column('name', sa.String(100), nullable=False, unique=True),
+        sa.Column('description', sa.String(255), nullable=True),
+    )
+
+    op.create_table(
+        'user_roles',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('role_id', sa.Integer(), sa.ForeignKey('roles.id', ondelete='CASCADE'), primary_key=True),
+    )
+    op.create_index('ix_user_roles_role_id', 'user_roles', ['role_id'])
+
+    op.create_table(
+        'role_permissions',
+        sa.Column('role_id', sa.Integer(), sa.ForeignKey('roles.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('permission_id', sa.Integer(), sa.ForeignKey('permissions.id', ondelete='CASCADE'),
+                  primary_key=True),
+    )
+    op.create_index('ix_role_permissions_permission_id', 'role_permissions', ['permission_id'])
+
+    for table in TABLES:
+        op.execute(create_updated_at_trigger_sql(table))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_role_permissions_permission_id', table_name='role_permissions')
+    op.drop_table('role_permissions')
+    op.drop_index('ix_user_roles_role_id', table_name='user_roles')
+    op.drop_table('user_roles')
+    for table in reversed(TABLES):
+        op.execute(drop_updated_at_trigger_sql(table))
+        op.drop_table(table)
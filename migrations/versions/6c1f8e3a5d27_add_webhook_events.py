@@ -0,0 +1,62 @@
+"""Add webhook events queue
+
+Revision ID: 6c1f8e3a5d27
+Revises: 9a3e5c7d1b42
+Create Date: 2026-10-19 18:41:07.215364
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.base import create_updated_at_trigger_sql, drop_updated_at_trigger_sql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6c1f8e3a5d27'
+down_revision: Union[str, None] = '9a3e5c7d1b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+webhook_source = sa.Enum('GRAVITY_FORMS', 'STRIPE', name='webhooksource')
+webhook_status = sa.Enum('PENDING', 'PROCESSED', 'UNMATCHED', 'FAILED', name='webhookstatus')
+
+
+def _audit_columns():
+    return [
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'webhook_events',
+        *_audit_columns(),
+        sa.Column('source', webhook_source, nullable=False),
+        sa.Column('idempotency_key', sa.String(255), nullable=False),
+        sa.Column('event_type', sa.String(100), nullable=True),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('status', webhook_status, nullable=False, server_default='PENDING'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('customer_id', sa.Integer(), sa.ForeignKey('customers.id'), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.UniqueConstraint('source', 'idempotency_key', name='uq_webhook_events_source_key'),
+    )
+    op.create_index('ix_webhook_events_pending', 'webhook_events', ['id'],
+                    postgresql_where=sa.text("status = 'PENDING'"))
+    op.execute(create_updated_at_trigger_sql('webhook_events'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(drop_updated_at_trigger_sql('webhook_events'))
+    op.drop_index('ix_webhook_events_pending', table_name='webhook_events')
+    op.drop_table('webhook_events')
+
+    for enum in (webhook_status, webhook_source):
+        enum.drop(op.get_bind(), checkfirst=True)
@@ -10,6 +10,8 @@ from typing import Sequence, Union
 from alembic import op
 import sqlalchemy as sa
 
+from app.utils import online_migrations
+
 
 # revision identifiers, used by Alembic.
 revision: str = '86ca15789c6a'
@@ -20,12 +22,24 @@ depends_on: Union[str, Sequence[str], None] = None
 
 def upgrade() -> None:
     """Upgrade schema."""
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.add_column('customers', sa.Column('notes', sa.Text(), nullable=True))
-    op.add_column('customers', sa.Column('banned', sa.Boolean(), nullable=False))
-    op.add_column('customers', sa.Column('opt_out', sa.Boolean(), nullable=False))
-    op.add_column('customers', sa.Column('discount', sa.Numeric(precision=5, scale=2), nullable=False))
-    # ### end Alembic commands ###
+    # Added nullable and backfilled in batches so the customers table is
+    # never rewritten or scanned under an exclusive lock. The constant
+    # defaults (catalog-only on PostgreSQL 11+) cover existing rows and
+    # rows inserted outside the ORM while the backfill runs; the backfill
+    # only catches explicit NULLs
+    defaults = {'banned': sa.false(), 'opt_out': sa.false(), 'discount': sa.text('0')}
+    online_migrations.add_column('customers', sa.Column('notes', sa.Text()))
+    online_migrations.add_column('customers', sa.Column('banned', sa.Boolean(), server_default=defaults['banned']))
+    online_migrations.add_column('customers', sa.Column('opt_out', sa.Boolean(), server_default=defaults['opt_out']))
+    online_migrations.add_column('customers', sa.Column('discount', sa.Numeric(precision=5, scale=2),
+                                                        server_default=defaults['discount']))
+    online_migrations.backfill(
+        'customers',
+        {column: sa.func.coalesce(sa.column(column), default) for column, default in defaults.items()},
+        where='banned IS NULL OR opt_out IS NULL OR discount IS NULL',
+    )
+    for column in ('banned', 'opt_out', 'discount'):
+        online_migrations.set_not_null('customers', column)
 
 
 def downgrade() -> None:
@@ -0,0 +1,51 @@
+"""Add full-text search vectors over customer and contact notes
+
+Revision ID: 9a3e5c7d1b42
+Revises: f2c7a9e4b183
+Create Date: 2026-10-19 18:05:37.118264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.models.base import (CREATE_NOTES_SEARCH_FUNCTION_SQL, DROP_NOTES_SEARCH_FUNCTION_SQL, SEARCH_CONFIG,
+                             create_notes_search_trigger_sql, drop_notes_search_trigger_sql)
+from app.utils import online_migrations
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a3e5c7d1b42'
+down_revision: Union[str, None] = 'f2c7a9e4b183'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('customers', 'contacts')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # A plain column kept by a trigger rather than a stored generated
+    # column, which would rewrite each table under an exclusive lock
+    op.execute(CREATE_NOTES_SEARCH_FUNCTION_SQL)
+    for table in TABLES:
+        online_migrations.add_column(table, sa.Column('notes_tsv', postgresql.TSVECTOR()))
+        # The trigger covers writes made while existing rows are backfilled
+        op.execute(create_notes_search_trigger_sql(table))
+        online_migrations.backfill(
+            table,
+            {'notes_tsv': sa.text(f"to_tsvector('{SEARCH_CONFIG}', notes)")},
+            where='notes IS NOT NULL AND notes_tsv IS NULL',
+        )
+        online_migrations.create_index(f'ix_{table}_notes_tsv', table, ['notes_tsv'], postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        online_migrations.drop_index(f'ix_{table}_notes_tsv', table)
+        op.execute(drop_notes_search_trigger_sql(table))
+        op.drop_column(table, 'notes_tsv')
+    op.execute(DROP_NOTES_SEARCH_FUNCTION_SQL)
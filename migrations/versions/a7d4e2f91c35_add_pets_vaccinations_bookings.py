@@ -0,0 +1,125 @@
+"""Add pets, vaccinations, bookings and vaccination alerts
+
+Revision ID: a7d4e2f91c35
+Revises: 3f2b9c1d4e7a
+Create Date: 2026-10-19 11:02:17.542310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.models.base import create_updated_at_trigger_sql, drop_updated_at_trigger_sql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d4e2f91c35'
+down_revision: Union[str, None] = '3f2b9c1d4e7a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+species = sa.Enum('DOG', 'CAT', name='species')
+vaccine_type = sa.Enum('DHP', 'LEPTOSPIROSIS', 'KENNEL_COUGH', 'FELINE_FLU_ENTERITIS', name='vaccinetype')
+booking_status = sa.Enum('PROVISIONAL', 'CONFIRMED', 'CHECKED_IN', 'CHECKED_OUT', 'CANCELLED', name='bookingstatus')
+# Reuses the type created with the vaccinations table
+existing_vaccine_type = postgresql.ENUM(
+    'DHP', 'LEPTOSPIROSIS', 'KENNEL_COUGH', 'FELINE_FLU_ENTERITIS', name='vaccinetype', create_type=False
+)
+vaccination_issue = sa.Enum('MISSING', 'EXPIRED', 'EXPIRES_DURING_STAY', name='vaccinationissue')
+
+
+def _audit_columns():
+    return [
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'pets',
+        *_audit_columns(),
+        sa.Column('legacy_pet_no', sa.Integer(), nullable=True, unique=True),
+        sa.Column('customer_id', sa.Integer(), sa.ForeignKey('customers.id'), nullable=False),
+        sa.Column('name', sa.String(50), nullable=False),
+        sa.Column('species', species, nullable=False),
+        sa.Column('breed', sa.String(100), nullable=True),
+        sa.Column('date_of_birth', sa.Date(), nullable=True),
+        sa.Column('notes', sa.Text(), nullable=True),
+        sa.Column('vet_id', sa.Integer(), sa.ForeignKey('vets.id'), nullable=True),
+    )
+    op.create_index('ix_pets_customer_id', 'pets', ['customer_id'])
+
+    op.create_table(
+        'vaccinations',
+        *_audit_columns(),
+        sa.Column('pet_id', sa.Integer(), sa.ForeignKey('pets.id'), nullable=False),
+        sa.Column('vaccine_type', vaccine_type, nullable=False),
+        sa.Column('administered_on', sa.Date(), nullable=True),
+        sa.Column('expires_on', sa.Date(), nullable=True),
+    )
+    op.create_index(
+        'ix_vaccinations_pet_type_expires_on', 'vaccinations',
+        ['pet_id', 'vaccine_type', 'expires_on'],
+        postgresql_where=sa.text('expires_on IS NOT NULL'),
+    )
+
+    op.create_table(
+        'bookings',
+        *_audit_columns(),
+        sa.Column('legacy_booking_no', sa.Integer(), nullable=True, unique=True),
+        sa.Column('customer_id', sa.Integer(), sa.ForeignKey('customers.id'), nullable=False),
+        sa.Column('start_date', sa.Date(), nullable=False),
+        sa.Column('end_date', sa.Date(), nullable=False),
+        sa.Column('status', booking_status, nullable=False),
+        sa.Column('notes', sa.Text(), nullable=True),
+    )
+    op.create_index('ix_bookings_customer_id', 'bookings', ['customer_id'])
+    op.create_index('ix_bookings_dates', 'bookings', ['start_date', 'end_date'])
+
+    op.create_table(
+        'booking_pets',
+        sa.Column('booking_id', sa.Integer(), sa.ForeignKey('bookings.id'), primary_key=True),
+        sa.Column('pet_id', sa.Integer(), sa.ForeignKey('pets.id'), primary_key=True),
+    )
+    op.create_index('ix_booking_pets_pet_id', 'booking_pets', ['pet_id'])
+
+    op.create_table(
+        'vaccination_alerts',
+        sa.Column('booking_id', sa.Integer(), sa.ForeignKey('bookings.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('pet_id', sa.Integer(), sa.ForeignKey('pets.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('vaccine_type', existing_vaccine_type, primary_key=True),
+        sa.Column('issue', vaccination_issue, nullable=False),
+        sa.Column('expires_on', sa.Date(), nullable=True),
+        sa.Column('detected_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    )
+    op.create_index('ix_vaccination_alerts_pet_id', 'vaccination_alerts', ['pet_id'])
+
+    op.create_table(
+        'job_runs',
+        sa.Column('name', sa.String(50), primary_key=True),
+        sa.Column('last_run_at', sa.DateTime(timezone=True), nullable=False),
+    )
+
+    for table in ('pets', 'vaccinations', 'bookings'):
+        op.execute(create_updated_at_trigger_sql(table))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ('pets', 'vaccinations', 'bookings'):
+        op.execute(drop_updated_at_trigger_sql(table))
+
+    op.drop_table('job_runs')
+    op.drop_table('vaccination_alerts')
+    op.drop_table('booking_pets')
+    op.drop_table('bookings')
+    op.drop_table('vaccinations')
+    op.drop_table('pets')
+
+    for enum in (vaccination_issue, booking_status, vaccine_type, species):
+        enum.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,112 @@
+"""Add employees, shift types, leave and shift assignments
+
+Revision ID: b4e9d2a7c610
+Revises: 5d1c7b3e9f20
+Create Date: 2026-10-19 16:02:11.483920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.base import create_updated_at_trigger_sql, drop_updated_at_trigger_sql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4e9d2a7c610'
+down_revision: Union[str, None] = '5d1c7b3e9f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('employees', 'shift_types', 'leave_requests', 'shift_assignments')
+
+skill = sa.Enum('DOG_HANDLING', 'CAT_CARE', 'MEDICATION', 'RECEPTION', name='skill')
+leave_status = sa.Enum('REQUESTED', 'APPROVED', 'REJECTED', name='leavestatus')
+
+
+def _audit_columns():
+    return [
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'employees',
+        *_audit_columns(),
+        sa.Column('first_name', sa.String(100), nullable=False),
+        sa.Column('last_name', sa.String(100), nullable=False),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True, unique=True),
+        sa.Column('max_hours_per_week', sa.Numeric(4, 1), nullable=False, server_default='40'),
+        sa.Column('active', sa.Boolean(), nullable=False, server_default=sa.true()),
+    )
+
+    op.create_table(
+        'employee_skills',
+        sa.Column('employee_id', sa.Integer(), sa.ForeignKey('employees.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('skill', skill, primary_key=True),
+    )
+
+    op.create_table(
+        'shift_types',
+        *_audit_columns(),
+        sa.Column('name', sa.String(50), nullable=False, unique=True),
+        sa.Column('start_time', sa.Time(), nullable=False),
+        sa.Column('end_time', sa.Time(), nullable=False),
+        sa.Column('min_staff', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('load_factor', sa.Numeric(3, 2), nullable=False, server_default='1'),
+    )
+
+    op.create_table(
+        'employee_availability',
+        sa.Column('employee_id', sa.Integer(), sa.ForeignKey('employees.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('weekday', sa.Integer(), primary_key=True),
+        sa.Column('shift_type_id', sa.Integer(), sa.ForeignKey('shift_types.id', ondelete='CASCADE'),
+                  primary_key=True),
+    )
+
+    op.create_table(
+        'leave_requests',
+        *_audit_columns(),
+        sa.Column('employee_id', sa.Integer(), sa.ForeignKey('employees.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('start_date', sa.Date(), nullable=False),
+        sa.Column('end_date', sa.Date(), nullable=False),
+        sa.Column('status', leave_status, nullable=False, server_default='REQUESTED'),
+    )
+    op.create_index('ix_leave_requests_employee_dates', 'leave_requests', ['employee_id', 'start_date', 'end_date'])
+
+    op.create_table(
+        'shift_assignments',
+        *_audit_columns(),
+        sa.Column('employee_id', sa.Integer(), sa.ForeignKey('employees.id'), nullable=False),
+        sa.Column('shift_type_id', sa.Integer(), sa.ForeignKey('shift_types.id'), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('locked', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.UniqueConstraint('employee_id', 'date', 'shift_type_id', name='uq_shift_assignments_employee_date_shift'),
+    )
+    op.create_index('ix_shift_assignments_date', 'shift_assignments', ['date'])
+
+    for table in TABLES:
+        op.execute(create_updated_at_trigger_sql(table))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        op.execute(drop_updated_at_trigger_sql(table))
+
+    op.drop_index('ix_shift_assignments_date', table_name='shift_assignments')
+    op.drop_table('shift_assignments')
+    op.drop_index('ix_leave_requests_employee_dates', table_name='leave_requests')
+    op.drop_table('leave_requests')
+    op.drop_table('employee_availability')
+    op.drop_table('shift_types')
+    op.drop_table('employee_skills')
+    op.drop_table('employees')
+
+    for enum in (leave_status, skill):
+        enum.drop(op.get_bind(), checkfirst=True)
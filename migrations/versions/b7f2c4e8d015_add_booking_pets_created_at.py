@@ -0,0 +1,30 @@
+"""Add created_at to booking_pets
+
+Revision ID: b7f2c4e8d015
+Revises: 6c1f8e3a5d27
+Create Date: 2026-10-19 20:31:09.118402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7f2c4e8d015'
+down_revision: Union[str, None] = '6c1f8e3a5d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # now() is evaluated once, so existing rows take the migration time without a rewrite
+    op.add_column('booking_pets', sa.Column('created_at', sa.DateTime(timezone=True),
+                                            server_default=sa.text('now()'), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('booking_pets', 'created_at')
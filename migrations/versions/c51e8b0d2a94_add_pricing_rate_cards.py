@@ -0,0 +1,74 @@
+"""Add pricing rate cards: seasons, rates, multi-pet discounts
+
+Revision ID: c51e8b0d2a94
+Revises: a7d4e2f91c35
+Create Date: 2026-10-19 12:26:51.903114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.models.base import create_updated_at_trigger_sql, drop_updated_at_trigger_sql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c51e8b0d2a94'
+down_revision: Union[str, None] = 'a7d4e2f91c35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('seasons', 'rates', 'multi_pet_discounts')
+
+run_type = sa.Enum('KENNEL', 'DELUXE_KENNEL', 'CATTERY', 'CATTERY_SUITE', name='runtype')
+# Created with the pets table
+species = postgresql.ENUM('DOG', 'CAT', name='species', create_type=False)
+
+
+def _audit_columns():
+    return [
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'seasons',
+        *_audit_columns(),
+        sa.Column('name', sa.String(50), nullable=False),
+        sa.Column('band', sa.String(20), nullable=False),
+        sa.Column('start_date', sa.Date(), nullable=False),
+        sa.Column('end_date', sa.Date(), nullable=False),
+        sa.Column('priority', sa.Integer(), nullable=False, server_default='0'),
+    )
+    op.create_table(
+        'rates',
+        *_audit_columns(),
+        sa.Column('band', sa.String(20), nullable=False),
+        sa.Column('species', species, nullable=False),
+        sa.Column('run_type', run_type, nullable=False),
+        sa.Column('nightly_rate', sa.Numeric(precision=8, scale=2), nullable=False),
+        sa.UniqueConstraint('band', 'species', 'run_type', name='uq_rates_band_species_run_type'),
+    )
+    op.create_table(
+        'multi_pet_discounts',
+        *_audit_columns(),
+        sa.Column('min_pets', sa.Integer(), nullable=False, unique=True),
+        sa.Column('percent', sa.Numeric(precision=5, scale=2), nullable=False),
+    )
+
+    for table in TABLES:
+        op.execute(create_updated_at_trigger_sql(table))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        op.execute(drop_updated_at_trigger_sql(table))
+        op.drop_table(table)
+    run_type.drop(op.get_bind(), checkfirst=True)
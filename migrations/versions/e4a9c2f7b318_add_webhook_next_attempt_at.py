@@ -0,0 +1,29 @@
+"""Add next_attempt_at to webhook_events
+
+Revision ID: e4a9c2f7b318
+Revises: b7f2c4e8d015
+Create Date: 2026-10-19 22:06:43.507129
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a9c2f7b318'
+down_revision: Union[str, None] = 'b7f2c4e8d015'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Nullable without a default: no table rewrite, and existing events are due now
+    op.add_column('webhook_events', sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('webhook_events', 'next_attempt_at')
@@ -0,0 +1,73 @@
+"""Add runs and run allocations
+
+Revision ID: f2c7a9e4b183
+Revises: b4e9d2a7c610
+Create Date: 2026-10-19 17:21:45.902311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.models.base import create_updated_at_trigger_sql, drop_updated_at_trigger_sql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c7a9e4b183'
+down_revision: Union[str, None] = 'b4e9d2a7c610'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('runs', 'run_allocations')
+
+# Created with the rate cards
+run_type = postgresql.ENUM('KENNEL', 'DELUXE_KENNEL', 'CATTERY', 'CATTERY_SUITE', name='runtype', create_type=False)
+
+
+def _audit_columns():
+    return [
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'runs',
+        *_audit_columns(),
+        sa.Column('code', sa.String(20), nullable=False, unique=True),
+        sa.Column('run_type', run_type, nullable=False),
+        sa.Column('capacity', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('active', sa.Boolean(), nullable=False, server_default=sa.true()),
+    )
+
+    op.create_table(
+        'run_allocations',
+        *_audit_columns(),
+        sa.Column('booking_id', sa.Integer(), sa.ForeignKey('bookings.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('pet_id', sa.Integer(), sa.ForeignKey('pets.id'), nullable=False),
+        sa.Column('run_id', sa.Integer(), sa.ForeignKey('runs.id'), nullable=False),
+        sa.Column('start_date', sa.Date(), nullable=False),
+        sa.Column('end_date', sa.Date(), nullable=False),
+        sa.Column('locked', sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+    op.create_index('ix_run_allocations_booking_id', 'run_allocations', ['booking_id'])
+    op.create_index('ix_run_allocations_run_dates', 'run_allocations', ['run_id', 'start_date', 'end_date'])
+
+    for table in TABLES:
+        op.execute(create_updated_at_trigger_sql(table))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        op.execute(drop_updated_at_trigger_sql(table))
+
+    op.drop_index('ix_run_allocations_run_dates', table_name='run_allocations')
+    op.drop_index('ix_run_allocations_booking_id', table_name='run_allocations')
+    op.drop_table('run_allocations')
+    op.drop_table('runs')
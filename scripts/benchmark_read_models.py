@@ -0,0 +1,95 @@
+"""
+Compare loading customers as ORM instances and as read-model records.
+
+    python scripts/benchmark_read_models.py [--rows 50000] [--url postgresql://...]
+
+Without --url an in-memory SQLite database is used. Each household gets a
+primary contact; both loaders fetch customers with their primary contacts
+(the ORM with ``selectinload``) and each load is timed, then repeated
+under tracemalloc to measure its peak memory.
+"""
+
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Add the app directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session, selectinload
+
+from app.models import Base, Contact, Customer, CustomerContact
+from app.models.customer import ContactRole
+from app.services.read_models import load_customers
+
+
+def populate(engine, rows):
+    customers = [{'id': n, 'legacy_cust_no': n, 'street': f"{n} High Street", 'town': 'Cumbernauld',
+                  'postcode': 'G67 1AA', 'banned': False, 'opt_out': False, 'discount': 0}
+                 for n in range(1, rows + 1)]
+    contacts = [{'id': n, 'first_name': 'Pat', 'last_name': f"Owner{n}", 'email_address': f"owner{n}@example.com"}
+                for n in range(1, rows + 1)]
+    links = [{'customer_id': n, 'contact_id': n, 'role': ContactRole.PRIMARY.name} for n in range(1, rows + 1)]
+    with engine.begin() as connection:
+        connection.execute(insert(Customer.__table__), customers)
+        connection.execute(insert(Contact.__table__), contacts)
+        connection.execute(insert(CustomerContact.__table__), links)
+
+
+def load_orm(session):
+    customers = session.scalars(
+        select(Customer).options(selectinload(Customer.contact_associations).selectinload(CustomerContact.contact))
+        .order_by(Customer.id)
+    ).all()
+    return [(c.display_ref, c.get_full_address(), c.primary_contacts[0].last_name) for c in customers], customers
+
+
+def load_records(session):
+    customers = load_customers(session)
+    return [(c.display_ref, c.get_full_address(), c.primary_contact.last_name) for c in customers], customers
+
+
+def measure(engine, loader):
+    """Time a load, then repeat it under tracemalloc for its peak memory."""
+    gc.collect()
+    with Session(engine) as session:
+        started = time.perf_counter()
+        output, _ = loader(session)
+        elapsed = time.perf_counter() - started
+
+    gc.collect()
+    with Session(engine) as session:
+        tracemalloc.start()
+        loader(session)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return output, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--url', default='sqlite://')
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    Base.metadata.create_all(engine)
+    populate(engine, args.rows)
+
+    orm_output, orm_time, orm_peak = measure(engine, load_orm)
+    rows_output, rows_time, rows_peak = measure(engine, load_records)
+    assert orm_output == rows_output
+
+    print(f"{args.rows} customers with primary contacts")
+    print(f"{'':8} {'seconds':>8} {'peak MiB':>9}")
+    print(f"{'ORM':8} {orm_time:8.2f} {orm_peak / 2**20:9.1f}")
+    print(f"{'records':8} {rows_time:8.2f} {rows_peak / 2**20:9.1f}")
+    print(f"{'ratio':8} {orm_time / rows_time:7.1f}x {orm_peak / rows_peak:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
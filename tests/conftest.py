@@ -0,0 +1,146 @@
+"""
+Shared pytest fixtures.
+
+PostgreSQL-backed tests use a per-worker database cloned from a template:
+
+- the schema is created once from `Base.metadata` into a template database
+  named after a fingerprint of the schema DDL, so it is rebuilt only when
+  the models change
+- each pytest-xdist worker (or the single process without xdist) clones
+  it with ``CREATE DATABASE ... TEMPLATE``, which copies files rather than
+  replaying DDL
+- each test runs inside a transaction on the shared `app.database.Session`
+  that is rolled back afterwards; commits inside the test only release a
+  SAVEPOINT
+
+The database is taken from ``TEST_DATABASE_URL`` or the test config
+(``config/yaml/test.yaml`` plus secrets). Tests needing it are skipped
+when no PostgreSQL server is reachable.
+"""
+
+import hashlib
+import os
+
+import pytest
+from sqlalchemy import create_engine, create_mock_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+
+import app.models  # noqa: F401 - registers every model on Base.metadata
+from app.models.base import Base
+
+# Serializes template creation and cloning across xdist workers
+TEMPLATE_LOCK_ID = 0x6372_6f77
+
+
+def _test_database_url():
+    url = os.getenv('TEST_DATABASE_URL')
+    if url:
+        return make_url(url)
+    from app.utils.yaml_config import load_config
+    uri = load_config('test')['nested'].get('sqlalchemy', {}).get('database_uri')
+    return make_url(uri) if uri else None
+
+
+def schema_fingerprint(metadata=Base.metadata) -> str:
+    """
+    Hash of the DDL the metadata would emit, used to name the template database.
+
+    Captured from a mock PostgreSQL engine, so it includes the trigger
+    functions and triggers created by metadata events as well as tables
+    and indexes.
+    """
+    digest = hashlib.sha1()
+
+    def record(statement, *multiparams, **params):
+        digest.update(str(statement.compile(dialect=engine.dialect)).encode('utf-8'))
+
+    engine = create_mock_engine(make_url('postgresql://'), record)
+    metadata.create_all(engine, checkfirst=False)
+    return digest.hexdigest()[:10]
+
+
+def _database_exists(connection, name: str) -> bool:
+    return connection.scalar(text("SELECT 1 FROM pg_database WHERE datname = :name"), {'name': name}) is not None
+
+
+def _create_template(url, name: str) -> None:
+    engine = create_engine(url.set(database=name))
+    try:
+        Base.metadata.create_all(engine)
+    finally:
+        engine.dispose()
+
+
+@pytest.fixture(scope='session')
+def postgres_url():
+    """URL of this worker's freshly cloned test database."""
+    base_url = _test_database_url()
+    if base_url is None:
+        pytest.skip("No PostgreSQL test database configured")
+
+    maintenance = create_engine(base_url.set(database='postgres'), isolation_level='AUTOCOMMIT')
+    try:
+        connection = maintenance.connect()
+    except OperationalError:
+        maintenance.dispose()
+        pytest.skip("PostgreSQL test server not reachable")
+
+    template = f"{base_url.database}_template_{schema_fingerprint()}"
+    worker = os.getenv('PYTEST_XDIST_WORKER', 'main')
+    database = f"{base_url.database}_{worker}"
+
+    with connection:
+        connection.execute(text("SELECT pg_advisory_lock(:id)"), {'id': TEMPLATE_LOCK_ID})
+        try:
+            if not _database_exists(connection, template):
+                stale = connection.scalars(
+                    text("SELECT datname FROM pg_database WHERE datname LIKE :pattern"),
+                    {'pattern': f"{base_url.database}_template_%"},
+                ).all()
+                for name in stale:
+                    connection.execute(text(f'DROP DATABASE IF EXISTS "{name}"'))
+                connection.execute(text(f'CREATE DATABASE "{template}"'))
+                try:
+                    _create_template(base_url, template)
+                except Exception:
+                    connection.execute(text(f'DROP DATABASE IF EXISTS "{template}"'))
+                    raise
+            connection.execute(text(f'DROP DATABASE IF EXISTS "{database}"'))
+            connection.execute(text(f'CREATE DATABASE "{database}" TEMPLATE "{template}"'))
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:id)"), {'id': TEMPLATE_LOCK_ID})
+
+    yield base_url.set(database=database)
+
+    with maintenance.connect() as connection:
+        connection.execute(text(f'DROP DATABASE IF EXISTS "{database}"'))
+    maintenance.dispose()
+
+
+@pytest.fixture(scope='session')
+def postgres_engine(postgres_url):
+    """Engine on this worker's test database."""
+    engine = create_engine(postgres_url)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(postgres_engine):
+    """
+    The shared `app.database.Session`, bound to a transaction rolled back after the test.
+    """
+    from app.database import Session, engine as default_engine
+
+    connection = postgres_engine.connect()
+    transaction = connection.begin()
+    Session.remove()
+    Session.configure(bind=connection, join_transaction_mode='create_savepoint')
+    try:
+        yield Session
+    finally:
+        Session.remove()
+        transaction.rollback()
+        connection.close()
+        Session.configure(bind=default_engine, join_transaction_mode='conservative_savepoint')
@@ -0,0 +1,136 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.ai_gateway import (
+    AIError, AIGateway, Completion, LocalBackend, PromptRegistry, PromptTemplate, ResponseCache,
+)
+
+
+def make_gateway(backend=None, **kwargs):
+    prompts = PromptRegistry()
+    prompts.register(PromptTemplate('caption', 'captions', "Caption for {name}, a {species}."))
+    prompts.register(PromptTemplate('draft', 'email', "Email {first_name} about {purpose}."))
+    return AIGateway(backend or LocalBackend(), registry=prompts, **kwargs)
+
+
+class TrackingBackend(LocalBackend):
+    """Local stand-in that records how many calls overlap."""
+
+    def __init__(self, delay=0.02):
+        super().__init__(delay)
+        self.active = self.peak = 0
+
+    async def complete(self, prompt, **kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            if 'fail' in prompt:
+                raise RuntimeError('model overloaded')
+            return await super().complete(prompt, **kwargs)
+        finally:
+            self.active -= 1
+
+
+def test_repeated_prompts_are_answered_from_cache():
+    gateway = make_gateway()
+    try:
+        first = gateway.generate_sync('caption', {'name': 'Rex', 'species': 'dog'})
+        again = gateway.generate_sync('caption', {'species': 'dog', 'name': 'Rex'})
+        other = gateway.generate_sync('caption', {'name': 'Tibbles', 'species': 'cat'})
+
+        assert again == first._replace(cached=True) and not first.cached
+        assert other.text != first.text
+        assert gateway.backend.calls == 2
+        stats = gateway.metrics()['captions']
+        assert (stats.requests, stats.cache_hits, stats.model_calls) == (3, 1, 2)
+        assert stats.output_tokens == len(first.text.split()) + len(other.text.split())
+
+        with pytest.raises(AIError, match='needs input'):
+            gateway.generate_sync('caption', {'name': 'Rex'})
+    finally:
+        gateway.close()
+
+
+def test_identical_prompts_in_flight_share_one_call():
+    gateway = make_gateway(TrackingBackend(delay=0.05))
+
+    async def burst():
+        return await asyncio.gather(*(gateway.generate('draft', {'first_name': 'Ann', 'purpose': 'vaccinations'})
+                                      for _ in range(5)))
+
+    try:
+        answers = asyncio.run(burst())
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            gateway.generate_sync('draft', {'first_name': 'Bob', 'purpose': 'pick-up'}))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        gateway.close()
+
+    assert len({answer.text for answer in answers}) == 1 and len(results) == 4
+    assert gateway.backend.calls == 2
+    stats = gateway.metrics()['email']
+    assert stats.coalesced + stats.cache_hits == 7
+
+
+def test_cancelling_the_first_caller_leaves_the_others_waiting():
+    gateway = make_gateway(TrackingBackend(delay=0.1))
+    inputs = {'first_name': 'Ann', 'purpose': 'vaccinations'}
+
+    async def run():
+        first = asyncio.ensure_future(gateway.generate('draft', inputs))
+        await asyncio.sleep(0.02)
+        followers = [asyncio.ensure_future(gateway.generate('draft', inputs)) for _ in range(3)]
+        await asyncio.sleep(0.02)
+        first.cancel()
+        return await asyncio.gather(*followers)
+
+    try:
+        answers = asyncio.run(run())
+        assert gateway.generate_sync('draft', inputs).cached
+    finally:
+        gateway.close()
+    assert len({answer.text for answer in answers}) == 1
+    assert gateway.backend.calls == 1
+
+
+def test_concurrency_limits_and_failures():
+    gateway = make_gateway(TrackingBackend(), max_concurrency=3, features={'captions': {'max_concurrency': 2}})
+
+    async def run():
+        return await asyncio.gather(*(gateway.generate('caption', {'name': f"Pet{n}", 'species': 'dog'})
+                                      for n in range(8)))
+
+    try:
+        asyncio.run(run())
+        assert gateway.backend.peak == 2
+
+        with pytest.raises(AIError, match='model overloaded'):
+            gateway.generate_sync('caption', {'name': 'fail', 'species': 'dog'})
+        with pytest.raises(AIError):
+            gateway.generate_sync('caption', {'name': 'fail', 'species': 'dog'})  # Failures are not cached
+    finally:
+        gateway.close()
+    stats = gateway.metrics()['captions']
+    assert (stats.model_calls, stats.errors) == (8, 2)
+    assert 0 < stats.latency_p50 <= stats.latency_p95
+
+
+def test_cache_evicts_by_count_size_and_age():
+    answer = Completion('x' * 10, 1, 1, 'm')
+    cache = ResponseCache(max_entries=2, max_bytes=25)
+    for key in 'abc':
+        cache.set(key, answer, ttl=60)
+    assert cache.get('a') is None and len(cache) == 2
+
+    cache.get('b')
+    cache.set('d', answer._replace(text='y' * 12), ttl=60)  # Over 25 bytes: the least recent goes
+    assert cache.get('c') is None and cache.get('b') == answer and cache.size == 22
+
+    cache.set('e', answer, ttl=-1)
+    assert cache.get('e') is None
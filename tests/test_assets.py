@@ -0,0 +1,53 @@
+import gzip
+import json
+
+import pytest
+
+from app import create_app
+from app.utils.assets import asset_url, build_assets
+
+
+@pytest.fixture
+def static_folder(tmp_path):
+    static = tmp_path / 'static'
+    (static / 'css').mkdir(parents=True)
+    (static / 'css' / 'app.css').write_text('body { margin: 0; }\n' * 200)
+    (static / 'logo.png').write_bytes(b'\x89PNG fake image data')
+    return static
+
+
+def test_build_assets_fingerprints_and_compresses(static_folder, tmp_path):
+    build = tmp_path / 'build'
+
+    manifest = build_assets(str(static_folder), str(build))
+
+    hashed_css = manifest['css/app.css']
+    assert hashed_css.startswith('css/app.') and hashed_css.endswith('.css')
+    assert (build / hashed_css).read_bytes() == (static_folder / 'css' / 'app.css').read_bytes()
+    assert gzip.decompress((build / (hashed_css + '.gz')).read_bytes()) == (build / hashed_css).read_bytes()
+    # Images are not compressed
+    assert not (build / (manifest['logo.png'] + '.gz')).exists()
+    assert json.loads((build / 'manifest.json').read_text()) == manifest
+
+
+def test_hashed_assets_served_precompressed_and_immutable(static_folder, tmp_path):
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+    build = tmp_path / 'build'
+    app.extensions['asset_settings']['build_folder'] = str(build)
+    app.extensions['asset_manifest'] = build_assets(str(static_folder), str(build))
+
+    with app.test_request_context():
+        url = asset_url('css/app.css')
+        assert asset_url('missing.js') == '/static/missing.js'
+
+    client = app.test_client()
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.mimetype == 'text/css'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'max-age=31536000' in response.headers['Cache-Control']
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+    plain = client.get(url)
+    assert 'Content-Encoding' not in plain.headers
@@ -0,0 +1,96 @@
+import pytest
+from sqlalchemy import event
+
+from app import create_app
+from app.extensions import db
+from app.models import Base, Permission, Role, User
+from app.services import auth
+from app.services.auth import PasswordHasher, permission_required
+
+
+@pytest.fixture
+def auth_app():
+    # Not named `app`, so pytest-flask doesn't hold one app context (and
+    # ORM session) open across the test's requests
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SECRET_KEY': 'test'})
+    app.extensions['password_hasher'] = PasswordHasher('pbkdf2:sha256:1000')
+
+    with app.app_context():
+        Base.metadata.create_all(db.engine)
+        view = Permission(name='bookings.view')
+        edit = Permission(name='bookings.edit')
+        db.session.add(User(username='kennel', password_hash=auth.get_password_hasher().hash('woof'),
+                            roles=[Role(name='staff', permissions=[view])]))
+        db.session.add(Role(name='manager', permissions=[view, edit]))
+        db.session.commit()
+
+    @app.route('/login/<username>')
+    def login(username):
+        user = auth.authenticate(db.session, username, 'woof')
+        auth.login(db.session, user)
+        return 'ok'
+
+    @app.route('/bookings/edit')
+    @permission_required('bookings.edit')
+    def edit_booking():
+        return 'edited'
+
+    return app
+
+
+def count_queries(app):
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_permissions_cached_until_roles_change(auth_app):
+    app = auth_app
+    client = app.test_client()
+    client.get('/login/kennel')
+    assert client.get('/bookings/edit').status_code == 403
+
+    statements = count_queries(app)
+    client.get('/bookings/edit')
+    # Only Flask-Login's user load; no role joins
+    assert not any('role_permissions' in s for s in statements)
+
+    with app.app_context():
+        user = db.session.get(User, 1)
+        user.roles.append(db.session.query(Role).filter_by(name='manager').one())
+        db.session.commit()
+
+    assert client.get('/bookings/edit').data == b'edited'
+
+
+def test_role_permission_change_bumps_member_versions(auth_app):
+    app = auth_app
+    with app.app_context():
+        version = db.session.get(User, 1).permissions_version
+        staff = db.session.query(Role).filter_by(name='staff').one()
+        staff.permissions.append(db.session.query(Permission).filter_by(name='bookings.edit').one())
+        db.session.commit()
+
+        assert db.session.get(User, 1).permissions_version == version + 1
+
+
+def test_wrong_password_and_rehash(auth_app):
+    app = auth_app
+    with app.app_context():
+        assert auth.authenticate(db.session, 'kennel', 'meow') is None
+        assert auth.authenticate(db.session, 'nobody', 'woof') is None
+
+        app.extensions['password_hasher'] = PasswordHasher('pbkdf2:sha256:2000')
+        user = auth.authenticate(db.session, 'kennel', 'woof')
+        assert user.password_hash.startswith('pbkdf2:sha256:2000$')
+
+
+def test_bcrypt_cost_is_configurable():
+    pytest.importorskip('bcrypt')
+    hasher = PasswordHasher('bcrypt', rounds=4)
+    hashed = hasher.hash('woof')
+
+    assert hasher.verify(hashed, 'woof')
+    assert not hasher.needs_rehash(hashed)
+    assert PasswordHasher('bcrypt', rounds=5).needs_rehash(hashed)
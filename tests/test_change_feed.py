@@ -0,0 +1,115 @@
+import pytest
+from sqlalchemy.orm import Session
+
+from app import create_app
+from app.extensions import db
+from app.models import Base, Customer
+from app.utils import change_feed
+from app.utils.change_feed import ChangeHub, ChangeListener, feed
+
+
+@pytest.fixture
+def feed_app():
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SECRET_KEY': 'test',
+                      'LOGIN_DISABLED': True})
+    with app.app_context():
+        Base.metadata.create_all(db.engine)
+    yield app
+    feed.configure({})
+
+
+def drain(subscriber):
+    items = []
+    while not subscriber.empty():
+        items.append(subscriber.get_nowait()[1])
+    return items
+
+
+def test_hub_resyncs_slow_subscribers_and_replays_on_reconnect():
+    hub = ChangeHub(queue_size=2, history=4)
+    slow = hub.subscribe()
+    ids = [hub.publish({'t': 'bookings', 'id': n}) for n in range(3)]
+    assert drain(slow) == [{'t': 'resync'}]
+
+    assert drain(hub.subscribe(last_event_id=ids[1])) == [{'t': 'bookings', 'id': 2}]
+    for n in range(3, 8):
+        hub.publish({'t': 'bookings', 'id': n})
+    # Events after ids[1] have dropped out of the history
+    assert drain(hub.subscribe(last_event_id=ids[1])) == [{'t': 'resync'}]
+
+
+def test_hub_resyncs_ids_it_did_not_send():
+    hub, other = ChangeHub(), ChangeHub()
+    last_id = hub.publish({'t': 'bookings', 'id': 1})
+    assert drain(hub.subscribe(last_event_id=last_id)) == []
+
+    # Another worker (or this one before a restart), whether behind or ahead
+    for n in range(3):
+        other.publish({'t': 'bookings', 'id': n})
+    assert drain(hub.subscribe(last_event_id=other.publish({'t': 'bookings', 'id': 3}))) == [{'t': 'resync'}]
+    assert drain(hub.subscribe(last_event_id=1)) == [{'t': 'resync'}]
+    assert drain(hub.subscribe(last_event_id=last_id + 5)) == [{'t': 'resync'}]
+
+
+def test_commits_publish_watched_changes_only(feed_app):
+    subscriber = feed.hub.subscribe()
+    with feed_app.app_context():
+        customer = Customer(legacy_cust_no=1)
+        db.session.add(customer)
+        db.session.commit()
+        assert drain(subscriber) == [{'t': 'customers', 'id': customer.id, 'op': 'i'}]
+
+        customer.notes = 'Prefers morning drop-off'
+        db.session.commit()
+        assert drain(subscriber) == []
+
+        customer.banned = True
+        db.session.flush()
+        db.session.rollback()
+        assert drain(subscriber) == []
+
+        customer.banned = True
+        db.session.commit()
+        assert drain(subscriber) == [{'t': 'customers', 'id': customer.id, 'op': 'u', 'c': ['banned']}]
+
+
+def test_events_endpoint_streams_requested_tables(feed_app):
+    torn_down = []
+    feed_app.teardown_appcontext(torn_down.append)
+    response = feed_app.test_client().get('/events?tables=customers', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    stream = iter(response.response)
+    assert next(stream) == b'retry: 2000\n\n'
+    assert torn_down  # The request (and its database session) ended before streaming
+
+    feed.hub.publish({'t': 'bookings', 'id': 1, 'op': 'i'})
+    event_id = feed.hub.publish({'t': 'customers', 'id': 7, 'op': 'u', 'c': ['banned']})
+    assert next(stream).decode() == (f'id: {event_id}\nevent: customers\n'
+                                     'data: {"t":"customers","id":7,"op":"u","c":["banned"]}\n\n')
+    response.close()
+    assert feed.hub.subscriber_count == 0
+
+
+def test_notify_reaches_listener(postgres_engine):
+    feed.configure({'customers': ['banned']})
+    listener = ChangeListener(postgres_engine, feed.channel, feed.hub, poll_interval=0.1)
+    subscriber = feed.hub.subscribe()
+    listener.start()
+    try:
+        assert listener.listening.wait(5)
+        with Session(postgres_engine) as session:
+            customer = Customer(legacy_cust_no=990001)
+            session.add(customer)
+            session.commit()
+            _, change = subscriber.get(timeout=5)
+            assert change == {'t': 'customers', 'id': customer.id, 'op': 'i'}
+            session.delete(customer)
+            session.commit()
+    finally:
+        listener.stop(timeout=5)
+        feed.configure({})
+
+
+def test_payloads_fit_notify_limit():
+    change = {'t': 'bookings', 'id': 1, 'op': 'u', 'c': ['x' * 50] * 200}
+    assert change_feed.encode(change) == '{"t":"bookings","id":1,"op":"u"}'
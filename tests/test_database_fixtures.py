@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, MetaData, String, Table, func, select
+
+from app.models import Customer, base
+from tests.conftest import schema_fingerprint
+
+
+def test_schema_fingerprint_tracks_ddl():
+    metadata = MetaData()
+    table = Table('widgets', metadata, Column('id', Integer, primary_key=True))
+    before = schema_fingerprint(metadata)
+
+    assert schema_fingerprint(metadata) == before
+    table.append_column(Column('name', String(20)))
+    assert schema_fingerprint(metadata) != before
+
+
+def test_schema_fingerprint_tracks_trigger_ddl(monkeypatch):
+    before = schema_fingerprint()
+    monkeypatch.setattr(base, 'create_updated_at_trigger_sql',
+                        lambda table_name: f"CREATE TRIGGER {table_name}_updated_at BEFORE INSERT OR UPDATE ON {table_name}")
+    assert schema_fingerprint() != before
+
+
+def test_commits_inside_a_test_are_rolled_back(db_session):
+    db_session.add(Customer(notes='Savepoint'))
+    db_session.commit()
+
+    assert db_session.scalar(select(func.count()).select_from(Customer)) == 1
+
+
+def test_previous_test_left_nothing_behind(db_session):
+    assert db_session.scalar(select(func.count()).select_from(Customer)) == 0
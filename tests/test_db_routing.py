@@ -0,0 +1,59 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.utils.db_routing import ReplicaMonitor, RoutingSession, read_only, read_only_session
+
+
+class StubMonitor(ReplicaMonitor):
+    """Replica monitor reporting a fixed lag instead of querying PostgreSQL."""
+
+    def __init__(self, engine, lag):
+        super().__init__(engine, max_lag_seconds=5, check_interval=60)
+        self.lag = lag
+        self.checks = 0
+
+    def measure_lag(self):
+        self.checks += 1
+        return self.lag
+
+
+def make_session(lag):
+    primary = create_engine('sqlite://')
+    replica = create_engine('sqlite://')
+    monitor = StubMonitor(replica, lag)
+    factory = sessionmaker(bind=primary, class_=RoutingSession,
+                           info={'replica_monitor': monitor})
+    return factory(), primary, replica, monitor
+
+
+def test_reads_route_to_replica_only_when_declared():
+    session, primary, replica, monitor = make_session(lag=0)
+
+    assert session.get_bind() is primary
+    with read_only():
+        assert session.get_bind() is replica
+        assert session.get_bind() is replica
+    assert session.get_bind() is primary
+
+    # Lag is measured once per check interval, not per query
+    assert monitor.checks == 1
+
+
+def test_decorator_declares_read_only_unit():
+    session, primary, replica, _ = make_session(lag=0)
+
+    @read_only_session
+    def report():
+        return session.get_bind()
+
+    assert report() is replica
+
+
+def test_lagging_or_unreachable_replica_falls_back_to_primary():
+    session, primary, _, _ = make_session(lag=30)
+    with read_only():
+        assert session.get_bind() is primary
+
+    session, primary, _, _ = make_session(lag=None)
+    with read_only():
+        assert session.get_bind() is primary
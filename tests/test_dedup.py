@@ -0,0 +1,103 @@
+from decimal import Decimal
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app.models import Base, Booking, Contact, Customer, CustomerContact, Pet
+from app.models.customer import ContactRole
+from app.models.pet import Species
+from app.services import dedup
+from app.services.dedup import Record, candidate_pairs, find_duplicates, normalize_phone, soundex
+
+
+def make_session():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    return Session(engine)
+
+
+def household(session, legacy_no, first, last, phone, email, street, postcode, role=ContactRole.PRIMARY):
+    customer = Customer(legacy_cust_no=legacy_no, street=street, postcode=postcode)
+    contact = Contact(first_name=first, last_name=last, phone_number=phone, email_address=email)
+    customer.contact_associations.append(CustomerContact(contact=contact, role=role))
+    session.add(customer)
+    return customer, contact
+
+
+def test_normalization_and_soundex():
+    assert normalize_phone('+44 (0131) 555-1234') == normalize_phone('0131 555 1234')
+    assert normalize_phone('555') == ''
+    assert soundex('robert') == soundex('rupert') == 'R163'
+    assert soundex('ashcraft') == 'A261'
+
+
+def test_blocking_only_pairs_records_sharing_a_key():
+    records = [
+        Record(1, frozenset(), frozenset({'01315551234'}), 'EH11AA', '', 'ann', frozenset({'smith'})),
+        Record(2, frozenset(), frozenset({'01315551234'}), '', '', 'ann', frozenset({'smyth'})),
+        Record(3, frozenset(), frozenset(), 'G11AA', '', 'bob', frozenset({'jones'})),
+    ]
+
+    assert candidate_pairs(records) == {(1, 2)}
+    assert candidate_pairs(records, max_block_size=1) == set()
+
+
+def test_finds_and_merges_duplicate_households():
+    session = make_session()
+    keep, ann = household(session, 101, 'Ann', 'Smith', '0131 555 1234', 'ann@example.com',
+                          '1 High Street', 'EH1 1AA')
+    dupe, ann_again = household(session, 202, 'Anne', 'Smyth', '+44 131 555 1234', None,
+                                '1 High St', 'eh11aa')
+    household(session, 303, 'Bob', 'Jones', '0141 555 9999', 'bob@example.com', '2 Low Road', 'G1 1AA')
+    dupe.banned = True
+    dupe.discount = Decimal('10')
+    dupe.pets.append(Pet(name='Rex', species=Species.DOG))
+    shared = Contact(first_name='Neighbour', last_name='Kind', phone_number='0131 555 0000')
+    for customer in (keep, dupe):
+        customer.contact_associations.append(CustomerContact(contact=shared, role=ContactRole.EMERGENCY))
+    session.commit()
+
+    matches = dedup.find_duplicate_customers(session, workers=0)
+    assert [(m.keep_id, m.merge_id) for m in matches] == [(keep.id, dupe.id)]
+    assert set(matches[0].reasons) >= {'phone', 'postcode'}
+
+    keep_id, dupe_id = keep.id, dupe.id
+    merged = dedup.merge_customers(session, keep_id, dupe_id)
+    session.commit()
+
+    assert session.get(Customer, dupe_id) is None
+    assert merged.banned and merged.discount == Decimal('10')
+    assert 'Merged legacy customer #202' in merged.notes
+    assert [p.name for p in merged.pets] == ['Rex']
+    links = session.execute(select(CustomerContact.contact_id).where(CustomerContact.customer_id == keep_id))
+    assert sorted(c for (c,) in links) == sorted([ann.id, ann_again.id, shared.id])
+
+
+def test_merge_moves_legacy_number_to_a_household_without_one():
+    session = make_session()
+    keep, _ = household(session, None, 'Ann', 'Smith', '0131 555 1234', 'ann@example.com', '1 High Street', 'EH1 1AA')
+    dupe, _ = household(session, 202, 'Anne', 'Smith', '0131 555 1234', None, '1 High Street', 'EH1 1AA')
+    session.commit()
+
+    merged = dedup.merge_customers(session, keep.id, dupe.id)
+    session.commit()
+
+    assert merged.legacy_cust_no == 202
+    assert session.scalars(select(Customer.legacy_cust_no)).all() == [202]
+
+
+def test_merge_contacts_collapses_shared_households():
+    session = make_session()
+    customer, first = household(session, 1, 'Ann', 'Smith', None, None, None, None)
+    second = Contact(first_name='Ann', last_name='Smith', email_address='ann@example.com')
+    customer.contact_associations.append(CustomerContact(contact=second, role=ContactRole.SECONDARY))
+    session.commit()
+
+    matches = find_duplicates(dedup.load_contact_records(session), contacts=True, threshold=0)
+    assert matches == []  # Name alone is not enough evidence
+
+    merged = dedup.merge_contacts(session, first.id, second.id)
+    session.commit()
+
+    assert merged.email_address == 'ann@example.com'
+    assert session.scalars(select(CustomerContact.contact_id)).all() == [first.id]
@@ -0,0 +1,46 @@
+import pytest
+
+from app import create_app
+from app.utils.htmx import render_htmx
+
+
+@pytest.fixture
+def client():
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+
+    @app.route('/versioned')
+    def versioned():
+        return render_htmx('home.html', version='42')
+
+    return app.test_client()
+
+
+def test_full_page_for_normal_requests(client):
+    response = client.get('/')
+
+    assert b'<html' in response.data
+    assert b'dashboard-cards' in response.data
+    assert 'HX-Request' in response.headers['Vary']
+
+
+def test_htmx_request_renders_only_target_block(client):
+    response = client.get('/', headers={'HX-Request': 'true', 'HX-Target': 'dashboard-cards'})
+
+    assert b'<html' not in response.data
+    assert b'id="dashboard-cards"' not in response.data
+    assert b'Quick Links' in response.data
+
+
+def test_unchanged_version_returns_304(client):
+    headers = {'HX-Request': 'true'}
+    first = client.get('/versioned', headers=headers)
+    etag = first.headers['ETag']
+
+    assert etag.startswith('W/')
+    second = client.get('/versioned', headers={**headers, 'If-None-Match': etag})
+    assert second.status_code == 304
+    assert second.data == b''
+
+    # The full page has its own ETag
+    full = client.get('/versioned', headers={'If-None-Match': etag})
+    assert full.status_code == 200
@@ -0,0 +1,115 @@
+import json
+import logging
+import queue
+import sys
+
+import pytest
+from flask import Flask
+
+from app.utils import logging_config
+from app.utils.logging_config import RateLimitedSMTPHandler, SamplingFilter, configure_logging
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+@pytest.fixture
+def output():
+    handler = ListHandler()
+    handler.setFormatter(logging_config.JsonFormatter())
+    level = logging.getLogger().level
+    yield handler
+    logging.getLogger().setLevel(level)
+    logging_config.stop_logging()
+    for h in list(logging.getLogger().handlers):
+        if isinstance(h, logging_config.ContextQueueHandler):
+            logging.getLogger().removeHandler(h)
+
+
+def make_app(config, output):
+    app = Flask(__name__)
+    app.config['CONFIG'] = config
+    logging_config.init_logging(app)
+    configure_logging(config, handlers=[output])
+
+    @app.route('/pets/<int:pet_id>')
+    def pet(pet_id):
+        logging.getLogger('app.pets').debug('looking up pet')
+        logging.getLogger('app.pets').warning('pet %s missing', pet_id)
+        return 'ok'
+
+    return app
+
+
+def test_request_lines_carry_context_and_timing(output):
+    app = make_app({'logging': {'level': 'INFO'}}, output)
+
+    response = app.test_client().get('/pets/7', headers={'X-Request-ID': 'abc123'})
+    logging_config.stop_logging()
+
+    assert response.headers['X-Request-ID'] == 'abc123'
+    warning, access = [json.loads(line) for line in output.lines]
+    assert warning['message'] == 'pet 7 missing'
+    assert warning['request_id'] == 'abc123'
+    assert warning['route'] == '/pets/<int:pet_id>'
+    assert access['logger'] == 'app.access'
+    assert access['status'] == 200
+    assert access['duration_ms'] >= 0
+
+
+def test_sampled_requests_keep_debug_lines(output, monkeypatch):
+    app = make_app({'logging': {'level': 'ERROR', 'sample_rate': 0.5}}, output)
+    client = app.test_client()
+
+    monkeypatch.setattr(logging_config.random, 'random', lambda: 0.9)
+    client.get('/pets/1')
+    logging_config.stop_logging()
+    assert output.lines == []
+
+    configure_logging({'logging': {'level': 'ERROR', 'sample_rate': 0.5}}, handlers=[output])
+    monkeypatch.setattr(logging_config.random, 'random', lambda: 0.1)
+    client.get('/pets/2')
+    logging_config.stop_logging()
+    assert [json.loads(line)['level'] for line in output.lines] == ['DEBUG', 'WARNING', 'INFO']
+
+
+def test_sampling_filter_always_passes_level():
+    record = logging.LogRecord('x', logging.ERROR, __file__, 1, 'boom', None, None)
+    assert SamplingFilter(logging.ERROR).filter(record)
+
+
+def test_queued_copy_leaves_record_intact_for_other_handlers():
+    handler = logging_config.ContextQueueHandler(queue.SimpleQueue())
+    try:
+        raise ValueError('bad')
+    except ValueError:
+        record = logging.LogRecord('x', logging.ERROR, __file__, 1, 'pet %s', (7,), sys.exc_info())
+
+    queued = handler.prepare(record)
+    assert (queued.msg, queued.args, queued.exc_info) == ('pet 7', None, None)
+    assert 'ValueError: bad' in queued.exc_text
+    assert record.args == (7,) and record.exc_info[0] is ValueError
+
+
+def test_error_emails_are_rate_limited(monkeypatch):
+    sent = []
+    monkeypatch.setattr(logging.handlers.SMTPHandler, 'emit',
+                        lambda self, record: sent.append(self.getSubject(record)))
+    handler = RateLimitedSMTPHandler('localhost', 'from@example.com', ['to@example.com'], 'Error',
+                                     limit=2, window=60)
+    record = logging.LogRecord('x', logging.ERROR, __file__, 1, 'boom', None, None)
+
+    for _ in range(5):
+        handler.emit(record)
+    assert sent == ['Error', 'Error']
+
+    handler._sent.clear()
+    handler.emit(record)
+    assert sent[-1] == 'Error (3 earlier errors not emailed)'
+    assert handler.suppressed == 0
@@ -0,0 +1,66 @@
+import sqlalchemy as sa
+from alembic import op
+from alembic.operations import Operations
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+from app.utils import online_migrations
+from app.utils.online_migrations import check_migrations, check_statements, render_upgrade_sql
+
+
+def rules(upgrade, allowed=()):
+    return [o.rule for o in check_statements('test', render_upgrade_sql(upgrade), allowed)]
+
+
+def test_repository_migrations_are_lock_safe():
+    assert check_migrations() == []
+
+
+def test_blocking_operations_are_flagged():
+    def upgrade():
+        op.add_column('customers', sa.Column('banned', sa.Boolean(), nullable=False))
+        op.create_index('ix_customers_banned', 'customers', ['banned'])
+        op.create_foreign_key('fk_customers_vet', 'customers', 'vets', ['default_vet_id'], ['id'])
+        op.alter_column('customers', 'notes', nullable=False)
+        op.add_column('contacts', sa.Column('notes_tsv', TSVECTOR(),
+                                            sa.Computed("to_tsvector('english', notes)", persisted=True)))
+
+    assert rules(upgrade) == ['add-not-null-column', 'index-not-concurrent',
+                              'constraint-not-valid', 'set-not-null', 'add-stored-generated-column']
+    assert rules(upgrade, allowed={'index-not-concurrent', 'add-stored-generated-column'}) == [
+        'add-not-null-column', 'constraint-not-valid', 'set-not-null']
+
+
+def test_new_tables_and_helpers_pass():
+    def upgrade():
+        op.create_table('kennels', sa.Column('id', sa.Integer(), primary_key=True),
+                        sa.Column('name', sa.String(20), nullable=False))
+        op.create_index('ix_kennels_name', 'kennels', ['name'])
+        online_migrations.add_column('customers', sa.Column('rating', sa.Integer(), nullable=False))
+        online_migrations.backfill('customers', {'rating': 0}, where='rating IS NULL')
+        online_migrations.set_not_null('customers', 'rating')
+        online_migrations.create_index('ix_customers_rating', 'customers', ['rating'])
+        online_migrations.add_foreign_key('fk_customers_vet', 'customers', 'vets',
+                                          ['default_vet_id'], ['id'])
+
+    assert rules(upgrade) == []
+
+
+def test_backfill_runs_in_keyed_batches():
+    engine = sa.create_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.execute(sa.text("CREATE TABLE dogs (id INTEGER PRIMARY KEY, walked BOOLEAN)"))
+        connection.execute(sa.text("INSERT INTO dogs (id) VALUES " + ','.join(f'({i})' for i in range(1, 2501))))
+
+    progress = []
+    with engine.connect() as connection:
+        context = MigrationContext.configure(connection)
+        with Operations.context(context), context.begin_transaction():
+            total = online_migrations.backfill('dogs', {'walked': True}, where='walked IS NULL',
+                                               batch_size=1000, pause=0,
+                                               progress=lambda n, key: progress.append((n, key)))
+
+    assert total == 2500
+    assert progress == [(1000, 1000), (2000, 2000), (2500, 2500)]
+    with engine.connect() as connection:
+        assert connection.scalar(sa.text("SELECT count(*) FROM dogs WHERE walked")) == 2500
@@ -0,0 +1,91 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app.models.pet import Species
+from app.models.pricing import MultiPetDiscount, Rate, Season
+from app.models.run import RunType
+from app.services.pricing import PetStay, PricingEngine, PricingError, QuoteRequest
+
+DOG = PetStay(Species.DOG, RunType.KENNEL)
+CAT = PetStay(Species.CAT, RunType.CATTERY)
+
+
+def make_engine():
+    seasons = [
+        Season(name='Summer', band='peak', start_date=date(2026, 7, 1), end_date=date(2026, 8, 31), priority=0),
+        Season(name='Christmas', band='peak', start_date=date(2026, 12, 20), end_date=date(2027, 1, 2), priority=1),
+    ]
+    rates = [
+        Rate(band='standard', species=Species.DOG, run_type=RunType.KENNEL, nightly_rate=Decimal('25.00')),
+        Rate(band='peak', species=Species.DOG, run_type=RunType.KENNEL, nightly_rate=Decimal('30.00')),
+        Rate(band='standard', species=Species.CAT, run_type=RunType.CATTERY, nightly_rate=Decimal('15.50')),
+    ]
+    discounts = [
+        MultiPetDiscount(min_pets=2, percent=Decimal('10.00')),
+        MultiPetDiscount(min_pets=3, percent=Decimal('15.00')),
+    ]
+    return PricingEngine(seasons, rates, discounts,
+                         first_day=date(2026, 1, 1), last_day=date(2027, 12, 31))
+
+
+def test_stay_spanning_bands_uses_each_nights_rate():
+    engine = make_engine()
+
+    # 29 and 30 June standard, 1 and 2 July peak
+    quote = engine.quote(QuoteRequest(date(2026, 6, 29), date(2026, 7, 3), [DOG]))
+
+    assert quote.nights == 4
+    assert quote.base == Decimal('110.00')
+    assert quote.total == Decimal('110.00')
+
+
+def test_multi_pet_and_customer_discounts():
+    engine = make_engine()
+
+    quote = engine.quote(QuoteRequest(date(2026, 3, 1), date(2026, 3, 3), [DOG, DOG],
+                                      customer_discount=Decimal('5.00')))
+
+    assert quote.base == Decimal('100.00')
+    assert quote.multi_pet_discount == Decimal('10.00')
+    assert quote.customer_discount == Decimal('4.50')
+    assert quote.total == Decimal('85.50')
+
+
+def test_batch_quotes_match_single_quotes_outside_compiled_range():
+    engine = make_engine()
+    requests = [
+        QuoteRequest(date(2026, 5, 1), date(2026, 5, 8), [DOG, CAT]),
+        QuoteRequest(date(2028, 3, 1), date(2028, 3, 4), [DOG]),
+    ]
+
+    quotes = engine.quote_many(requests)
+
+    assert quotes == [engine.quote(request) for request in requests]
+    assert quotes[1].base == Decimal('75.00')
+
+
+def test_missing_rate_raises():
+    engine = make_engine()
+
+    with pytest.raises(PricingError, match='peak'):
+        engine.quote(QuoteRequest(date(2026, 7, 1), date(2026, 7, 2), [CAT]))
+
+
+def test_shared_engine_follows_pricing_config():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from app import create_app
+    from app.models import Base
+    from app.services.pricing import get_pricing_engine
+
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SECRET_KEY': 'test'})
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    with Session(engine) as session, app.app_context():
+        assert get_pricing_engine(session).default_band == 'standard'
+        app.config['CONFIG']['pricing']['default_band'] = 'offpeak'
+        assert get_pricing_engine(session).default_band == 'offpeak'
+    assert get_pricing_engine(session, default_band='standard').default_band == 'standard'
@@ -0,0 +1,69 @@
+import tracemalloc
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session, selectinload
+
+from app.models import Base, Contact, Customer, CustomerContact, Vet
+from app.models.customer import ContactRole
+from app.services.read_models import load_contacts, load_customers, load_vets
+
+
+def make_session():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    return Session(engine)
+
+
+def add_household(session, n, **fields):
+    customer = Customer(legacy_cust_no=n, street=f"{n} Main St", town='Cumbernauld', postcode='G67 1AA', **fields)
+    for index, role in enumerate((ContactRole.PRIMARY, ContactRole.EMERGENCY)):
+        contact = Contact(first_name='Pat', last_name=f"Owner{n}-{index}")
+        customer.contact_associations.append(CustomerContact(contact=contact, role=role))
+    session.add(customer)
+    return customer
+
+
+def test_records_match_model_helpers():
+    session = make_session()
+    vet = Vet(practice_name='Kilsyth Vets', town='Kilsyth', postcode='G65 0AA')
+    session.add(vet)
+    first = add_household(session, 1, default_vet=vet)
+    unnumbered = Customer(town='Stirling')
+    session.add(unnumbered)
+    session.commit()
+
+    records = load_customers(session)
+    for record, customer in zip(records, [first, unnumbered]):
+        assert record.display_ref == customer.display_ref
+        assert record.get_full_address() == customer.get_full_address()
+        assert record.get_navigation_url() == customer.get_navigation_url()
+        assert [c.id for c in record.primary_contacts] == [c.id for c in customer.primary_contacts]
+    assert records[0].primary_contact.last_name == 'Owner1-0'
+    assert records[1].primary_contact is None and records[1].display_ref == f"N{unnumbered.id}"
+    assert records[0].default_vet_id == vet.id
+
+    assert load_customers(session, Customer.legacy_cust_no == 1, with_contacts=False)[0].primary_contacts == ()
+    assert [c.last_name for c in load_contacts(session)] == ['Owner1-0', 'Owner1-1']
+    assert load_vets(session)[0].get_full_address() == vet.get_full_address() == 'Kilsyth, G65 0AA'
+
+
+def test_records_use_far_less_memory_than_instances():
+    session = make_session()
+    for n in range(1, 1001):
+        add_household(session, n)
+    session.commit()
+    session.close()
+
+    def peak(load):
+        tracemalloc.start()
+        loaded = load()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        session.close()
+        return loaded, peak
+
+    eager = selectinload(Customer.contact_associations).selectinload(CustomerContact.contact)
+    instances, orm_peak = peak(lambda: session.scalars(select(Customer).options(eager)).all())
+    records, records_peak = peak(lambda: load_customers(session))
+    assert len(records) == len(instances) == 1000
+    assert records_peak * 2 < orm_peak
@@ -0,0 +1,99 @@
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+
+from app.services.reports import (
+    ReportDefinition, ReportEngine, ReportRegistry, data_versions,
+)
+
+
+def make_engine():
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE kennels (id INTEGER PRIMARY KEY, name TEXT)"))
+        connection.execute(text("INSERT INTO kennels (name) VALUES ('A1'), ('A2'), ('B1')"))
+    return engine
+
+
+def make_report_engine():
+    registry = ReportRegistry()
+    registry.register(ReportDefinition(
+        name='kennels',
+        title='Kennels',
+        sql="SELECT id, name FROM kennels WHERE name LIKE :prefix ORDER BY id",
+        tables=('kennels',),
+        defaults={'prefix': '%'},
+    ))
+    return ReportEngine(registry=registry)
+
+
+def count_queries(engine):
+    statements = []
+    event.listen(engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+def test_repeated_runs_are_served_from_cache():
+    engine = make_engine()
+    reports = make_report_engine()
+    statements = count_queries(engine)
+
+    with Session(engine) as session:
+        first = reports.run(session, 'kennels')
+        second = reports.run(session, 'kennels')
+        filtered = reports.run(session, 'kennels', {'prefix': 'A%'})
+
+    assert second is first
+    assert [row[1] for row in first.rows] == ['A1', 'A2', 'B1']
+    assert [row[1] for row in filtered.rows] == ['A1', 'A2']
+    assert len(statements) == 2
+
+
+def test_data_change_invalidates_cache():
+    engine = make_engine()
+    reports = make_report_engine()
+
+    with Session(engine) as session:
+        first = reports.run(session, 'kennels')
+        data_versions.bump('kennels')
+        second = reports.run(session, 'kennels')
+
+    assert second is not first
+    assert second.data_version != first.data_version
+
+
+def test_stream_csv_matches_run():
+    engine = make_engine()
+    reports = make_report_engine()
+
+    with Session(engine) as session:
+        streamed = ''.join(reports.stream_csv(session, 'kennels', chunk_size=2))
+
+    assert streamed.splitlines() == ['id,name', '1,A1', '2,A2', '3,B1']
+
+
+def test_postgres_versions_see_other_connections_and_deletes(postgres_engine):
+    from app.services.reports import tables_version
+
+    def changed_from(session, before):
+        # Backends report their statistics within about a second
+        deadline = time.monotonic() + 5
+        version = tables_version(session, ['job_runs', 'vets'])
+        while version == before and time.monotonic() < deadline:
+            time.sleep(0.1)
+            version = tables_version(session, ['job_runs', 'vets'])
+        return version
+
+    with Session(postgres_engine) as session:
+        before = tables_version(session, ['job_runs', 'vets'])
+        with postgres_engine.begin() as other:
+            other.execute(text("INSERT INTO job_runs (name, last_run_at) VALUES ('version-test', now())"))
+        inserted = changed_from(session, before)
+        with postgres_engine.begin() as other:
+            other.execute(text("DELETE FROM job_runs WHERE name = 'version-test'"))
+        deleted = changed_from(session, inserted)
+
+    assert before != inserted != deleted
+    assert before.split('|')[1] == deleted.split('|')[1]
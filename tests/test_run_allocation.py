@@ -0,0 +1,174 @@
+import random
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app.models import Base, Booking, BookingPet, Customer, Pet, Run, RunAllocation
+from app.models.booking import BookingStatus
+from app.models.pet import Species
+from app.models.run import RunType
+from app.services import run_allocation
+from app.services.run_allocation import RunPlanner, RunSlot, Segment, Stay
+
+JULY = date(2026, 7, 1)
+
+
+def day(n):
+    return JULY + timedelta(days=n)
+
+
+def stay(booking_id, start, end, pets=1, species=Species.DOG):
+    pet_ids = tuple(booking_id * 10 + n for n in range(pets))
+    return Stay((booking_id, pet_ids[0]), booking_id, species, pet_ids, day(start), day(end))
+
+
+def allocations(session, booking_id):
+    return session.execute(
+        select(RunAllocation.pet_id, Run.code, RunAllocation.start_date, RunAllocation.end_date,
+               RunAllocation.locked)
+        .join(Run).where(RunAllocation.booking_id == booking_id)
+        .order_by(RunAllocation.pet_id, RunAllocation.start_date)
+    ).all()
+
+
+def make_session():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    return Session(engine)
+
+
+def test_stays_fill_runs_back_to_back_by_best_fit():
+    planner = RunPlanner([RunSlot(1, Species.DOG, 1, 0), RunSlot(2, Species.DOG, 1, 0),
+                          RunSlot(3, Species.DOG, 2, 0), RunSlot(4, Species.CAT, 1, 2)])
+    planner.assign([stay(1, 0, 4), stay(2, 0, 2), stay(3, 2, 6), stay(4, 4, 8),
+                    stay(5, 1, 5, pets=2), stay(6, 0, 3, species=Species.CAT)])
+
+    runs = {key[0]: segments[0].run_id for key, segments in planner.placements.items()}
+    assert runs[3] == runs[2]  # Arrives the day the other leaves
+    assert runs[4] == runs[1]
+    assert runs[5] == 3  # Siblings share the double run
+    assert runs[6] == 4
+    assert planner.moves == 0 and not planner.unplaced
+
+
+def test_repair_moves_another_stay_before_splitting():
+    planner = RunPlanner([RunSlot(1, Species.DOG, 1, 0), RunSlot(2, Species.DOG, 1, 0)])
+    planner.load(stay(1, 1, 4), [Segment(1, day(1), day(4))])
+    planner.load(stay(2, 5, 9), [Segment(2, day(5), day(9))])
+
+    assert planner.place(stay(3, 2, 7))
+
+    assert planner.placements[(1, 10)] == [Segment(2, day(1), day(4))]
+    assert planner.placements[(3, 30)] == [Segment(1, day(2), day(7))]
+    assert planner.changed == {(1, 10), (3, 30)}
+
+
+def test_split_uses_fewest_moves_around_locked_stays():
+    planner = RunPlanner([RunSlot(1, Species.DOG, 1, 0), RunSlot(2, Species.DOG, 1, 0)])
+    planner.load(stay(1, 1, 4), [Segment(1, day(1), day(4))], locked=True)
+    planner.load(stay(2, 5, 9), [Segment(2, day(5), day(9))], locked=True)
+
+    assert planner.place(stay(3, 2, 7))
+    assert planner.placements[(3, 30)] == [Segment(2, day(2), day(5)), Segment(1, day(5), day(7))]
+    assert planner.moves == 1
+
+    assert not planner.place(stay(4, 2, 3))
+    assert (4, 40) in planner.unplaced
+
+
+def test_plan_and_incremental_allocation_in_database():
+    session = make_session()
+    session.add_all([Run(code='K1', run_type=RunType.KENNEL, capacity=1),
+                     Run(code='K2', run_type=RunType.DELUXE_KENNEL, capacity=2),
+                     Run(code='C1', run_type=RunType.CATTERY, capacity=1)])
+    customer = Customer()
+    rex, fido, tom = (Pet(name=name, species=species, customer=customer)
+                      for name, species in [('Rex', Species.DOG), ('Fido', Species.DOG), ('Tom', Species.CAT)])
+    first = Booking(customer=customer, start_date=day(0), end_date=day(3), status=BookingStatus.CONFIRMED,
+                    pet_associations=[BookingPet(pet=rex), BookingPet(pet=fido), BookingPet(pet=tom)])
+    session.add(first)
+    session.flush()
+
+    planner = run_allocation.plan_runs(session, day(0), day(7))
+    rows = session.execute(select(RunAllocation.pet_id, Run.code).join(Run)).all()
+    assert sorted(code for _, code in rows) == ['C1', 'K2', 'K2']
+    assert not planner.unplaced
+
+    before = allocations(session, first.id)
+    second = Booking(customer=customer, start_date=day(3), end_date=day(5),
+                     pet_associations=[BookingPet(pet=rex)])
+    session.add(second)
+    session.flush()
+    run_allocation.allocate_booking(session, second)
+    assert allocations(session, second.id) == [(rex.id, 'K1', day(3), day(5), False)]
+    assert allocations(session, first.id) == before
+
+    second.status = BookingStatus.CANCELLED
+    session.flush()
+    run_allocation.allocate_booking(session, second)
+    assert session.scalars(select(RunAllocation).where(RunAllocation.booking_id == second.id)).all() == []
+
+
+def test_checked_in_extension_keeps_the_days_already_spent():
+    session = make_session()
+    k1, k2 = Run(code='K1', run_type=RunType.KENNEL, capacity=1), Run(code='K2', run_type=RunType.KENNEL, capacity=1)
+    customer = Customer()
+    rex, fido = (Pet(name=name, species=Species.DOG, customer=customer) for name in ['Rex', 'Fido'])
+    staying = Booking(customer=customer, start_date=day(0), end_date=day(3), status=BookingStatus.CHECKED_IN,
+                      pet_associations=[BookingPet(pet=rex)])
+    next_guest = Booking(customer=customer, start_date=day(4), end_date=day(8), status=BookingStatus.CONFIRMED,
+                         pet_associations=[BookingPet(pet=fido)])
+    session.add_all([k1, k2, staying, next_guest])
+    session.flush()
+    session.add_all([RunAllocation(booking=staying, pet=rex, run=k2, start_date=day(0), end_date=day(3)),
+                     RunAllocation(booking=next_guest, pet=fido, run=k1, start_date=day(4), end_date=day(8))])
+    session.flush()
+
+    staying.end_date = day(6)
+    session.flush()
+    planner = run_allocation.allocate_booking(session, staying, today=day(1))
+
+    # Rex stays in K2 throughout; nothing before today is rewritten
+    assert allocations(session, staying.id) == [(rex.id, 'K2', day(0), day(2), False),
+                                                 (rex.id, 'K2', day(2), day(6), False)]
+    assert allocations(session, next_guest.id) == [(fido.id, 'K1', day(4), day(8), False)]
+    assert planner.moves == 0 and not planner.unplaced
+
+
+def test_locked_segment_stays_and_rest_of_stay_is_placed():
+    session = make_session()
+    k1, k2 = Run(code='K1', run_type=RunType.KENNEL, capacity=1), Run(code='K2', run_type=RunType.KENNEL, capacity=1)
+    customer = Customer()
+    rex = Pet(name='Rex', species=Species.DOG, customer=customer)
+    booking = Booking(customer=customer, start_date=day(0), end_date=day(5), status=BookingStatus.CONFIRMED,
+                      pet_associations=[BookingPet(pet=rex)])
+    session.add_all([k1, k2, booking])
+    session.flush()
+    session.add_all([RunAllocation(booking=booking, pet=rex, run=k2, start_date=day(0), end_date=day(2), locked=True),
+                     RunAllocation(booking=booking, pet=rex, run=k1, start_date=day(2), end_date=day(5))])
+    session.flush()
+
+    run_allocation.allocate_booking(session, booking)
+    assert allocations(session, booking.id) == [(rex.id, 'K2', day(0), day(2), True),
+                                                (rex.id, 'K2', day(2), day(5), False)]
+
+    run_allocation.plan_runs(session, day(0), day(7))
+    assert allocations(session, booking.id) == [(rex.id, 'K2', day(0), day(2), True),
+                                                (rex.id, 'K2', day(2), day(5), False)]
+
+
+def test_peak_season_allocates_without_moves():
+    rng = random.Random(7)
+    runs = [RunSlot(n, Species.DOG, 1 if n < 90 else 2, 0) for n in range(120)]
+    stays = []
+    for booking_id in range(1, 1500):
+        start = rng.randrange(0, 120)
+        stays.append(stay(booking_id, start, start + rng.randrange(1, 15), pets=1 if rng.random() < 0.8 else 2))
+
+    planner = RunPlanner(runs)
+    planner.assign(stays)
+
+    # Placing in arrival order is optimal colouring: everything fits whole
+    assert not planner.unplaced and planner.moves == 0
+    assert planner.place(stay(9999, 50, 57))
@@ -0,0 +1,132 @@
+import time
+from datetime import date, time as clock, timedelta
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app.models import (Base, Booking, BookingPet, Customer, Employee, EmployeeAvailability, EmployeeSkill,
+                        LeaveRequest, Pet, ShiftAssignment, ShiftType)
+from app.models.pet import Species
+from app.models.staff import LeaveStatus, Skill
+from app.services import scheduling
+from app.services.scheduling import Requirement, Scheduler, Shift, StaffMember
+
+MONDAY = date(2026, 11, 2)
+WEEK = [MONDAY + timedelta(days=n) for n in range(7)]
+
+
+def make_session():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    return Session(engine)
+
+
+def member(employee_id, skills=(), max_hours=40, shifts=(1,), leave=()):
+    available = frozenset((weekday, shift) for weekday in range(7) for shift in shifts)
+    return StaffMember(employee_id, frozenset(skills), max_hours, available, tuple(leave))
+
+
+def test_occupancy_and_coverage():
+    session = make_session()
+    customer = Customer()
+    dogs = [Pet(name=f"Dog {n}", species=Species.DOG, customer=customer) for n in range(12)]
+    cat = Pet(name='Tom', species=Species.CAT, customer=customer)
+    session.add_all([
+        Booking(customer=customer, start_date=MONDAY, end_date=MONDAY + timedelta(days=1),
+                pet_associations=[BookingPet(pet=dog) for dog in dogs]),
+        Booking(customer=customer, start_date=MONDAY + timedelta(days=1), end_date=MONDAY + timedelta(days=9),
+                pet_associations=[BookingPet(pet=cat)]),
+    ])
+    session.flush()
+
+    pets = scheduling.occupancy(session, MONDAY, WEEK[-1])
+    assert pets[MONDAY] == {Species.DOG: 12, Species.CAT: 0}
+    assert pets[WEEK[1]] == {Species.DOG: 12, Species.CAT: 1}
+    assert pets[WEEK[-1]] == {Species.DOG: 0, Species.CAT: 1}
+
+    shifts = [Shift(1, 5.5, 1, 1.0), Shift(2, 4.0, 0, 0.5)]
+    sunday = MONDAY - timedelta(days=1)
+    coverage = scheduling.required_coverage(pets, shifts, [sunday, *WEEK])
+    assert coverage[(MONDAY, 1)] == Requirement(2, frozenset({Skill.DOG_HANDLING}))
+    assert coverage[(MONDAY, 2)].staff == 1
+    assert coverage[(WEEK[-1], 1)] == Requirement(1, frozenset({Skill.CAT_CARE}))
+    assert coverage[(sunday, 1)] == Requirement(1, frozenset())
+    assert (sunday, 2) not in coverage
+
+
+def test_solver_respects_skills_leave_and_hours():
+    staff = [
+        member(1, {Skill.DOG_HANDLING}, leave=[(WEEK[0], WEEK[1])]),
+        member(2, {Skill.DOG_HANDLING}, max_hours=11),
+        member(3),
+    ]
+    scheduler = Scheduler(staff, [Shift(1, 5.5, 1, 1.0)])
+    requirements = {(day, 1): Requirement(2, frozenset({Skill.DOG_HANDLING})) for day in WEEK}
+
+    rota = scheduler.solve(requirements)
+
+    # Only 2 can handle dogs while 1 is on leave, and has hours for just those two days
+    assert rota.shifts_of(2) == [(WEEK[0], 1), (WEEK[1], 1)]
+    assert all(1 not in rota.assignments[(day, 1)] for day in WEEK[:2])
+    assert all(len(ids) == 2 for ids in rota.assignments.values())
+    assert not rota.shortfalls
+
+
+def test_repair_moves_a_skilled_employee_between_shifts():
+    # Greedy puts 1 (most hours left) on the morning, leaving no dog handler for the afternoon
+    staff = [member(1, {Skill.DOG_HANDLING}, shifts=(1, 2)), member(2, max_hours=10, shifts=(1,)),
+             member(3, shifts=(2,))]
+    scheduler = Scheduler(staff, [Shift(1, 5, 1, 1.0), Shift(2, 5, 1, 1.0)])
+    requirements = {(MONDAY, 1): Requirement(1, frozenset()),
+                    (MONDAY, 2): Requirement(1, frozenset({Skill.DOG_HANDLING}))}
+
+    rota = scheduler.solve(requirements)
+
+    assert 1 in rota.assignments[(MONDAY, 2)]
+    assert rota.assignments[(MONDAY, 1)] == {2}
+    assert not rota.shortfalls
+
+
+def test_incremental_replan_keeps_locked_and_other_days():
+    session = make_session()
+    morning = ShiftType(name='Morning', start_time=clock(7, 30), end_time=clock(13, 0), min_staff=1)
+    employees = [Employee(first_name=name, last_name='Staff', max_hours_per_week=40) for name in 'ABC']
+    session.add_all([morning, *employees])
+    session.flush()
+    for employee in employees:
+        session.add(EmployeeSkill(employee_id=employee.id, skill=Skill.DOG_HANDLING))
+        session.add_all(EmployeeAvailability(employee_id=employee.id, weekday=d, shift_type_id=morning.id)
+                        for d in range(7))
+    session.add(ShiftAssignment(employee_id=employees[2].id, shift_type_id=morning.id, date=WEEK[3], locked=True))
+    session.flush()
+
+    scheduling.plan_week(session, MONDAY)
+    assigned = dict(session.execute(select(ShiftAssignment.date, ShiftAssignment.employee_id)).all())
+    assert set(assigned) == set(WEEK)
+    assert assigned[WEEK[3]] == employees[2].id
+
+    on_monday = assigned[MONDAY]
+    leave = LeaveRequest(employee_id=on_monday, start_date=MONDAY, end_date=WEEK[1], status=LeaveStatus.APPROVED)
+    session.add(leave)
+    session.flush()
+    scheduling.on_leave_changed(session, leave)
+
+    after = dict(session.execute(select(ShiftAssignment.date, ShiftAssignment.employee_id)).all())
+    assert after[MONDAY] != on_monday and after[WEEK[1]] != on_monday
+    assert {day: after[day] for day in WEEK[2:]} == {day: assigned[day] for day in WEEK[2:]}
+
+
+def test_full_staff_week_solves_quickly():
+    shifts = [Shift(1, 5.5, 2, 1.0), Shift(2, 5.0, 2, 0.8), Shift(3, 3.0, 1, 0.3)]
+    skills = [Skill.DOG_HANDLING, Skill.CAT_CARE, Skill.MEDICATION]
+    staff = [member(n, {skills[n % 3], skills[(n + 1) % 3]}, max_hours=20 + n % 25, shifts=(1, 2, 3),
+                    leave=[(WEEK[n % 7], WEEK[n % 7])] if n % 5 == 0 else ())
+             for n in range(60)]
+    requirements = {(day, shift.id): Requirement(6, frozenset(skills)) for day in WEEK for shift in shifts}
+
+    started = time.perf_counter()
+    rota = Scheduler(staff, shifts).solve(requirements)
+    elapsed = time.perf_counter() - started
+
+    assert not rota.shortfalls
+    assert elapsed < 2
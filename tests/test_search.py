@@ -0,0 +1,48 @@
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app.models import Base, Contact, Customer
+from app.services.search import search_notes
+
+
+def make_session():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    return Session(engine)
+
+
+def add_notes(session):
+    session.add_all([
+        Customer(legacy_cust_no=1, notes='Rex bites when muzzled. Bites strangers <always>.'),
+        Customer(legacy_cust_no=2, notes='Diabetic cat, insulin twice daily.'),
+        Customer(legacy_cust_no=3, notes=None),
+        Contact(first_name='Ann', last_name='Smith', notes='Warned that the terrier bites.'),
+    ])
+    session.flush()
+
+
+def test_fallback_search_ranks_and_escapes_snippets():
+    session = make_session()
+    add_notes(session)
+
+    hits = search_notes(session, 'bites')
+
+    assert [(hit.kind, hit.rank > 0) for hit in hits] == [('customer', True), ('contact', True)]
+    assert '<mark>bites</mark>' in hits[0].snippet
+    assert '&lt;always&gt;' in hits[0].snippet
+    assert search_notes(session, 'insulin', kinds=['contact']) == []
+    assert search_notes(session, '   ') == []
+
+
+def test_postgres_search_uses_maintained_vectors(db_session):
+    add_notes(db_session)
+
+    hits = search_notes(db_session, 'bite')  # Stemmed: matches "bites"
+    assert [hit.kind for hit in hits] == ['customer', 'contact']
+    assert '<mark>bites</mark>' in hits[0].snippet
+
+    customer = db_session.scalars(select(Customer).where(Customer.legacy_cust_no == 2)).one()
+    customer.notes = 'No longer diabetic.'
+    db_session.flush()
+    assert search_notes(db_session, 'insulin') == []
+    assert [hit.id for hit in search_notes(db_session, 'diabetic')] == [customer.id]
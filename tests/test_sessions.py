@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from flask import session
+
+from app import create_app
+from app.extensions import db
+from app.models.session import ServerSession
+
+
+@pytest.fixture
+def app():
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+    with app.app_context():
+        ServerSession.__table__.create(db.engine)
+
+    @app.route('/login')
+    def login():
+        session.regenerate()
+        session['user'] = 'kennel'
+        return 'ok'
+
+    @app.route('/whoami')
+    def whoami():
+        return session.get('user', 'anonymous')
+
+    @app.route('/logout')
+    def logout():
+        session.clear()
+        return 'ok'
+
+    return app
+
+
+def test_session_round_trip_through_backend(app):
+    client = app.test_client()
+
+    client.get('/login')
+    cookie = client.get_cookie('session')
+
+    assert cookie is not None
+    assert 'kennel' not in cookie.value
+    assert client.get('/whoami').data == b'kennel'
+
+    client.get('/logout')
+    assert client.get('/whoami').data == b'anonymous'
+    with app.app_context():
+        assert db.session.query(ServerSession).count() == 0
+
+
+def test_session_loaded_once_and_not_rewritten(app, monkeypatch):
+    client = app.test_client()
+    backend = app.extensions['session_backend']
+    loads = []
+    load = backend.load
+    monkeypatch.setattr(backend, 'load', lambda sid: loads.append(sid) or load(sid))
+
+    # No cookie yet: nothing to load
+    client.get('/whoami')
+    assert loads == []
+
+    client.get('/login')
+
+    def fail(*args):
+        raise AssertionError("unchanged session should not be saved")
+    monkeypatch.setattr(backend, 'save', fail)
+
+    assert client.get('/whoami').data == b'kennel'
+    assert len(loads) == 1
+
+
+def test_purge_expired_in_batches(app):
+    backend = app.extensions['session_backend']
+    now = datetime.now(timezone.utc)
+    for i in range(5):
+        backend.save(f'old{i}', {'n': i}, now - timedelta(minutes=1))
+    backend.save('live', {'n': 99}, now + timedelta(hours=1))
+
+    assert backend.load('old0') is None
+    assert backend.purge_expired(batch_size=2) == 5
+    assert backend.load('live')[0] == {'n': 99}
+
+
+def test_purge_thread_starts_with_first_request_only():
+    web = create_app({'TESTING': False, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SECRET_KEY': 'test'})
+    with web.app_context():
+        ServerSession.__table__.create(db.engine)
+    assert 'session_purge' not in web.extensions  # e.g. a `flask` CLI command
+
+    web.test_client().get('/')
+    web.test_client().get('/')
+    thread = web.extensions['session_purge']
+    assert thread.is_alive()
+    thread.stop.set()
+    thread.join(timeout=5)
@@ -0,0 +1,117 @@
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.orm import Session
+
+from app.models import Base, Booking, BookingPet, Customer, Pet, Vaccination, VaccinationAlert
+from app.models.booking import BookingStatus
+from app.models.pet import Species, VaccinationIssue, VaccineType
+from app.services import vaccinations
+
+TODAY = date(2026, 7, 1)
+
+
+def make_session():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    return Session(engine)
+
+
+def add_booking(session, customer, pets, start, nights, status=BookingStatus.CONFIRMED):
+    booking = Booking(customer=customer, start_date=start,
+                      end_date=start + timedelta(days=nights), status=status)
+    booking.pet_associations = [BookingPet(pet=pet) for pet in pets]
+    session.add(booking)
+    return booking
+
+
+def vaccinate(pet, *vaccines, expires_on):
+    for vaccine in vaccines:
+        pet.vaccinations.append(Vaccination(vaccine_type=vaccine, expires_on=expires_on))
+
+
+def test_find_problems_flags_missing_expired_and_expiring():
+    session = make_session()
+    customer = Customer()
+    rex = Pet(customer=customer, name='Rex', species=Species.DOG)
+    tom = Pet(customer=customer, name='Tom', species=Species.CAT)
+    vaccinate(rex, VaccineType.DHP, VaccineType.LEPTOSPIROSIS, expires_on=date(2027, 1, 1))
+    vaccinate(rex, VaccineType.KENNEL_COUGH, expires_on=TODAY + timedelta(days=5))
+    vaccinate(tom, VaccineType.FELINE_FLU_ENTERITIS, expires_on=TODAY - timedelta(days=1))
+    booking = add_booking(session, customer, [rex, tom], TODAY + timedelta(days=2), nights=7)
+    add_booking(session, customer, [rex], TODAY + timedelta(days=3), nights=7,
+                status=BookingStatus.CANCELLED)
+    add_booking(session, customer, [tom], TODAY + timedelta(days=60), nights=7)
+    session.flush()
+
+    problems = vaccinations.find_problems(session, TODAY, TODAY + timedelta(days=14))
+
+    assert {(p.booking_id, p.pet_id, p.vaccine_type, p.issue) for p in problems} == {
+        (booking.id, rex.id, VaccineType.KENNEL_COUGH, VaccinationIssue.EXPIRES_DURING_STAY),
+        (booking.id, tom.id, VaccineType.FELINE_FLU_ENTERITIS, VaccinationIssue.EXPIRED),
+    }
+
+
+def test_scan_persists_alerts_and_rechecks_touched_pets():
+    session = make_session()
+    customer = Customer()
+    tom = Pet(customer=customer, name='Tom', species=Species.CAT)
+    kit = Pet(customer=customer, name='Kit', species=Species.CAT)
+    add_booking(session, customer, [tom], TODAY + timedelta(days=1), nights=3)
+    session.flush()
+
+    summary = vaccinations.scan(session, today=TODAY)
+    assert summary.full
+    assert summary.alerts == 1
+    assert session.scalars(select(VaccinationAlert.issue)).all() == [VaccinationIssue.MISSING]
+
+    vaccinate(tom, VaccineType.FELINE_FLU_ENTERITIS, expires_on=date(2027, 1, 1))
+    session.flush()
+
+    summary = vaccinations.scan(session, today=TODAY)
+    assert not summary.full
+    assert session.scalars(select(VaccinationAlert)).all() == []
+
+    # Adding a pet to an existing booking leaves the booking's updated_at alone
+    for model in (Pet, Booking, Vaccination):
+        session.execute(update(model).values(updated_at=datetime(2026, 1, 1, tzinfo=timezone.utc)))
+    booking = session.scalars(select(Booking)).one()
+    booking.pet_associations.append(BookingPet(pet=kit))
+    session.flush()
+
+    summary = vaccinations.scan(session, today=TODAY)
+    assert not summary.full
+    assert summary.alerts == 1
+
+    # Deleting a vaccination re-checks its pet
+    for model in (Pet, Booking, Vaccination):
+        session.execute(update(model).values(updated_at=datetime(2026, 1, 1, tzinfo=timezone.utc)))
+    session.execute(update(BookingPet).values(created_at=datetime(2026, 1, 1, tzinfo=timezone.utc)))
+    tom.vaccinations.clear()
+    session.flush()
+
+    vaccinations.scan(session, today=TODAY)
+    assert set(session.execute(select(VaccinationAlert.pet_id, VaccinationAlert.issue))) == {
+        (tom.id, VaccinationIssue.MISSING), (kit.id, VaccinationIssue.MISSING)}
+
+
+def test_scan_on_postgres_enums(db_session):
+    customer = Customer()
+    rex = Pet(customer=customer, name='Rex', species=Species.DOG)
+    tom = Pet(customer=customer, name='Tom', species=Species.CAT)
+    vaccinate(rex, VaccineType.DHP, VaccineType.LEPTOSPIROSIS, expires_on=date(2027, 1, 1))
+    vaccinate(rex, VaccineType.KENNEL_COUGH, expires_on=TODAY + timedelta(days=3))
+    booking = add_booking(db_session, customer, [rex, tom], TODAY + timedelta(days=1), nights=5)
+    db_session.flush()
+
+    problems = vaccinations.find_problems(db_session, TODAY, TODAY + timedelta(days=14),
+                                          booking_ids=[booking.id])
+    assert {(p.pet_id, p.vaccine_type, p.issue) for p in problems} == {
+        (rex.id, VaccineType.KENNEL_COUGH, VaccinationIssue.EXPIRES_DURING_STAY),
+        (tom.id, VaccineType.FELINE_FLU_ENTERITIS, VaccinationIssue.MISSING),
+    }
+    vaccinations.scan(db_session, today=TODAY, full=True)
+    assert set(db_session.execute(
+        select(VaccinationAlert.pet_id, VaccinationAlert.vaccine_type)
+        .where(VaccinationAlert.booking_id == booking.id))) == {
+        (rex.id, VaccineType.KENNEL_COUGH), (tom.id, VaccineType.FELINE_FLU_ENTERITIS)}
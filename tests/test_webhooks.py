@@ -0,0 +1,133 @@
+import hashlib
+import hmac
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+
+from app import create_app
+from app.extensions import db
+from app.models import Base, Contact, Customer, CustomerContact, WebhookEvent
+from app.models.customer import ContactRole
+from app.models.webhook import WebhookSource, WebhookStatus
+from app.services import webhooks
+from app.services.webhooks import process_batch, process_pending, replay
+
+
+class StripeSender:
+    """Stands in for Stripe: signs events the way its webhook client does."""
+
+    def __init__(self, client, secret):
+        self.client, self.secret = client, secret
+
+    def send(self, event, secret=None, timestamp=None):
+        body = json.dumps(event).encode()
+        timestamp = str(int(timestamp or time.time()))
+        signature = hmac.new((secret or self.secret).encode(), f"{timestamp}.".encode() + body,
+                             hashlib.sha256).hexdigest()
+        return self.client.post('/webhooks/stripe', data=body, content_type='application/json',
+                                headers={'Stripe-Signature': f"t={timestamp},v1={signature}"})
+
+
+class GravityFormsSender:
+    """Stands in for the Gravity Forms Webhooks add-on."""
+
+    def __init__(self, client, token):
+        self.client, self.token = client, token
+
+    def send(self, entry):
+        return self.client.post('/webhooks/gravity_forms', json=entry, headers={'X-Crowbank-Token': self.token})
+
+
+@pytest.fixture
+def hook_app():
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SECRET_KEY': 'test'})
+    settings = app.config['CONFIG']['webhooks']
+    settings['stripe']['secret'] = 'whsec_test'
+    settings['gravity_forms']['token'] = 'gf-token'
+    settings['gravity_forms']['forms'] = {'4': {'email': '2', 'legacy_cust_no': '7'}}
+    with app.app_context():
+        Base.metadata.create_all(db.engine)
+        yield app
+
+
+def stripe_event(n, email=None, legacy=None):
+    obj = {'object': 'payment_intent', 'receipt_email': email}
+    if legacy is not None:
+        obj['metadata'] = {'legacy_cust_no': str(legacy)}
+    return {'id': f"evt_{n}", 'type': 'payment_intent.succeeded', 'data': {'object': obj}}
+
+
+def test_deliveries_are_acknowledged_once(hook_app):
+    stripe = StripeSender(hook_app.test_client(), 'whsec_test')
+
+    first = stripe.send(stripe_event(1))
+    again = stripe.send(stripe_event(1))
+    assert (first.status_code, again.status_code) == (202, 202)
+    assert again.get_json() == {'id': first.get_json()['id'], 'duplicate': True}
+
+    assert stripe.send(stripe_event(2), secret='wrong').status_code == 401
+    assert stripe.send(stripe_event(3), timestamp=time.time() - 3600).status_code == 401
+    assert GravityFormsSender(hook_app.test_client(), 'nope').send({'id': '1', 'form_id': '4'}).status_code == 401
+    assert hook_app.test_client().post('/webhooks/paypal', data=b'{}').status_code == 404
+
+    events = db.session.scalars(select(WebhookEvent)).all()
+    assert [(e.idempotency_key, e.status) for e in events] == [('evt_1', WebhookStatus.PENDING)]
+
+
+def test_batch_matches_customers_by_number_then_email(hook_app):
+    ann = Contact(first_name='Ann', last_name='Smith', email_address='Ann@Example.com')
+    by_email, by_number = Customer(legacy_cust_no=10), Customer(legacy_cust_no=20)
+    db.session.add_all([by_email, by_number, ann])
+    db.session.flush()
+    db.session.add(CustomerContact(customer_id=by_email.id, contact_id=ann.id, role=ContactRole.PRIMARY))
+    db.session.commit()
+
+    stripe = StripeSender(hook_app.test_client(), 'whsec_test')
+    forms = GravityFormsSender(hook_app.test_client(), 'gf-token')
+    stripe.send(stripe_event(1, email='ann@example.com'))
+    stripe.send(stripe_event(2, email='ann@example.com', legacy=20))
+    stripe.send(stripe_event(3, email='nobody@example.com'))
+    forms.send({'id': '55', 'form_id': '4', '2': ' ANN@example.com ', '7': ''})
+    forms.send({'id': '56', 'form_id': '9', '1': 'Bob', '3': 'ann@example.com'})
+
+    summaries = process_pending(db.session, hook_app.config['CONFIG']['webhooks'], batch_size=2)
+    assert [s.claimed for s in summaries] == [2, 2, 1]
+
+    events = {e.idempotency_key: e for e in db.session.scalars(select(WebhookEvent))}
+    assert events['evt_1'].customer_id == by_email.id
+    assert events['evt_2'].customer_id == by_number.id
+    assert events['evt_3'].status == WebhookStatus.UNMATCHED
+    assert events['4:55'].customer_id == events['9:56'].customer_id == by_email.id
+    assert events['9:56'].event_type == 'form_9'
+
+
+def test_failed_handlers_retry_then_replay(hook_app, monkeypatch):
+    settings = dict(hook_app.config['CONFIG']['webhooks'], max_attempts=2)
+    calls = []
+
+    def handler(session, event, payload):
+        calls.append(event.id)
+        session.add(Customer(legacy_cust_no=99))  # Rolled back with the savepoint
+        raise RuntimeError('downstream unavailable')
+
+    monkeypatch.setitem(webhooks.HANDLERS, (WebhookSource.STRIPE, 'payment_intent.succeeded'), handler)
+    StripeSender(hook_app.test_client(), 'whsec_test').send(stripe_event(1))
+
+    assert [s.retrying for s in process_pending(db.session, settings)] == [1]  # Backs off rather than spinning
+    event = db.session.scalars(select(WebhookEvent)).one()
+    due = event.next_attempt_at.replace(tzinfo=timezone.utc)
+    assert due - datetime.now(timezone.utc) > timedelta(seconds=50)
+    assert process_batch(db.session, settings, now=due - timedelta(seconds=1)).claimed == 0
+    assert process_batch(db.session, settings, now=due).failed == 1
+    assert (event.status, event.attempts, len(calls)) == (WebhookStatus.FAILED, 2, 2)
+    assert 'downstream unavailable' in event.error
+    assert db.session.scalar(select(Customer).where(Customer.legacy_cust_no == 99)) is None
+
+    monkeypatch.delitem(webhooks.HANDLERS, (WebhookSource.STRIPE, 'payment_intent.succeeded'))
+    assert replay(db.session, source=WebhookSource.STRIPE) == 1
+    db.session.expire_all()
+    process_pending(db.session, settings)
+    assert db.session.get(WebhookEvent, event.id).status == WebhookStatus.UNMATCHED